@@ -0,0 +1,195 @@
+"""CPU micro-benchmarks: per-call cost of the pure-Python work done for each chat request.
+
+Times InfoBot's message classification, URL detection, humanizing and Markov text generation,
+DuckDuckGo result parsing and page text cleanup on the recorded fixtures, with the random
+module reseeded before every case so each run does identical work. Results are the best of
+--repeat measurements, in microseconds per call. The cases are measured round-robin, each
+measurement followed by one of a fixed pure-Python reference loop, so every case is sampled
+across the whole run. A case is compared against the stored baseline by its cost relative to
+the best reference time, so a machine that runs faster or slower as a whole does not read as a
+change. Cases that come out slower than the baseline by more than --threshold are measured
+again, up to --confirm more times, to rule out a slow spell of the machine; the script exits
+with status 1 when any case stays that much slower.
+
+    python benchmarks/bench_cpu.py [--json results.json] [--baseline benchmarks/baseline.json]
+    python benchmarks/bench_cpu.py --update-baseline
+
+Baselines are only comparable on the machine and Python they were recorded with; refresh
+benchmarks/baseline.json with --update-baseline when either changes. A change that moves a
+case's cost re-records that case in the same commit, with --update-baseline --only <case>,
+which keeps the stored results of the other cases.
+"""
+import argparse, json, os, platform, random, sys, timeit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(BENCH_DIR, 'fixtures')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+os.environ.setdefault('INFOBOT_NLTK_STARTUP', 'lazy')
+os.environ.setdefault('INFOBOT_PAGE_CACHE', 'off')
+os.environ.setdefault('INFOBOT_CONTENT_INDEX', 'off')
+
+
+def read_fixture(name: str) -> bytes:
+    with open(os.path.join(FIXTURES, name), 'rb') as f:
+        return f.read()
+
+
+def build_cases(bot):
+    """(name, fn, calls per fn()) for each benchmarked hot path."""
+    from infobot_all_in_one import parse_duckduckgo_results
+    messages = json.loads(read_fixture('messages.json'))
+    queries = [bot.extract_search_query(message) for message in messages]
+    summaries = json.loads(read_fixture('wiki_summaries.json'))
+    ddg_html = read_fixture('ddg_lite.html').decode('utf-8')
+    article = read_fixture('article.html')
+
+    def each(fn, items):
+        def run():
+            for item in items:
+                fn(item)
+        return run, len(items)
+
+    return [
+        ('categorize_message', *each(bot.categorize_message, messages)),
+        ('extract_search_query', *each(bot.extract_search_query, messages)),
+        ('is_url', *each(bot.is_url, queries)),
+        ('humanize_response', *each(bot.humanize_response, summaries)),
+        ('generate_human_like_text', lambda: bot.generate_human_like_text(25), 1),
+        ('parse_duckduckgo_results', lambda: parse_duckduckgo_results(ddg_html, limit=5), 1),
+        ('page_text', lambda: bot._page_text('https://example.com/long-read', article, 'utf-8'), 1),
+    ]
+
+
+def reference_loop():
+    """Fixed interpreter-bound work the cases are timed against."""
+    counts = {}
+    for i in range(2000):
+        counts[i % 97] = counts.get(i % 97, 0) + len(str(i))
+    return sorted(counts.items())
+
+
+def _loops(timer: timeit.Timer, min_time: float) -> int:
+    number, taken = timer.autorange()
+    return max(int(number * min_time / taken), 1)
+
+
+def measure(cases, seed: int, min_time: float, repeat: int) -> dict:
+    """Best time per call of each case in microseconds, and relative to the best reference_loop time.
+    
+    Every case is looped for at least min_time per measurement, and a shorter reference
+    measurement follows each one.
+    """
+    timers = []
+    for name, fn, calls in cases:
+        random.seed(seed)
+        fn()  # lazy imports and first-use setup are not part of the per-request cost
+        timer = timeit.Timer(fn)
+        timers.append((name, timer, calls, _loops(timer, min_time)))
+    reference = timeit.Timer(reference_loop)
+    reference_number = _loops(reference, min_time / 4)
+
+    best, best_reference = dict.fromkeys((name for name, *_ in timers), float('inf')), float('inf')
+    for _ in range(repeat):
+        for name, timer, calls, number in timers:
+            random.seed(seed)
+            best[name] = min(best[name], timer.timeit(number) / number / calls)
+            best_reference = min(best_reference, reference.timeit(reference_number) / reference_number)
+    return {name: {'us_per_call': round(seconds * 1e6, 3), 'relative': round(seconds / best_reference, 6)}
+            for name, seconds in best.items()}
+
+
+def machine() -> dict:
+    return {'python': f"{platform.python_implementation()} {platform.python_version()}",
+            'platform': platform.platform(), 'processor': platform.machine()}
+
+
+def change(result: dict, previous: dict) -> float:
+    """Relative slowdown of a result against its baseline entry, comparing costs relative to the reference when both have them."""
+    unit = 'relative' if 'relative' in previous else 'us_per_call'
+    return result[unit] / previous[unit] - 1
+
+
+def slower(results: dict, baseline: dict, threshold: float) -> list:
+    previous = baseline.get('results', {})
+    return [name for name, result in results.items() if name in previous and change(result, previous[name]) > threshold]
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Print each case against the baseline and return the names that regressed."""
+    regressions = []
+    if baseline and baseline.get('machine') != machine():
+        print(f"note: baseline was recorded on {baseline.get('machine')}, numbers may not be comparable")
+    print(f"{'case':>26} {'us/call':>10} {'baseline':>10} {'change':>8}")
+    for name, result in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            print(f"{name:>26} {result['us_per_call']:10.2f} {'-':>10} {'new':>8}")
+            continue
+        slowdown = change(result, previous)
+        flag = ''
+        if slowdown > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:>26} {result['us_per_call']:10.2f} {previous['us_per_call']:10.2f} {slowdown:+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--repeat', type=int, default=7, help='measurements per case, the best one counts')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per measurement')
+    parser.add_argument('--only', action='append', help='run only this case (repeatable)')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='slowdown that counts as a regression')
+    parser.add_argument('--confirm', type=int, default=3, help='re-measurements of a case before it counts as regressed')
+    parser.add_argument('--update-baseline', action='store_true', help='store these results as the baseline')
+    args = parser.parse_args()
+
+    baseline = {}
+    if not args.update_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    from infobot_all_in_one import InfoBot
+    bot = InfoBot()
+
+    cases = [case for case in build_cases(bot) if not args.only or case[0] in args.only]
+    results = measure(cases, args.seed, args.min_time, args.repeat)
+    for _ in range(args.confirm):
+        suspects = slower(results, baseline, args.threshold)
+        if not suspects:
+            break
+        print(f"re-measuring {', '.join(suspects)}")
+        again = measure([case for case in cases if case[0] in suspects], args.seed, args.min_time, args.repeat)
+        for name, result in again.items():
+            if result['relative'] < results[name]['relative']:
+                results[name] = result
+    report = {'machine': machine(), 'seed': args.seed, 'results': results}
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.update_baseline:
+        stored = report
+        if args.only and os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as f:
+                stored = json.load(f)
+            if stored.get('machine') != report['machine'] or stored.get('seed') != args.seed:
+                sys.exit(f"{args.baseline} was recorded on another machine or seed, refresh every case instead of --only")
+            stored['results'].update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(stored, f, indent=2)
+            f.write('\n')
+        print(f"Stored {', '.join(results)} in {args.baseline}")
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Micro-benchmark: DuckDuckGo lite result parsing.
+
+Compares parse_duckduckgo_results, a one-pass tokenizer that starts at the results table and
+stops after the results InfoBot shows, against the previous BeautifulSoup html.parser tree walk
+on a synthetic page in the DuckDuckGo lite layout.
+
+    python benchmarks/bench_duckduckgo.py [--fixture benchmarks/fixtures/ddg_lite.html]
+"""
+import argparse, os, sys, timeit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from bs4 import BeautifulSoup
+
+from infobot_all_in_one import parse_duckduckgo_results
+
+
+def legacy_parse(html):
+    """The pre-tokenizer BeautifulSoup parsing from search_duckduckgo."""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    results = []
+    for a_tag in soup.find_all('a', {'class': 'result-link'}):
+        results.append({'title': a_tag.text.strip(), 'url': a_tag['href']})
+
+    for tr in soup.find_all('tr'):
+        if tr.find('a') and tr.find('td', class_='result-snippet'):
+            title_element, snippet_element = tr.find('a'), tr.find('td', class_='result-snippet')
+            if title_element and snippet_element:
+                title, url, snippet = title_element.text.strip(), title_element.get('href', ''), snippet_element.text.strip()
+                if title and url and snippet:
+                    results.append({'title': title, 'url': url, 'snippet': snippet})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fixture', default=os.path.join(BENCH_DIR, 'fixtures', 'ddg_lite.html'))
+    parser.add_argument('--number', type=int, default=50, help='pages parsed per measurement')
+    args = parser.parse_args()
+
+    with open(args.fixture, encoding='utf-8') as f:
+        html = f.read()
+
+    cases = (
+        ("bs4 tree walk", lambda: legacy_parse(html)),
+        ("tokenizer (all results)", lambda: parse_duckduckgo_results(html)),
+        ("tokenizer (top 5)", lambda: parse_duckduckgo_results(html, limit=5)),
+    )
+    timings = {}
+    for name, fn in cases:
+        best = min(timeit.repeat(fn, number=args.number, repeat=5))
+        timings[name] = best / args.number * 1000
+        print(f"{name:>24}: {timings[name]:7.3f} ms/page")
+    baseline = timings["bs4 tree walk"]
+    for name in timings:
+        if name != "bs4 tree walk":
+            print(f"{'speedup, ' + name:>40}: {baseline / timings[name]:.1f}x")
+
+    results = parse_duckduckgo_results(html, limit=5)
+    print(f"parsed {len(parse_duckduckgo_results(html))} results; first: {results[0] if results else None}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Micro-benchmark: per-message cost of intent classification and query extraction.
+
+Compares the precompiled single-pass IntentClassifier against the previous implementation,
+which ran one re.search per trigger phrase to categorize and one re.sub per question phrase
+to strip the query.
+
+    python benchmarks/bench_intent.py [--number 20000]
+"""
+import argparse, os, re, sys, timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from infobot_all_in_one import IntentClassifier
+
+GREETINGS = ['hello', 'hi', 'hey', 'greetings', 'howdy', 'hola']
+FAREWELLS = ['bye', 'goodbye', 'farewell', 'see you', 'cya']
+QUESTIONS = ['what is', 'who is', 'where is', 'when is', 'why is', 'how to', 'can you',
+             'could you', 'tell me about', 'explain', 'information on', 'search for']
+
+MESSAGES = [
+    "What is quantum computing?",
+    "Who was Marie Curie?",
+    "Tell me about the history of jazz",
+    "How does solar power work?",
+    "hello there",
+    "ok bye, see you tomorrow",
+    "can you explain the theory of relativity in simple terms",
+    "I was just wondering about the population of Tokyo",
+    "search for the best hiking trails near Denver",
+    "https://en.wikipedia.org/wiki/Python_(programming_language)",
+]
+
+
+def legacy_classify(message):
+    """The pre-IntentClassifier categorize_message + extract_search_query pair."""
+    message_lower = message.lower()
+    category = "general"
+    for patterns, name in ((GREETINGS, "greeting"), (FAREWELLS, "farewell"), (QUESTIONS, "question")):
+        if any(re.search(pattern, message_lower) for pattern in patterns):
+            category = name
+            break
+    cleaned_message = message.lower()
+    for pattern in QUESTIONS:
+        cleaned_message = re.sub(pattern, '', cleaned_message, flags=re.IGNORECASE).strip()
+    query = message if len(cleaned_message) < 3 and len(message) > len(cleaned_message) else cleaned_message
+    return category, query
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=20000, help='messages classified per measurement')
+    args = parser.parse_args()
+
+    classifier = IntentClassifier([("greeting", GREETINGS), ("farewell", FAREWELLS), ("question", QUESTIONS)])
+    messages = (MESSAGES * (args.number // len(MESSAGES) + 1))[:args.number]
+
+    def run_legacy():
+        for message in messages:
+            legacy_classify(message)
+
+    def run_compiled():
+        for message in messages:
+            classifier.classify(message)
+
+    results = {}
+    for name, fn in (("legacy", run_legacy), ("compiled", run_compiled)):
+        best = min(timeit.repeat(fn, number=1, repeat=5))
+        results[name] = best / args.number * 1e6
+        print(f"{name:>9}: {results[name]:7.2f} us/message")
+    print(f"  speedup: {results['legacy'] / results['compiled']:.1f}x")
+
+    for message in MESSAGES:
+        legacy, compiled = legacy_classify(message), classifier.classify(message)
+        if legacy != compiled:
+            print(f"  differs: {message!r}: legacy={legacy} compiled={compiled}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+"""Load test: drive /chat at a fixed concurrency against local stand-ins for every upstream.
+
+Starts three stub servers on localhost in place of the Wikipedia api.php, DuckDuckGo lite and
+the pages users ask InfoBot to read, each with its own latency, jitter and failure rate. The
+server under test is pointed at them through INFOBOT_WIKIPEDIA_API_URL and
+INFOBOT_DUCKDUCKGO_LITE_URL. Closed-loop clients then send a seeded mix of messages, and the
+script reports throughput and p50/p95/p99 latency per message category.
+
+By default the app is served in this process, through werkzeug's threaded WSGI server or with
+--server asgi through uvicorn, so client and server share one interpreter. For cleaner numbers,
+start the stubs alone with --stubs-only, launch the server in another process with the printed
+environment, and pass its URL as --target.
+
+    python benchmarks/loadtest.py [--requests 2000] [--concurrency 16] [--server wsgi|asgi]
+    python benchmarks/loadtest.py --latency wikipedia=0.05,duckduckgo=0.3 --failure-rate scrape=0.1
+"""
+import argparse, asyncio, json, logging, math, os, random, sys, threading, time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+CATEGORIES = ('greeting', 'farewell', 'general', 'wikipedia', 'duckduckgo', 'website')
+DEFAULT_MIX = 'greeting=1,farewell=1,general=1,wikipedia=5,duckduckgo=2,website=1'
+DEFAULT_LATENCY = 'wikipedia=0.08,duckduckgo=0.25,scrape=0.3'
+
+# Replies InfoBot gives when an upstream failed; counted as degraded rather than as errors
+DEGRADED_PHRASES = ("having trouble", "encountered an error", "couldn't search", "couldn't access")
+
+GREETINGS = ("hello", "hi there", "hey", "howdy, friend")
+FAREWELLS = ("bye", "goodbye for now", "see you later", "ok cya")
+GENERAL = ("I like turtles", "that was fun", "my cat is asleep", "nice weather today")
+
+
+def parse_rates(spec: str) -> dict:
+    """Parse 'name=value,name=value' into a mapping of floats."""
+    rates = {}
+    for item in spec.split(','):
+        name, _, value = item.strip().partition('=')
+        if name and value:
+            rates[name] = float(value)
+    return rates
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers for whichever upstream its server stands in for."""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        stub = self.server
+        url = urlparse(self.path)
+        with stub.lock:
+            stub.hits += 1
+            delay = stub.latency * (1 + stub.rng.uniform(-stub.jitter, stub.jitter))
+            failed = stub.rng.random() < stub.failure_rate
+        time.sleep(max(delay, 0))
+        if failed:
+            with stub.lock:
+                stub.failures += 1
+            return self._send(503, b'upstream unavailable', 'text/plain')
+        body, content_type = stub.respond(url.path, parse_qs(url.query))
+        self._send(200, body, content_type)
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubServer(ThreadingHTTPServer, ABC):
+    """A stand-in upstream on a free localhost port, served from a daemon thread."""
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, name: str, latency: float, jitter: float, failure_rate: float, seed: int):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.name, self.latency, self.jitter, self.failure_rate = name, latency, jitter, failure_rate
+        self.rng = random.Random(f"{seed}:{name}")
+        self.lock = threading.Lock()
+        self.hits = self.failures = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    @abstractmethod
+    def respond(self, path: str, query: dict):
+        """Body and content type for a successful GET of path with the parsed query."""
+
+
+class WikipediaStub(StubServer):
+    """MediaWiki api.php: pages titled 'topic N' exist, every other title and search misses."""
+
+    def __init__(self, summaries, **kwargs):
+        super().__init__('wikipedia', **kwargs)
+        self.summaries = summaries
+
+    def respond(self, path, query):
+        if query.get('list') == ['search']:
+            body = {'query': {'search': []}}
+        else:
+            title = query.get('titles', [''])[0]
+            if title.lower().startswith('topic'):
+                number = int(''.join(c for c in title if c.isdigit()) or 0)
+                page = {'title': title.title(), 'extract': self.summaries[number % len(self.summaries)],
+                        'fullurl': f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}"}
+                body = {'query': {'pages': {str(number + 1): page}}}
+            else:
+                body = {'query': {'pages': {'-1': {'title': title, 'missing': ''}}}}
+        return json.dumps(body).encode('utf-8'), 'application/json; charset=utf-8'
+
+
+class DuckDuckGoStub(StubServer):
+    """DuckDuckGo lite: the same synthetic results page for every query."""
+
+    def __init__(self, html: str, **kwargs):
+        super().__init__('duckduckgo', **kwargs)
+        self.html = html.encode('utf-8')
+
+    def respond(self, path, query):
+        return self.html, 'text/html; charset=utf-8'
+
+
+class ScrapeStub(StubServer):
+    """Arbitrary web pages: /article/N is an article built from the summary fixtures."""
+
+    def __init__(self, summaries, **kwargs):
+        super().__init__('scrape', **kwargs)
+        self.summaries = summaries
+
+    def respond(self, path, query):
+        number = int(''.join(c for c in path if c.isdigit()) or 0)
+        paragraphs = "".join(f"<p>{self.summaries[(number + i) % len(self.summaries)]}</p>" for i in range(3))
+        html = (f"<html><head><title>Article {number}</title><script>var tracking = {number};</script></head>"
+                f"<body><nav><a href='/'>Home</a></nav><article><h1>Article {number}</h1>{paragraphs}</article>"
+                f"<footer>Copyright</footer></body></html>")
+        return html.encode('utf-8'), 'text/html; charset=utf-8'
+
+
+def start_stubs(args) -> dict:
+    with open(os.path.join(BENCH_DIR, 'fixtures', 'wiki_summaries.json'), encoding='utf-8') as f:
+        # The fixtures are InfoBot answers; InfoBot adds the source line itself, so drop it from the extracts
+        summaries = [summary.partition('\n\nSource:')[0] for summary in json.load(f)]
+    with open(os.path.join(BENCH_DIR, 'fixtures', 'ddg_lite.html'), encoding='utf-8') as f:
+        ddg_html = f.read()
+    latency, failures = parse_rates(DEFAULT_LATENCY), parse_rates(args.failure_rate)
+    latency.update(parse_rates(args.latency))
+
+    def options(name):
+        return {'latency': latency.get(name, 0.0), 'jitter': args.jitter,
+                'failure_rate': failures.get(name, 0.0), 'seed': args.seed}
+    return {
+        'wikipedia': WikipediaStub(summaries, **options('wikipedia')),
+        'duckduckgo': DuckDuckGoStub(ddg_html, **options('duckduckgo')),
+        'scrape': ScrapeStub(summaries, **options('scrape')),
+    }
+
+
+def stub_environment(stubs: dict) -> dict:
+    return {
+        'INFOBOT_WIKIPEDIA_API_URL': stubs['wikipedia'].url + '/w/api.php',
+        'INFOBOT_DUCKDUCKGO_LITE_URL': stubs['duckduckgo'].url + '/lite/',
+    }
+
+
+def start_server(kind: str) -> str:
+    """Serve the app from this process and return its base URL. Call after the stub environment is set."""
+    from infobot_all_in_one import app, asgi_app
+    logging.getLogger().setLevel(logging.WARNING)  # per-request logging would dominate the profile
+    if kind == 'asgi':
+        import socket, uvicorn
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        server = uvicorn.Server(uvicorn.Config(asgi_app, log_level='warning', lifespan='off'))
+        threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True).start()
+        while not server.started:
+            time.sleep(0.05)
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+    from werkzeug.serving import make_server
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def message_plan(args, scrape_url: str) -> list:
+    """(category, message) pairs for the whole run, drawn from a seeded RNG.
+
+    Each category cycles through --distinct variants, so repeats exercise the answer cache the
+    way popular questions do; --distinct 0 makes every question unique.
+    """
+    rng = random.Random(args.seed)
+    mix = parse_rates(args.mix)
+    categories = [name for name in CATEGORIES if mix.get(name, 0) > 0]
+    weights = [mix[name] for name in categories]
+    plan = []
+    for i in range(args.warmup + args.requests):
+        category = rng.choices(categories, weights)[0]
+        n = rng.randrange(args.distinct) if args.distinct else i
+        if category == 'greeting':
+            message = rng.choice(GREETINGS)
+        elif category == 'farewell':
+            message = rng.choice(FAREWELLS)
+        elif category == 'general':
+            message = f"{rng.choice(GENERAL)} {n}"
+        elif category == 'wikipedia':
+            message = f"what is topic {n}"
+        elif category == 'duckduckgo':
+            message = f"tell me about obscure thing {n}"
+        else:
+            message = f"{scrape_url}/article/{n}"
+        plan.append((category, message))
+    return plan
+
+
+async def drive(target: str, plan: list, concurrency: int, warmup: int) -> tuple:
+    """Send the plan from closed-loop clients, each with its own session cookie."""
+    import aiohttp
+    queue = asyncio.Queue()
+    for i, item in enumerate(plan):
+        queue.put_nowait((i < warmup, *item))
+    samples = defaultdict(list)
+    outcomes = defaultdict(lambda: defaultdict(int))
+    started = None
+
+    async def client():
+        nonlocal started
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=60)) as session:
+            while not queue.empty():
+                is_warmup, category, message = queue.get_nowait()
+                if not is_warmup and started is None:
+                    started = time.perf_counter()
+                request_started = time.perf_counter()
+                try:
+                    async with session.post(f"{target}/chat", json={'message': message}) as response:
+                        payload = await response.json(content_type=None)
+                    outcome = 'ok' if response.status == 200 else 'error'
+                    if outcome == 'ok' and any(phrase in payload.get('response', '') for phrase in DEGRADED_PHRASES):
+                        outcome = 'degraded'
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                    outcome = 'error'
+                if not is_warmup:
+                    samples[category].append(time.perf_counter() - request_started)
+                    outcomes[category][outcome] += 1
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return samples, outcomes, time.perf_counter() - (started or time.perf_counter())
+
+
+def percentile(ordered: list, q: float) -> float:
+    return ordered[min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def summarize(samples: dict, outcomes: dict, elapsed: float) -> dict:
+    rows = {}
+    everything = [latency for category in samples for latency in samples[category]]
+    for category, latencies in [(c, samples[c]) for c in CATEGORIES] + [('all', everything)]:
+        if not latencies:
+            continue
+        ordered = sorted(latencies)
+        counts = outcomes[category] if category != 'all' else {
+            outcome: sum(outcomes[c][outcome] for c in outcomes) for outcome in ('ok', 'degraded', 'error')}
+        rows[category] = {
+            'requests': len(ordered), 'ok': counts.get('ok', 0), 'degraded': counts.get('degraded', 0),
+            'errors': counts.get('error', 0), 'throughput_rps': len(ordered) / elapsed if elapsed else 0.0,
+            'mean_ms': sum(ordered) / len(ordered) * 1000,
+            **{f"p{q}_ms": percentile(ordered, q) * 1000 for q in (50, 95, 99)},
+        }
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000, help='measured requests')
+    parser.add_argument('--warmup', type=int, default=100, help='requests sent before measuring')
+    parser.add_argument('--concurrency', type=int, default=16, help='closed-loop clients')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"category weights (default {DEFAULT_MIX})")
+    parser.add_argument('--distinct', type=int, default=200, help='variants per category, 0 for all unique')
+    parser.add_argument('--latency', default='', help=f"stub latency in seconds (default {DEFAULT_LATENCY})")
+    parser.add_argument('--jitter', type=float, default=0.5, help='uniform latency jitter as a fraction')
+    parser.add_argument('--failure-rate', default='', help="share of 503s per stub, e.g. 'wikipedia=0.05'")
+    parser.add_argument('--server', choices=('wsgi', 'asgi'), default='wsgi', help='in-process server')
+    parser.add_argument('--target', help='base URL of an already running InfoBot to load instead')
+    parser.add_argument('--stubs-only', action='store_true', help='start the stubs and wait')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    stubs = start_stubs(args)
+    environment = stub_environment(stubs)
+    if args.stubs_only:
+        print("Stubs running; start InfoBot with:\n" + "\n".join(f"  export {k}={v}" for k, v in environment.items()))
+        print(f"Scrape target: {stubs['scrape'].url}/article/<n>")
+        threading.Event().wait()
+
+    if args.target:
+        target = args.target.rstrip('/')
+    else:
+        os.environ.update(environment)
+        os.environ.setdefault('INFOBOT_NLTK_STARTUP', 'lazy')
+        os.environ.setdefault('INFOBOT_PAGE_CACHE', 'off')  # a page cache left by an earlier run skews the results
+        target = start_server(args.server)
+
+    plan = message_plan(args, stubs['scrape'].url)
+    samples, outcomes, elapsed = asyncio.run(drive(target, plan, args.concurrency, args.warmup))
+    rows = summarize(samples, outcomes, elapsed)
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {elapsed:.1f}s "
+          f"({'target ' + target if args.target else args.server + ' in-process'})")
+    print(f"{'category':>11} {'reqs':>6} {'ok':>6} {'degr':>5} {'err':>5} {'req/s':>8} "
+          f"{'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8}  (ms)")
+    for category, row in rows.items():
+        print(f"{category:>11} {row['requests']:6d} {row['ok']:6d} {row['degraded']:5d} {row['errors']:5d} "
+              f"{row['throughput_rps']:8.1f} {row['mean_ms']:8.1f} {row['p50_ms']:8.1f} {row['p95_ms']:8.1f} {row['p99_ms']:8.1f}")
+    print("upstream hits: " + ", ".join(f"{name} {stub.hits} ({stub.failures} failed)" for name, stub in stubs.items()))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'config': vars(args), 'elapsed_seconds': elapsed, 'categories': rows,
+                       'upstream': {name: {'hits': stub.hits, 'failures': stub.failures} for name, stub in stubs.items()}},
+                      f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,22 @@
+import re, atexit, contextvars, logging, random, json, math, os, socket, sys, threading, time, asyncio, uuid, sqlite3, zlib
+_STARTUP_BEGIN = time.perf_counter()
+import requests
+import gzip
+from array import array
+from bisect import bisect_left, bisect_right
+from urllib.parse import parse_qs, unquote, urlencode, urlparse
+from contextlib import contextmanager, nullcontext
+from html.parser import HTMLParser
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from flask import Flask, Response, request, session, jsonify, render_template_string, stream_with_context
+from werkzeug.http import dump_cookie
+from typing import Callable, Iterator, List, Dict, NamedTuple, Tuple, Optional, Union
+from collections import Counter, defaultdict, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait
 
-import re, logging, random, json, os, sys
-import nltk, requests, wikipediaapi
-from flask import Flask, request, jsonify, render_template_string
-from bs4 import BeautifulSoup
-from nltk.tokenize import word_tokenize, sent_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-from nltk.util import ngrams
-from nltk.probability import FreqDist
-from trafilatura import fetch_url, extract
-from typing import List, Dict, Tuple, Optional, Union
-from collections import defaultdict
+# NLTK, trafilatura and BeautifulSoup are imported on first use, see startup_phase() below
+STARTUP_TIMINGS: Dict[str, float] = {'imports': time.perf_counter() - _STARTUP_BEGIN}
 
 
 logging.basicConfig(level=logging.DEBUG)
@@ -18,32 +24,1966 @@ app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key") 
 
 
-# Download all required NLTK resources
-nltk.download('punkt')  # Always download to ensure we have the latest
-nltk.download('stopwords')
-nltk.download('wordnet')
-nltk.download('averaged_perceptron_tagger')  # For better sentence parsing
+def _env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment, falling back to the default."""
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        logging.warning(f"Ignoring invalid value for {name}: {os.environ.get(name)!r}")
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    """Read a float setting from the environment, falling back to the default."""
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        logging.warning(f"Ignoring invalid value for {name}: {os.environ.get(name)!r}")
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Read an on/off setting from the environment, falling back to the default."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+@contextmanager
+def startup_phase(name: str):
+    """Time one phase of process startup into STARTUP_TIMINGS."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STARTUP_TIMINGS[name] = time.perf_counter() - started
+
+
+def startup_report() -> str:
+    """Summarize how long each startup phase took."""
+    phases = " ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in STARTUP_TIMINGS.items())
+    return f"{phases} total={(time.perf_counter() - _STARTUP_BEGIN) * 1000:.1f}ms"
+
+
+def process_memory(pid: Optional[int] = None) -> Dict[str, int]:
+    """Resident memory of a process in bytes: rss, pss, shared and private.
+    
+    Pages a preforked worker still shares with its master count towards shared and only a
+    fraction of them towards pss. Linux only; empty where /proc is unavailable.
+    """
+    fields = {'Rss': 'rss', 'Pss': 'pss', 'Shared_Clean': 'shared', 'Shared_Dirty': 'shared',
+              'Private_Clean': 'private', 'Private_Dirty': 'private'}
+    memory = dict.fromkeys(('rss', 'pss', 'shared', 'private'), 0)
+    try:
+        with open(f"/proc/{pid or 'self'}/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name in fields:
+                    memory[fields[name]] += int(value.split()[0]) * 1024
+    except (OSError, ValueError):
+        return {}
+    return memory
+
+
+# NLTK data InfoBot uses, by download name and data path
+NLTK_RESOURCES = {
+    'punkt': 'tokenizers/punkt',
+    'punkt_tab': 'tokenizers/punkt_tab',
+    'stopwords': 'corpora/stopwords',
+    'wordnet': 'corpora/wordnet',
+}
+
+
+# nltk's package imports and corpus loaders are not thread-safe: threads that import it at the same
+# time see partially initialized modules. Every first import and load of NLTK data holds this lock.
+_nltk_lock = threading.RLock()
+
+
+def ensure_nltk_resources(download: bool = False) -> List[str]:
+    """Check that the NLTK data InfoBot uses is installed locally and return what is missing.
+    
+    Nothing is fetched unless download is set, and then only the missing resources. Everything
+    that needs NLTK data falls back to a simpler built-in method when it is absent.
+    """
+    missing = []
+    with _nltk_lock:
+        import nltk
+        for name, path in NLTK_RESOURCES.items():
+            try:
+                nltk.data.find(path)
+            except LookupError:
+                if not (download and nltk.download(name, quiet=True)):
+                    missing.append(name)
+    if missing:
+        logging.warning(f"NLTK resources not installed, using fallbacks: {', '.join(missing)}")
+    return missing
+
+
+# INFOBOT_NLTK_STARTUP: 'verify' checks local data, 'download' fetches what is missing, 'lazy' skips the check
+NLTK_STARTUP_MODE = os.environ.get('INFOBOT_NLTK_STARTUP', 'verify').strip().lower()
+if NLTK_STARTUP_MODE != 'lazy':
+    with startup_phase('nltk_check'):
+        ensure_nltk_resources(download=NLTK_STARTUP_MODE == 'download')
+
+
+# Wikipedia answers containing these phrases are not usable and trigger the DuckDuckGo fallback
+NO_ANSWER_PHRASES = ("couldn't find", "having trouble", "try being more specific")
+
+# Answers containing these phrases come from a failed upstream call and must never be cached
+TRANSIENT_ERROR_PHRASES = ("having trouble", "encountered an error")
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query so that trivially different spellings share a cache entry."""
+    return " ".join(query.lower().split()).strip(" ?!.")
+
+
+class AnswerCache:
+    """Bounded, thread-safe LRU cache of raw upstream answers with per-source TTLs."""
+
+    def __init__(self, ttls: Dict[str, float], max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024,
+                 default_ttl: float = 300.0):
+        self.ttls, self.default_ttl = dict(ttls), default_ttl
+        self.max_entries, self.max_bytes = max_entries, max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, int, str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = defaultdict(int)
+        self._misses: Dict[str, int] = defaultdict(int)
+        self.evictions = 0
+
+    def get(self, source: str, key: str) -> Optional[str]:
+        """Return the cached answer for (source, key), or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get((source, key))
+            if entry is None:
+                self._misses[source] += 1
+                return None
+            expires_at, size, value = entry
+            if expires_at <= time.monotonic():
+                self._remove((source, key))
+                self._misses[source] += 1
+                return None
+            self._entries.move_to_end((source, key))
+            self._hits[source] += 1
+            return value
+
+    def set(self, source: str, key: str, value: str) -> None:
+        """Store an answer, evicting least recently used entries past the size limits."""
+        size = sys.getsizeof(value)
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttls.get(source, self.default_ttl)
+        with self._lock:
+            if (source, key) in self._entries:
+                self._remove((source, key))
+            self._entries[(source, key)] = (expires_at, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every cached answer."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, cache_key: Tuple[str, str]) -> None:
+        # Caller must hold the lock
+        _, size, _ = self._entries.pop(cache_key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, object]:
+        """Return a snapshot of the cache size and hit/miss counters per source."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'evictions': self.evictions,
+                'hits': dict(self._hits),
+                'misses': dict(self._misses),
+            }
+
+
+class SingleFlight:
+    """Coalesces concurrent identical upstream calls so only the first caller performs the fetch.
+    
+    Callers that arrive while a call for the same (source, key) is in flight wait for its result,
+    or get its exception. Threads share a Future; coroutines on the same event loop share a task,
+    which is cancelled only once every coroutine waiting on it has been cancelled.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Tuple[str, str], Future] = {}
+        self._tasks: Dict[tuple, list] = {}
+        self._fetches: Dict[str, int] = defaultdict(int)
+        self._coalesced: Dict[str, int] = defaultdict(int)
+
+    def do(self, source: str, key: str, fn, *args):
+        """Call fn(*args), or wait for the identical call already in flight on another thread."""
+        with self._lock:
+            future = self._calls.get((source, key))
+            leader = future is None
+            if leader:
+                future = self._calls[(source, key)] = Future()
+                self._fetches[source] += 1
+            else:
+                self._coalesced[source] += 1
+        if not leader:
+            logging.debug(f"Coalesced {source} lookup: {key}")
+            trace_branch(f"{source}:coalesced")
+            return future.result()
+        
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[(source, key)]
+        future.set_result(result)
+        return result
+
+    async def do_async(self, source: str, key: str, fn, *args):
+        """Await fn(*args), or the identical call already in flight on this event loop."""
+        loop = asyncio.get_running_loop()
+        call_key = (loop, source, key)
+        entry = self._tasks.get(call_key)
+        with self._lock:
+            if entry is None:
+                self._fetches[source] += 1
+            else:
+                self._coalesced[source] += 1
+        if entry is None:
+            task = loop.create_task(fn(*args))
+            entry = self._tasks[call_key] = [task, 0]
+            task.add_done_callback(lambda _: self._tasks.pop(call_key, None))
+        else:
+            logging.debug(f"Coalesced {source} lookup: {key}")
+            trace_branch(f"{source}:coalesced")
+        
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if entry[1] == 1:
+                task.cancel()
+            raise
+        finally:
+            entry[1] -= 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Return upstream calls made and calls saved by coalescing, per source."""
+        with self._lock:
+            return {'fetches': dict(self._fetches), 'coalesced': dict(self._coalesced)}
+
+
+class ConversationStore:
+    """Per-session conversation histories kept in fixed-size ring buffers.
+    
+    Sessions are ordered by last activity, so idle sessions are dropped from the front in O(1)
+    and the oldest sessions are evicted first once the session or byte cap is exceeded.
+    """
+
+    def __init__(self, max_turns: int = 20, max_sessions: int = 10000, max_bytes: int = 64 * 1024 * 1024,
+                 idle_ttl: float = 1800.0):
+        self.max_turns, self.max_sessions, self.max_bytes, self.idle_ttl = max_turns, max_sessions, max_bytes, idle_ttl
+        self._sessions: "OrderedDict[str, Tuple[float, deque]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def append(self, session_id: str, role: str, text: str) -> None:
+        """Record one turn of a session's conversation."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            history = entry[1] if entry else deque(maxlen=self.max_turns)
+            if len(history) == history.maxlen:
+                self._bytes -= sys.getsizeof(history[0][1])
+            history.append((role, text))
+            self._bytes += sys.getsizeof(text)
+            self._sessions[session_id] = (now, history)
+            self._evict(now)
+
+    def history(self, session_id: str) -> List[Tuple[str, str]]:
+        """Return a copy of a session's (role, text) turns, oldest first."""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return list(entry[1]) if entry else []
+
+    def _evict(self, now: float) -> None:
+        # Caller must hold the lock
+        while self._sessions:
+            last_seen = next(iter(self._sessions.values()))[0]
+            over_capacity = len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes
+            if not over_capacity and now - last_seen < self.idle_ttl:
+                break
+            _, (_, history) = self._sessions.popitem(last=False)
+            self._bytes -= sum(sys.getsizeof(text) for _, text in history)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of live sessions, their total text size and evictions so far."""
+        with self._lock:
+            return {'sessions': len(self._sessions), 'bytes': self._bytes, 'evictions': self.evictions}
+
+
+@contextmanager
+def _locked_file(path: str) -> Iterator[None]:
+    """Hold an exclusive advisory lock on path (created if missing) across processes; a no-op without fcntl."""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(path, 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class Passage(NamedTuple):
+    """One indexed chunk of fetched content and its term frequencies."""
+    url: str
+    text: str
+    terms: Dict[str, int]
+    length: int
+
+
+class ContentIndex:
+    """Incremental BM25 inverted index over the passages of everything InfoBot has fetched.
+    
+    Documents are split into paragraph-sized passages so that a hit can be quoted as an answer.
+    Re-adding a URL replaces its passages, and once more than max_passages are held the oldest
+    documents are dropped whole. snapshot/restore persist the index, term counts included, as JSON;
+    snapshot(merge=True) adds to a file that other processes write too.
+    """
+
+    SNAPSHOT_VERSION = 1
+
+    def __init__(self, tokenize: Callable[[str], List[str]], max_passages: int = 5000,
+                 passage_chars: int = 600, k1: float = 1.5, b: float = 0.75):
+        self.tokenize, self.max_passages, self.passage_chars = tokenize, max_passages, passage_chars
+        self.k1, self.b = k1, b
+        self._passages: Dict[int, Passage] = {}
+        self._documents: "OrderedDict[str, List[int]]" = OrderedDict()
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._total_length = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _chunks(self, text: str) -> List[str]:
+        """Split text into passages of whole sentences, each at most about passage_chars long."""
+        chunks, current = [], ""
+        for paragraph in re.split(r"\n\s*\n", text):
+            for sentence in re.split(r"(?<=[.!?])\s+", " ".join(paragraph.split())):
+                if current and len(current) + len(sentence) > self.passage_chars:
+                    chunks.append(current)
+                    current = ""
+                current = f"{current} {sentence}" if current else sentence
+            if current:
+                chunks.append(current)
+                current = ""
+        return chunks
+
+    def add(self, url: str, text: str) -> None:
+        """Index (or re-index) the text fetched from a URL."""
+        passages = []
+        for chunk in self._chunks(text):
+            tokens = self.tokenize(chunk)
+            if tokens:
+                passages.append(Passage(url, chunk, dict(Counter(tokens)), len(tokens)))
+        with self._lock:
+            self._remove(url)
+            self._insert(url, passages)
+            while len(self._passages) > self.max_passages and len(self._documents) > 1:
+                self._remove(next(iter(self._documents)))
+
+    def _insert(self, url: str, passages: List[Passage]) -> None:
+        # Caller must hold the lock
+        ids = []
+        for passage in passages:
+            passage_id, self._next_id = self._next_id, self._next_id + 1
+            self._passages[passage_id] = passage
+            for term, count in passage.terms.items():
+                self._postings[term][passage_id] = count
+            self._total_length += passage.length
+            ids.append(passage_id)
+        self._documents[url] = ids
+
+    def _remove(self, url: str) -> None:
+        # Caller must hold the lock
+        for passage_id in self._documents.pop(url, ()):
+            passage = self._passages.pop(passage_id)
+            for term in passage.terms:
+                postings = self._postings[term]
+                del postings[passage_id]
+                if not postings:
+                    del self._postings[term]
+            self._total_length -= passage.length
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._documents
+
+    def __len__(self) -> int:
+        return len(self._passages)
+
+    def search(self, query: str, limit: int = 3) -> List[Tuple[float, float, Passage]]:
+        """Return up to limit (score, coverage, passage) hits, best first.
+        
+        coverage is the fraction of the distinct query terms that occur in the passage.
+        """
+        # An empty index must not pay for loading the tokenizer
+        if not self._passages:
+            return []
+        terms = set(self.tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            count = len(self._passages)
+            if not count:
+                return []
+            average_length = self._total_length / count
+            scores: Dict[int, float] = defaultdict(float)
+            matched: Dict[int, int] = defaultdict(int)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for passage_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._passages[passage_id].length / average_length)
+                    scores[passage_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+                    matched[passage_id] += 1
+            best = sorted(scores, key=scores.get, reverse=True)[:limit]
+            return [(scores[i], matched[i] / len(terms), self._passages[i]) for i in best]
+
+    def snapshot(self, path: str, merge: bool = False) -> None:
+        """Write the index to a JSON file, atomically replacing any previous snapshot.
+        
+        With merge, documents in the existing file that this index does not hold are kept ahead of
+        its own (the oldest dropped first once there are more than max_passages), and writers are
+        serialized on path.lock, so processes sharing one path add to the snapshot instead of the
+        last one to exit overwriting the rest.
+        """
+        with self._lock:
+            documents = [
+                {'url': url, 'passages': [{'text': p.text, 'terms': p.terms} for p in map(self._passages.get, ids)]}
+                for url, ids in self._documents.items()
+            ]
+        with _locked_file(f"{path}.lock") if merge else nullcontext():
+            if merge:
+                documents = self._merged_documents(path, documents)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': self.SNAPSHOT_VERSION, 'documents': documents}, f)
+            os.replace(tmp_path, path)
+    
+    def _merged_documents(self, path: str, documents: List[dict]) -> List[dict]:
+        """The snapshot's documents that are not in documents, oldest dropped to fit, followed by documents."""
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            existing = data['documents'] if data.get('version') == self.SNAPSHOT_VERSION else []
+        except (OSError, ValueError, KeyError):
+            existing = []
+        held = {document['url'] for document in documents}
+        kept = [document for document in existing if document['url'] not in held]
+        room = self.max_passages - sum(len(document['passages']) for document in documents)
+        total = sum(len(document['passages']) for document in kept)
+        start = 0
+        while start < len(kept) and total > room:
+            total -= len(kept[start]['passages'])
+            start += 1
+        return kept[start:] + documents
+
+    def restore(self, path: str) -> int:
+        """Load a snapshot written by snapshot() without re-tokenizing; return the passages loaded."""
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != self.SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported content index snapshot version: {data.get('version')}")
+        with self._lock:
+            for document in data['documents']:
+                url = document['url']
+                self._remove(url)
+                self._insert(url, [Passage(url, p['text'], p['terms'], sum(p['terms'].values()))
+                                   for p in document['passages']])
+            while len(self._passages) > self.max_passages and len(self._documents) > 1:
+                self._remove(next(iter(self._documents)))
+            return len(self._passages)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of indexed documents, passages and distinct terms."""
+        with self._lock:
+            return {'documents': len(self._documents), 'passages': len(self._passages), 'terms': len(self._postings)}
+
+
+class IntentClassifier:
+    """Precompiled, single-pass classifier for greetings, farewells and questions.
+    
+    All trigger phrases are compiled into one word-bounded alternation, so a message is scanned
+    once to find its category (greeting beats farewell beats question, as before) and, in the
+    same pass, the question phrases to strip from the search query.
+    """
+
+    def __init__(self, intents: List[Tuple[str, List[str]]], strip_intent: str = "question"):
+        self._priority = {name: rank for rank, (name, _) in enumerate(intents)}
+        self._strip_intent = strip_intent
+        groups = []
+        for name, phrases in intents:
+            # Longest phrases first so 'goodbye' wins over 'bye' at the same position
+            alternatives = sorted((re.escape(phrase).replace(r'\ ', r'\s+') for phrase in phrases), key=len, reverse=True)
+            groups.append(f"(?P<{name}>{'|'.join(alternatives)})")
+        self._pattern = re.compile(r"\b(?:" + "|".join(groups) + r")\b", re.IGNORECASE)
+
+    def classify(self, message: str) -> Tuple[str, str]:
+        """Return the message category and the message with question phrases removed."""
+        message_lower = message.lower()
+        category, best_rank = "general", len(self._priority)
+        pieces, last_end = [], 0
+        for match in self._pattern.finditer(message_lower):
+            name = match.lastgroup
+            if self._priority[name] < best_rank:
+                category, best_rank = name, self._priority[name]
+            if name == self._strip_intent:
+                pieces.append(message_lower[last_end:match.start()])
+                last_end = match.end()
+        pieces.append(message_lower[last_end:])
+        cleaned_message = " ".join("".join(pieces).split())
+        query = message if len(cleaned_message) < 3 and len(message) > len(cleaned_message) else cleaned_message
+        return category, query
+
+
+URL_PATTERN = re.compile(
+    r'^(?:http|https)?://'  
+    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|'  
+    r'localhost|'  
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  
+    r'(?::\d+)?'  
+    r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+
+# Top-level domains a bare 'example.com' may end in. Country codes that double as file extensions
+# (py, md, rs, sh, pl, ...) are left out so 'setup.py' or 'node.js' is never mistaken for a site.
+KNOWN_TLDS = ('com', 'org', 'net', 'edu', 'gov', 'mil', 'int', 'info', 'biz', 'io', 'ai', 'co', 'dev', 'app', 'me',
+              'tv', 'us', 'uk', 'ca', 'au', 'nz', 'ie', 'de', 'fr', 'nl', 'be', 'ch', 'at', 'eu', 'es', 'it', 'se',
+              'no', 'fi', 'dk', 'jp', 'cn', 'kr', 'in', 'ru', 'br', 'mx', 'ar', 'za', 'news', 'blog', 'wiki', 'tech')
+
+# A bare domain counts as a URL when it starts with www. or ends in a known TLD, optionally with a path
+DOMAIN_PATTERN = re.compile(
+    r'^(?:www\.(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,63}|'
+    r'(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:' + '|'.join(KNOWN_TLDS) + r'))\.?(?:[/?#]\S*)?$', re.IGNORECASE)
+
+EMBEDDED_URL_PATTERN = re.compile(r'(?:\bhttps?://|\bwww\.)[^\s<>"]+', re.IGNORECASE)
+
+
+class _EnoughResults(Exception):
+    pass
+
+
+class DuckDuckGoLiteParser(HTMLParser):
+    """One-pass tokenizer for DuckDuckGo lite result pages.
+    
+    Only the two elements results are built from are tracked: each a.result-link starts a
+    result and the td.result-snippet that follows it fills in the description. Everything
+    else is skipped without building a tree, and parsing stops once enough results are in.
+    """
+
+    def __init__(self, limit: Optional[int] = None):
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.results: List[Dict[str, str]] = []
+        self._capture: Optional[str] = None
+        self._depth = 0
+        self._text: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if self._capture is not None:
+            if tag == self._capture:
+                self._depth += 1
+            return
+        if tag != 'a' and tag != 'td':
+            return
+        attributes = dict(attrs)
+        classes = (attributes.get('class') or '').split()
+        if tag == 'a' and 'result-link' in classes:
+            if self.limit is not None and len(self.results) >= self.limit:
+                raise _EnoughResults()
+            self.results.append({'title': '', 'url': attributes.get('href') or '', 'snippet': ''})
+            self._start('a', 'title')
+        elif tag == 'td' and 'result-snippet' in classes and self.results and not self.results[-1]['snippet']:
+            self._start('td', 'snippet')
+
+    def _start(self, tag: str, field: str):
+        self._capture, self._field, self._depth, self._text = tag, field, 1, []
+
+    def handle_endtag(self, tag):
+        if tag != self._capture:
+            return
+        self._depth -= 1
+        if self._depth == 0:
+            self.results[-1][self._field] = " ".join("".join(self._text).split())
+            self._capture = None
+
+    def handle_data(self, data):
+        if self._capture is not None:
+            self._text.append(data)
+
+
+def parse_duckduckgo_results(html: str, limit: Optional[int] = None) -> List[Dict[str, str]]:
+    """Extract [{'title', 'url', 'snippet'}] from a DuckDuckGo lite results page."""
+    # Skip the page header and search form, parsing starts at the table holding the first result
+    first_result = html.find('result-link')
+    if first_result == -1:
+        return []
+    table_start = html.rfind('<table', 0, first_result)
+    parser = DuckDuckGoLiteParser(limit)
+    try:
+        parser.feed(html[table_start if table_start != -1 else 0:])
+        parser.close()
+    except _EnoughResults:
+        pass
+    return [result for result in parser.results if result['title'] and result['url']]
+
+
+# Conversations from callers that do not supply a session share this history
+DEFAULT_SESSION = 'default'
+
+BROWSER_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+WIKIPEDIA_USER_AGENT = 'InfoBot (info@example.com)'
+# Overridable so that benchmarks/loadtest.py can point a server at local stand-ins
+WIKIPEDIA_API_URL = os.environ.get('INFOBOT_WIKIPEDIA_API_URL', 'https://en.wikipedia.org/w/api.php')
+DUCKDUCKGO_LITE_URL = os.environ.get('INFOBOT_DUCKDUCKGO_LITE_URL', 'https://lite.duckduckgo.com/lite/')
+
+
+def _parse_content_length(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _parse_host_pool_sizes(spec: str) -> Dict[str, int]:
+    """Parse 'host=size,host=size' into a mapping of per-host connection pool sizes."""
+    sizes = {}
+    for item in spec.split(','):
+        host, _, size = item.strip().partition('=')
+        if host and size.isdigit():
+            sizes[host.lower()] = int(size)
+    return sizes
+
+
+# Content types worth handing to the text extractors; anything else (PDF, video, ...) is not downloaded
+TEXT_CONTENT_TYPES = ('text/html', 'application/xhtml+xml', 'text/plain', 'text/xml', 'application/xml')
+
+
+class UnsupportedContentError(ValueError):
+    """Raised when a page is not a text document the scrapers can read."""
+
+
+class FetchedPage(NamedTuple):
+    """A page body downloaded within a byte budget."""
+    url: str
+    status: int
+    content_type: str
+    encoding: Optional[str]
+    content: bytes
+    truncated: bool
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+
+class PageFetchStats:
+    """Thread-safe counters for byte-capped page downloads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {'pages': 0, 'bytes_read': 0, 'bytes_saved': 0, 'truncated': 0, 'aborted': 0}
+
+    def record(self, bytes_read: int = 0, bytes_saved: int = 0, truncated: bool = False, aborted: bool = False) -> None:
+        with self._lock:
+            self._counts['pages'] += 1
+            self._counts['bytes_read'] += bytes_read
+            self._counts['bytes_saved'] += bytes_saved
+            self._counts['truncated'] += truncated
+            self._counts['aborted'] += aborted
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+class ScrapeStats:
+    """Which extractor produced each scraped page and the time spent in every pipeline stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._extractors: Dict[str, int] = defaultdict(int)
+        self._stage_seconds: Dict[str, float] = defaultdict(float)
+        self.last: Dict[str, object] = {}
+
+    def record(self, extractor: str, stages: Dict[str, float]) -> None:
+        with self._lock:
+            self._extractors[extractor] += 1
+            for stage, seconds in stages.items():
+                self._stage_seconds[stage] += seconds
+            self.last = {'extractor': extractor, 'stages': dict(stages)}
+        logging.debug(f"Scrape extracted with {extractor}: " + ", ".join(
+            f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in stages.items()))
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {'extractors': dict(self._extractors), 'stage_seconds': dict(self._stage_seconds), 'last': dict(self.last)}
+
+
+class RequestTrace:
+    """Timing breakdown of one chat request, collected while it is the current trace.
+    
+    Records every pipeline stage, every upstream request (status, bytes, DNS, connect,
+    time to first byte and transfer) and the branches taken through the answer pipeline.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stages: List[Dict[str, object]] = []
+        self._upstream: List[Dict[str, object]] = []
+        self._branches: List[str] = []
+        self._resolved: Dict[str, float] = {}
+
+    @staticmethod
+    def _ms(seconds: Optional[float]) -> Optional[float]:
+        return None if seconds is None else round(seconds * 1000, 3)
+
+    def stage(self, name: str, seconds: float, outcome: str) -> None:
+        with self._lock:
+            self._stages.append({'stage': name, 'ms': self._ms(seconds), 'outcome': outcome})
+
+    def branch(self, name: str) -> None:
+        with self._lock:
+            self._branches.append(name)
+
+    def resolve(self, host: str, port: int) -> float:
+        """Time a DNS lookup of host, once per trace, as an estimate of the resolver's share."""
+        if host not in self._resolved:
+            started = time.perf_counter()
+            try:
+                socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+            except OSError:
+                pass
+            self._resolved[host] = time.perf_counter() - started
+        return self._resolved[host]
+
+    def upstream(self, url: str, status: int, received: int, total: float, ttfb: Optional[float] = None,
+                 dns: Optional[float] = None, connect: Optional[float] = None, connection: Optional[str] = None) -> None:
+        entry = {
+            'url': url, 'status': status, 'bytes': received, 'connection': connection,
+            'dns_ms': self._ms(dns), 'connect_ms': self._ms(connect), 'ttfb_ms': self._ms(ttfb),
+            'transfer_ms': self._ms(None if ttfb is None else total - ttfb), 'total_ms': self._ms(total),
+        }
+        with self._lock:
+            self._upstream.append({key: value for key, value in entry.items() if value is not None})
+
+    def to_dict(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                'total_ms': self._ms(time.perf_counter() - self.started),
+                'branches': list(self._branches),
+                'stages': list(self._stages),
+                'upstream': list(self._upstream),
+            }
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar('infobot_trace', default=None)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    """The trace of the request being served in this context, if it asked for one."""
+    return _current_trace.get()
+
+
+TRACE_HEADER = 'X-InfoBot-Trace'
+
+
+def trace_requested(flag: Optional[str]) -> bool:
+    """Whether an X-InfoBot-Trace header or ?trace= parameter value opts the request into tracing."""
+    return (flag or '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+@contextmanager
+def request_trace() -> Iterator[RequestTrace]:
+    """Trace everything done in this context until the block exits."""
+    trace = RequestTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def trace_branch(name: str) -> None:
+    """Note a branch taken through the answer pipeline on the current trace."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.branch(name)
+
+
+def submit_in_context(executor: ThreadPoolExecutor, fn, *args) -> Future:
+    """executor.submit that carries the caller's context, and with it the request trace."""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _prometheus_labels(labels: Dict[str, object]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+def prometheus_metric(name: str, kind: str, help_text: str, samples: List[Tuple[Dict[str, object], float]]) -> List[str]:
+    """Render one metric family in the Prometheus text exposition format."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{_prometheus_labels(labels)} {value}" for labels, value in samples)
+    return lines
+
+
+class StageTimer:
+    """Times one pipeline stage; set .outcome inside the block to label how it went."""
+
+    __slots__ = ('metrics', 'stage', 'outcome', 'started')
+
+    def __init__(self, metrics: "PipelineMetrics", stage: str, outcome: str):
+        self.metrics, self.stage, self.outcome = metrics, stage, outcome
+
+    def __enter__(self) -> "StageTimer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        seconds = time.perf_counter() - self.started
+        if exc_type is not None:
+            self.outcome = 'cancelled' if issubclass(exc_type, asyncio.CancelledError) else 'error'
+        self.metrics.observe(self.stage, seconds, self.outcome)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.stage(self.stage, seconds, self.outcome)
+        return False
+
+
+class PipelineMetrics:
+    """Latency histograms and outcome counters for each stage of the chat pipeline.
+    
+    Recording costs a bisect and a few integer increments under a lock; everything else,
+    cumulative buckets included, is computed only when /metrics is scraped.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS, enabled: bool = True):
+        self.buckets, self.enabled = buckets, enabled
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, List[int]] = {}
+        self._sums: Dict[str, float] = defaultdict(float)
+        self._outcomes: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    def stage(self, name: str, outcome: str = 'ok') -> StageTimer:
+        """Context manager that records the latency and outcome of the enclosed block."""
+        return StageTimer(self, name, outcome)
+
+    def observe(self, stage: str, seconds: float, outcome: str = 'ok') -> None:
+        if not self.enabled:
+            return
+        bucket = bisect_left(self.buckets, seconds)
+        with self._lock:
+            counts = self._histograms.get(stage)
+            if counts is None:
+                counts = self._histograms[stage] = [0] * (len(self.buckets) + 1)
+            counts[bucket] += 1
+            self._sums[stage] += seconds
+            self._outcomes[(stage, outcome)] += 1
+
+    def render(self) -> List[str]:
+        """Prometheus exposition lines for the stage histograms and outcome counters."""
+        with self._lock:
+            histograms = {stage: list(counts) for stage, counts in self._histograms.items()}
+            sums, outcomes = dict(self._sums), dict(self._outcomes)
+        
+        samples = []
+        for stage, counts in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append(({'stage': stage, 'le': '+Inf' if bound == float('inf') else repr(bound)}, cumulative))
+        lines = prometheus_metric('infobot_stage_seconds', 'histogram', 'Latency of chat pipeline stages.', [])
+        lines.extend(f"infobot_stage_seconds_bucket{_prometheus_labels(labels)} {value}" for labels, value in samples)
+        for stage, counts in sorted(histograms.items()):
+            lines.append(f"infobot_stage_seconds_sum{_prometheus_labels({'stage': stage})} {sums[stage]}")
+            lines.append(f"infobot_stage_seconds_count{_prometheus_labels({'stage': stage})} {sum(counts)}")
+        lines += prometheus_metric('infobot_stage_total', 'counter', 'Chat pipeline stage runs by outcome.',
+                                   [({'stage': stage, 'outcome': outcome}, count)
+                                    for (stage, outcome), count in sorted(outcomes.items())])
+        return lines
+
+
+def _body_length(headers) -> Optional[int]:
+    """Content-Length as a count of body bytes, or None if it is missing or counts compressed bytes.
+    
+    Under a Content-Encoding the header gives the size on the wire, which cannot be compared
+    with the decoded bytes the fetchers count.
+    """
+    encoding = headers.get('Content-Encoding', '').strip().lower()
+    if encoding and encoding != 'identity':
+        return None
+    return _parse_content_length(headers.get('Content-Length'))
+
+
+def _check_page_headers(url: str, content_type: str, content_length: Optional[int], stats: PageFetchStats) -> str:
+    """Vet a response's headers before reading its body, returning the bare MIME type.
+    
+    Non-text documents are rejected outright so their bodies are never read.
+    """
+    mime = content_type.split(';')[0].strip().lower()
+    if mime and mime not in TEXT_CONTENT_TYPES:
+        stats.record(bytes_saved=content_length or 0, aborted=True)
+        raise UnsupportedContentError(f"{url} is a {mime} document, not a web page")
+    return mime
+
+
+class HttpClient:
+    """Shared keep-alive connection pool used by every upstream call InfoBot makes."""
+
+    def __init__(self, pool_size: int = 10, host_pool_sizes: Optional[Dict[str, int]] = None,
+                 connect_timeout: float = 3.05, read_timeout: float = 10.0,
+                 retries: int = 2, backoff_factor: float = 0.3):
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': BROWSER_USER_AGENT,
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+        })
+        self.session.mount('https://', self._make_adapter(pool_size, retries, backoff_factor))
+        self.session.mount('http://', self._make_adapter(pool_size, retries, backoff_factor))
+        # Hosts we hit constantly get their own, larger pools
+        for host, size in (host_pool_sizes or {}).items():
+            adapter = self._make_adapter(size, retries, backoff_factor)
+            self.session.mount(f'https://{host}/', adapter)
+            self.session.mount(f'http://{host}/', adapter)
+
+    @staticmethod
+    def _make_adapter(pool_size: int, retries: int, backoff_factor: float) -> HTTPAdapter:
+        retry = Retry(total=retries, connect=retries, read=retries, backoff_factor=backoff_factor,
+                      status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(['GET', 'HEAD']), raise_on_status=False)
+        return HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Issue a GET through the shared pool, applying the default timeouts."""
+        kwargs.setdefault('timeout', self.timeout)
+        trace = _current_trace.get()
+        if trace is None:
+            return self.session.get(url, **kwargs)
+        
+        probe = self._trace_start(trace, url)
+        response = self.session.get(url, **kwargs)
+        self._trace_end(trace, probe, response, len(response.content))
+        return response
+
+    def _host_pools(self, url: str) -> list:
+        """urllib3 connection pools the session holds for the scheme, host and port of url."""
+        parsed = urlparse(url)
+        port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+        pools = self.session.get_adapter(url).poolmanager.pools
+        with pools.lock:
+            keys = list(pools.keys())
+        return [pool for key in keys
+                if (key.key_scheme, key.key_host, key.key_port or port) == (parsed.scheme, parsed.hostname, port)
+                for pool in [pools.get(key)] if pool is not None]
+
+    def _trace_start(self, trace: RequestTrace, url: str) -> Tuple[float, str, int, Optional[float]]:
+        """Note the pool state before a traced request, resolving the host if no idle connection exists.
+        
+        requests does not expose DNS or connect timings, so DNS is timed with a separate lookup
+        and, on a new connection, connect and TLS time is part of the time to first byte.
+        """
+        pools = self._host_pools(url)
+        idle = any(conn is not None for pool in pools if pool.pool is not None for conn in list(pool.pool.queue))
+        dns = None
+        if not idle:
+            parsed = urlparse(url)
+            dns = trace.resolve(parsed.hostname, parsed.port or (443 if parsed.scheme == 'https' else 80))
+        return time.perf_counter(), url, sum(pool.num_connections for pool in pools), dns
+
+    def _trace_end(self, trace: RequestTrace, probe: Tuple[float, str, int, Optional[float]],
+                   response: requests.Response, received: int) -> None:
+        started, url, connections, dns = probe
+        opened = sum(pool.num_connections for pool in self._host_pools(url)) > connections
+        connection = 'new' if opened else 'reused'
+        trace.upstream(response.url, response.status_code, received, time.perf_counter() - started,
+                       ttfb=response.elapsed.total_seconds(), dns=dns, connection=connection)
+
+    def timeout_for(self, read_timeout: Optional[float]) -> Tuple[float, float]:
+        """(connect, read) timeouts with the read timeout overridden when one is given."""
+        return self.timeout if read_timeout is None else (self.timeout[0], read_timeout)
+
+    def fetch_page(self, url: str, max_bytes: int, stats: PageFetchStats, headers: Optional[Dict[str, str]] = None,
+                   read_timeout: Optional[float] = None) -> FetchedPage:
+        """Stream a page body, stopping once max_bytes have been read.
+        
+        Content-Type and Content-Length are checked before any of the body is read, and the
+        connection is dropped rather than drained when the budget runs out. max_bytes and the
+        bytes reported as read and saved count the decoded body.
+        """
+        trace = _current_trace.get()
+        probe = self._trace_start(trace, url) if trace is not None else None
+        with self.session.get(url, stream=True, timeout=self.timeout_for(read_timeout), headers=headers) as response:
+            content_length = _body_length(response.headers)
+            mime = _check_page_headers(url, response.headers.get('Content-Type', ''), content_length, stats)
+            
+            # A body declared larger than the budget is cut off without reading past max_bytes
+            truncated = content_length is not None and content_length > max_bytes
+            chunks, received = [], 0
+            for chunk in response.iter_content(chunk_size=min(16384, max_bytes)):
+                if received + len(chunk) > max_bytes:
+                    chunks.append(chunk[:max_bytes - received])
+                    received = max_bytes
+                    truncated = True
+                    break
+                chunks.append(chunk)
+                received += len(chunk)
+                if truncated and received == max_bytes:
+                    break
+            
+            saved = content_length - received if truncated and content_length is not None else 0
+            stats.record(bytes_read=received, bytes_saved=saved, truncated=truncated)
+            if probe is not None:
+                self._trace_end(trace, probe, response, received)
+            return FetchedPage(response.url, response.status_code, mime, response.encoding, b"".join(chunks), truncated,
+                               response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Return new, reused and idle (open) connection counts per host."""
+        stats: Dict[str, Dict[str, int]] = {}
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                host = stats.setdefault(pool.host, {'new': 0, 'reused': 0, 'requests': 0, 'open': 0})
+                host['new'] += pool.num_connections
+                host['requests'] += pool.num_requests
+                host['reused'] += max(pool.num_requests - pool.num_connections, 0)
+                host['open'] += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+        return stats
+
+    def close(self) -> None:
+        """Close every pooled connection."""
+        self.session.close()
+
+
+class CachedDocument(NamedTuple):
+    """A document stored in the PageCache."""
+    url: str
+    body: bytes
+    text: Optional[str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional request headers that let the origin answer 304 Not Modified."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """Persistent SQLite (WAL) cache of fetched documents and their extracted text, keyed by URL.
+    
+    Fresh entries are served without touching the network; stale ones are revalidated with their
+    ETag/Last-Modified so an unchanged page only costs a 304. Every thread of every process gets
+    its own connection and WAL lets gunicorn workers on one host read while another one writes.
+    Once the stored size passes max_bytes the least recently used documents are deleted. A read
+    only records its access time when the stored one is more than touch_interval seconds old, so
+    hot documents are not rewritten on every hit; eviction order is exact to within that interval.
+    Triggers keep the document count and total size in a one-row totals table, so checking the
+    size limit after a put does not scan the whole cache and stays exact across processes.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS documents (
+            url TEXT PRIMARY KEY,
+            body BLOB NOT NULL,
+            text TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            size INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            accessed_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS documents_accessed_at ON documents (accessed_at);
+        CREATE TABLE IF NOT EXISTS totals (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            documents INTEGER NOT NULL,
+            bytes INTEGER NOT NULL
+        );
+        CREATE TRIGGER IF NOT EXISTS documents_inserted AFTER INSERT ON documents BEGIN
+            UPDATE totals SET documents = documents + 1, bytes = bytes + NEW.size;
+        END;
+        CREATE TRIGGER IF NOT EXISTS documents_deleted AFTER DELETE ON documents BEGIN
+            UPDATE totals SET documents = documents - 1, bytes = bytes - OLD.size;
+        END;
+        CREATE TRIGGER IF NOT EXISTS documents_resized AFTER UPDATE OF size ON documents BEGIN
+            UPDATE totals SET bytes = bytes + NEW.size - OLD.size;
+        END;
+        -- Caches created before the totals table are counted once, after the triggers exist
+        INSERT OR IGNORE INTO totals (id, documents, bytes)
+            SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM documents WHERE NOT EXISTS (SELECT 1 FROM totals);
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, touch_interval: float = 60.0):
+        self.path, self.max_bytes, self.touch_interval = path, max_bytes, touch_interval
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        # Connections must not cross a fork, so each worker process opens its own
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(self.SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def get(self, url: str) -> Optional[CachedDocument]:
+        """Return the stored document for a URL, fresh or stale, or None."""
+        conn = self._connection()
+        row = conn.execute('SELECT body, text, etag, last_modified, expires_at, accessed_at FROM documents WHERE url = ?',
+                           (url,)).fetchone()
+        if row is None:
+            return None
+        body, text, etag, last_modified, expires_at, accessed_at = row
+        now = time.time()
+        if now - accessed_at > self.touch_interval:
+            conn.execute('UPDATE documents SET accessed_at = ? WHERE url = ?', (now, url))
+        return CachedDocument(url, zlib.decompress(body), text, etag, last_modified, expires_at)
+
+    def put(self, url: str, body: bytes, ttl: float, text: Optional[str] = None,
+            etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Store a document, replacing any previous version, then enforce the size limit."""
+        compressed = zlib.compress(body, 6)
+        size = len(compressed) + len(text or '')
+        now = time.time()
+        conn = self._connection()
+        # An upsert rather than INSERT OR REPLACE, whose implicit delete would not fire the totals trigger
+        conn.execute('INSERT INTO documents (url, body, text, etag, last_modified, size, expires_at, accessed_at) '
+                     'VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (url) DO UPDATE SET body = excluded.body, '
+                     'text = excluded.text, etag = excluded.etag, last_modified = excluded.last_modified, '
+                     'size = excluded.size, expires_at = excluded.expires_at, accessed_at = excluded.accessed_at',
+                     (url, compressed, text, etag, last_modified, size, now + ttl, now))
+        self._evict(conn)
+
+    def revalidated(self, url: str, ttl: float) -> None:
+        """Mark a document as fresh again after the origin answered 304 Not Modified."""
+        now = time.time()
+        self._connection().execute('UPDATE documents SET expires_at = ?, accessed_at = ? WHERE url = ?',
+                                   (now + ttl, now, url))
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute('SELECT bytes FROM totals').fetchone()[0]
+        while total > self.max_bytes:
+            rows = conn.execute('SELECT url, size FROM documents ORDER BY accessed_at LIMIT 32').fetchall()
+            if not rows:
+                break
+            conn.executemany('DELETE FROM documents WHERE url = ?', [(url,) for url, _ in rows])
+            total -= sum(size for _, size in rows)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of stored documents and their total stored size."""
+        count, total = self._connection().execute('SELECT documents, bytes FROM totals').fetchone()
+        return {'documents': count, 'bytes': total}
+
+
+def _open_page_cache() -> Optional[PageCache]:
+    """Open the page cache configured by INFOBOT_PAGE_CACHE ('off' disables it)."""
+    path = os.environ.get('INFOBOT_PAGE_CACHE', os.path.join(app.instance_path, 'page_cache.sqlite3'))
+    if not path or path.lower() == 'off':
+        return None
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        return PageCache(path, max_bytes=_env_int('INFOBOT_PAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024),
+                         touch_interval=_env_float('INFOBOT_PAGE_CACHE_TOUCH_INTERVAL', 60.0))
+    except OSError as e:
+        logging.warning(f"Page cache disabled, cannot use {path}: {str(e)}")
+        return None
+
+
+class UpstreamUnavailable(RuntimeError):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} is temporarily unavailable, retrying in {retry_after:.0f}s")
+        self.upstream, self.retry_after = upstream, retry_after
+
+
+def _raise_for_server_error(status: int, url: str) -> None:
+    """Treat 5xx answers that survived the retries as upstream failures."""
+    if status >= 500:
+        raise requests.HTTPError(f"{status} Server Error for url: {url}")
+
+
+class CircuitBreaker:
+    """Health of one upstream: recent latencies, an adaptive read timeout and a failure breaker.
+    
+    After failure_threshold consecutive failures the breaker opens and calls are refused for
+    reset_timeout seconds. Then a single probe call is let through (half-open): success closes
+    the breaker, failure opens it again. Once min_samples successes have been seen, the read
+    timeout becomes timeout_multiplier times their p99, kept between min_timeout and max_timeout.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 max_timeout: float = 10.0, min_timeout: float = 1.0, timeout_multiplier: float = 3.0,
+                 window: int = 200, min_samples: int = 20):
+        self.name, self.failure_threshold, self.reset_timeout = name, failure_threshold, reset_timeout
+        self.max_timeout, self.min_timeout, self.timeout_multiplier = max_timeout, min_timeout, timeout_multiplier
+        self.min_samples = min_samples
+        self._latencies: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.successes = self.failures = self.rejected = self.opened = 0
+
+    def before_call(self) -> float:
+        """Admit a call and return its read timeout, or raise UpstreamUnavailable."""
+        with self._lock:
+            if self.state != self.CLOSED:
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if self.state == self.OPEN and remaining <= 0:
+                    self.state = self.HALF_OPEN
+                if self.state == self.OPEN or self._probing:
+                    self.rejected += 1
+                    raise UpstreamUnavailable(self.name, max(remaining, 0.0))
+                self._probing = True
+            return self._timeout()
+
+    def record_success(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+            self.successes += 1
+            self._consecutive_failures = 0
+            self._probing = False
+            self.state = self.CLOSED
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._consecutive_failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.opened += 1
+                    logging.warning(f"Circuit breaker for {self.name} opened after {self._consecutive_failures} failures")
+                self.state, self._opened_at = self.OPEN, time.monotonic()
+
+    def release(self) -> None:
+        """End an admitted call that neither succeeded nor failed, e.g. because it was cancelled."""
+        with self._lock:
+            self._probing = False
+
+    def _percentiles(self) -> Dict[str, float]:
+        # Caller must hold the lock
+        ordered = sorted(self._latencies)
+        if not ordered:
+            return {}
+        return {f"p{q}": ordered[min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1)] for q in (50, 95, 99)}
+
+    def _timeout(self) -> float:
+        # Caller must hold the lock
+        if len(self._latencies) < self.min_samples:
+            return self.max_timeout
+        adaptive = self._percentiles()['p99'] * self.timeout_multiplier
+        return min(max(adaptive, self.min_timeout), self.max_timeout)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                'state': self.state, 'timeout': self._timeout(), 'latency': self._percentiles(),
+                'successes': self.successes, 'failures': self.failures,
+                'rejected': self.rejected, 'opened': self.opened,
+            }
+
+
+class UpstreamHealth:
+    """Circuit breakers for Wikipedia, DuckDuckGo and every scraped host, created on first use.
+    
+    Scraped hosts are kept in LRU order and only the max_hosts most recent ones are tracked.
+    """
+
+    def __init__(self, max_hosts: int = 1024, **breaker_options):
+        self.max_hosts, self.breaker_options = max_hosts, breaker_options
+        self._breakers: "OrderedDict[str, CircuitBreaker]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = CircuitBreaker(name, **self.breaker_options)
+                hosts = [key for key in self._breakers if key.startswith('scrape:')]
+                for key in hosts[:max(len(hosts) - self.max_hosts, 0)]:
+                    del self._breakers[key]
+            else:
+                self._breakers.move_to_end(name)
+            return breaker
+
+    @staticmethod
+    def scrape_upstream(url: str) -> str:
+        """Breaker name for a scraped URL: one per host."""
+        return f"scrape:{(urlparse(url).hostname or url).lower()}"
+
+    @contextmanager
+    def call(self, name: str, expected: Tuple[type, ...] = ()) -> Iterator[float]:
+        """Guard one upstream call, yielding its read timeout and recording how it went.
+        
+        Exceptions listed in expected mean the upstream answered normally and count as successes.
+        """
+        breaker = self.breaker(name)
+        read_timeout = breaker.before_call()
+        started = time.perf_counter()
+        try:
+            yield read_timeout
+        except expected:
+            breaker.record_success(time.perf_counter() - started)
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record_success(time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, Dict[str, object]]:
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.stats() for breaker in breakers}
+
+
+class AsyncHttpClient:
+    """Non-blocking counterpart of HttpClient for the asyncio request path, backed by aiohttp.
+    
+    An aiohttp session is bound to the event loop it was created on, so each loop gets its own,
+    opened lazily on first use inside that loop. close() must be awaited on a loop before it
+    ends to release that loop's connections.
+    """
+
+    def __init__(self, limit: int = 200, limit_per_host: int = 20,
+                 connect_timeout: float = 3.05, read_timeout: float = 10.0):
+        self.limit, self.limit_per_host = limit, limit_per_host
+        self.connect_timeout, self.read_timeout = connect_timeout, read_timeout
+        self._sessions: Dict[asyncio.AbstractEventLoop, object] = {}
+        self._lock = threading.Lock()
+
+    def _get_session(self):
+        import aiohttp
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host),
+                timeout=aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout),
+                headers={'User-Agent': BROWSER_USER_AGENT, 'Accept-Encoding': 'gzip, deflate'},
+                trace_configs=[self._trace_config()],
+            )
+            with self._lock:
+                # A loop that has already closed can no longer run its session's close()
+                for stale in [other for other in self._sessions if other.is_closed()]:
+                    del self._sessions[stale]
+                self._sessions[loop] = session
+        return session
+
+    @staticmethod
+    def _trace_config():
+        """aiohttp hooks that time DNS, connect and first byte for requests issued under a RequestTrace."""
+        import aiohttp
+
+        def hook(field: str):
+            async def record(session, context, params):
+                timing = context.trace_request_ctx
+                if timing is not None:
+                    timing[field] = time.perf_counter()
+            return record
+
+        async def reused(session, context, params):
+            if context.trace_request_ctx is not None:
+                context.trace_request_ctx['connection'] = 'reused'
+
+        config = aiohttp.TraceConfig()
+        config.on_dns_resolvehost_start.append(hook('dns_start'))
+        config.on_dns_resolvehost_end.append(hook('dns_end'))
+        config.on_connection_create_start.append(hook('connect_start'))
+        config.on_connection_create_end.append(hook('connect_end'))
+        config.on_connection_reuseconn.append(reused)
+        config.on_request_end.append(hook('headers'))
+        return config
+
+    @staticmethod
+    def _traced(kwargs: Dict) -> Optional[Dict[str, object]]:
+        """Attach a timing dict to the request kwargs when the current request is being traced."""
+        if _current_trace.get() is None:
+            return None
+        timing = kwargs['trace_request_ctx'] = {'started': time.perf_counter()}
+        return timing
+
+    @staticmethod
+    def _trace_end(timing: Optional[Dict[str, object]], response, received: int) -> None:
+        trace = _current_trace.get()
+        if timing is None or trace is None:
+            return
+        started = timing['started']
+        dns = timing['dns_end'] - timing['dns_start'] if 'dns_end' in timing else None
+        connect = None
+        if 'connect_end' in timing:
+            connect = timing['connect_end'] - timing['connect_start'] - (dns or 0)
+        ttfb = timing['headers'] - started if 'headers' in timing else None
+        trace.upstream(str(response.url), response.status, received, time.perf_counter() - started, ttfb=ttfb,
+                       dns=dns, connect=connect, connection=timing.get('connection', 'new'))
+
+    def timeout_for(self, read_timeout: Optional[float]):
+        """aiohttp timeout with the session's connect timeout and the given read timeout."""
+        import aiohttp
+        return aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=read_timeout or self.read_timeout)
+
+    async def get_text(self, url: str, **kwargs) -> Tuple[int, str]:
+        """GET a URL and return its status code and decoded body."""
+        timing = self._traced(kwargs)
+        async with self._get_session().get(url, **kwargs) as response:
+            body = await response.read()
+            self._trace_end(timing, response, len(body))
+            return response.status, await response.text(errors='replace')
+
+    async def fetch_page(self, url: str, max_bytes: int, stats: PageFetchStats, headers: Optional[Dict[str, str]] = None,
+                         read_timeout: Optional[float] = None) -> FetchedPage:
+        """Async variant of HttpClient.fetch_page."""
+        kwargs = {'headers': headers, 'timeout': self.timeout_for(read_timeout)}
+        timing = self._traced(kwargs)
+        async with self._get_session().get(url, **kwargs) as response:
+            content_length = _body_length(response.headers)
+            mime = _check_page_headers(url, response.headers.get('Content-Type', ''), content_length, stats)
+            
+            truncated = content_length is not None and content_length > max_bytes
+            chunks, received = [], 0
+            async for chunk in response.content.iter_chunked(min(16384, max_bytes)):
+                if received + len(chunk) > max_bytes:
+                    chunks.append(chunk[:max_bytes - received])
+                    received = max_bytes
+                    truncated = True
+                    break
+                chunks.append(chunk)
+                received += len(chunk)
+                if truncated and received == max_bytes:
+                    break
+            if truncated:
+                response.close()
+            
+            saved = content_length - received if truncated and content_length is not None else 0
+            stats.record(bytes_read=received, bytes_saved=saved, truncated=truncated)
+            self._trace_end(timing, response, received)
+            return FetchedPage(str(response.url), response.status, mime, response.charset, b"".join(chunks), truncated,
+                               response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
+    async def get_bytes(self, url: str, **kwargs) -> Tuple[int, Dict[str, str], bytes]:
+        """GET a URL and return its status code, headers and raw body."""
+        timing = self._traced(kwargs)
+        async with self._get_session().get(url, **kwargs) as response:
+            body = await response.read()
+            self._trace_end(timing, response, len(body))
+            return response.status, dict(response.headers), body
+
+    async def get_json(self, url: str, **kwargs) -> Dict:
+        """GET a URL and decode its body as JSON."""
+        timing = self._traced(kwargs)
+        async with self._get_session().get(url, **kwargs) as response:
+            body = await response.read()
+            self._trace_end(timing, response, len(body))
+            return await response.json(content_type=None)
+
+    async def close(self) -> None:
+        """Close the running loop's aiohttp session and its connections."""
+        with self._lock:
+            session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+
+
+THINKING_PAUSES = (
+    "Hmm, let me think about this... ",
+    "Let me see... ",
+    "Give me a second to gather my thoughts... ",
+    "That's an interesting question! ",
+    "Oh, I know about this! ",
+)
+
+CLOSING_PHRASES = (
+    " I hope that helps you understand!",
+    " Let me know if you have any other questions about this!",
+    " Does that explain it well enough for you?",
+    " What do you think about that? Pretty interesting, right?",
+    " I find this topic super fascinating, don't you?",
+    " I'm really curious to hear your thoughts on this too!",
+    " Would you like to know more about any specific part of this?",
+    " I could go on about this for hours, but I'll stop here for now!",
+    " That's the simple explanation, but there's so much more to explore!",
+    " I just learned about this recently myself and found it fascinating!",
+    " Feel free to ask if anything isn't clear, I'm happy to explain more!",
+)
+
+# (sentence ending replaced, replacement)
+EMOTIONAL_EXPRESSIONS = (
+    (".", " Wow!."),
+    (".", " Amazing!."),
+    (".", " Incredible!."),
+    (".", " Fascinating!."),
+    (".", " Isn't that cool?."),
+    ("!", " So exciting!"),
+    (".", " That's really something!."),
+    (".", " Pretty mind-blowing, right?."),
+    (".", " I love learning about this stuff!."),
+)
+
+FILLER_PHRASES = (
+    " Actually, ",
+    " You know what, ",
+    " Interestingly enough, ",
+    " By the way, ",
+    " I should probably mention that ",
+    " It's definitely worth noting that ",
+    " Also, I think ",
+    " Oh, and ",
+    " This is cool - ",
+    " Here's something neat: ",
+    " Just between us, ",
+    " Fun fact: ",
+    " To be honest, ",
+    " I didn't know this before, but ",
+    " I've been thinking about this, and ",
+)
+
+PERSONAL_REACTIONS = (
+    " I personally find this really interesting because ",
+    " This reminds me of ",
+    " I've always wondered about this, especially ",
+    " The way I see it, ",
+    " From my perspective, ",
+    " I think what's most fascinating here is ",
+    " What stands out to me is ",
+    " I'd never thought about it this way before, but ",
+)
+
+TYPOS = tuple((re.compile(pattern), replacement) for pattern, replacement in (
+    (r"\b(the)\b", "teh... I mean, the"),
+    (r"\b(and)\b", "adn... sorry, and"),
+    (r"\b(that)\b", "taht... oops, that"),
+    (r"\b(with)\b", "wiht... *with"),
+    (r"\b(information)\b", "informaiton... information"),
+    (r"\b(because)\b", "becuase... because"),
+))
+
+# A sentence ends at . ! or ? followed by whitespace, unless the word before is an abbreviation, or an
+# initial followed by a name ("John F. Kennedy"). A lone capital before a new sentence ("World War I. The")
+# still ends one, so a capitalised word only continues an initial when it is not a common sentence opener.
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+ABBREVIATION_END = re.compile(r"(?:\b(?:Mr|Mrs|Ms|Dr|Prof|St|Jr|Sr|vs|etc|No|Inc|Ltd|Co|Mt|ca|approx)|\.[A-Za-z]|"
+                              r"\b(?P<initial>[A-Z]))\.$")
+# Longest abbreviation plus the character before it, which decides the word boundary
+ABBREVIATION_TAIL = len("approx.") + 1
+NAME_START = re.compile(r"[A-Z]\.|(?!(?:The|This|That|These|Those|There|Then|It|Its|He|She|They|We|You|His|Her|Their|Our|My|"
+                        r"In|On|At|By|For|From|With|As|But|And|Or|So|If|When|While|After|Before|However|Some|Many|Most|"
+                        r"All|Each|One|Not)\b)[A-Z][a-z]")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences with one precompiled regex, keeping URLs and abbreviations intact."""
+    sentences = []
+    for piece in SENTENCE_BOUNDARY.split(text.strip()):
+        if sentences:
+            end = ABBREVIATION_END.search(sentences[-1][-ABBREVIATION_TAIL:])
+            if end and (end.group('initial') is None or NAME_START.match(piece)):
+                sentences[-1] += " " + piece
+                continue
+        if piece:
+            sentences.append(piece)
+    return sentences
+
+
+class Humanizer:
+    """Adds conversational phrasing to answers using phrase tables and regexes compiled at import.
+    
+    Sentences are split with split_sentences unless use_nltk is set, in which case NLTK's punkt
+    tokenizer is used when its data is installed. rng defaults to the random module; pass a seeded
+    random.Random for reproducible output.
+    """
+
+    def __init__(self, intros: List[str], rng: Optional[random.Random] = None, use_nltk: bool = False):
+        self.intros = tuple(intros)
+        self.rng = rng or random
+        self.use_nltk = use_nltk
+        self._sent_tokenize = None
+
+    def split(self, text: str) -> List[str]:
+        if self.use_nltk:
+            try:
+                if self._sent_tokenize is None:
+                    with _nltk_lock:
+                        from nltk.tokenize import sent_tokenize
+                        sent_tokenize("Loading punkt. Done.")
+                        self._sent_tokenize = sent_tokenize
+                return self._sent_tokenize(text)
+            except LookupError:
+                logging.warning("NLTK punkt data not installed, using the built-in sentence splitter")
+                self.use_nltk = False
+        return split_sentences(text)
+
+    def humanize(self, response: str) -> str:
+        """Open the response with an intro phrase and sprinkle conversational elements through it."""
+        intro = self.intro()
+        sentences = self.sentences(response)
+        if not sentences:
+            return response
+        return intro + " ".join(sentences)
+
+    def intro(self) -> str:
+        """Pick the human-like introduction phrase that opens a humanized response."""
+        rng = self.rng
+        intro = rng.choice(self.intros)
+        # 15% chance to add a thinking pause at the beginning
+        if rng.random() < 0.15:
+            intro = rng.choice(THINKING_PAUSES) + intro.lower()
+        return intro
+
+    def sentences(self, response: str) -> List[str]:
+        """Split a response into sentences and sprinkle in conversational elements."""
+        sentences = self.split(response)
+        if not sentences:
+            return sentences
+        rng = self.rng
+        
+        # 30% chance to add an emotional expression to a random sentence other than the last
+        if rng.random() < 0.3 and len(sentences) > 1:
+            i = rng.randint(0, len(sentences) - 2)
+            ending, expression = rng.choice(EMOTIONAL_EXPRESSIONS)
+            if sentences[i].endswith(ending):
+                sentences[i] = sentences[i][:-1] + expression
+        
+        # 85% chance to close longer responses (more than 2 sentences) with a closing phrase
+        if len(sentences) > 2 and rng.random() < 0.85:
+            sentences[-1] = sentences[-1].rstrip('.') + rng.choice(CLOSING_PHRASES)
+        
+        if len(sentences) > 1:
+            # 40% chance of a filler before each of the second and third sentences (never the last)
+            for i in range(1, min(len(sentences) - 1, 3)):
+                if rng.random() < 0.4:
+                    sentences[i] = rng.choice(FILLER_PHRASES) + sentences[i][0].lower() + sentences[i][1:]
+            
+            # 30% chance to add a personal reaction
+            if rng.random() < 0.3 and len(sentences) > 2:
+                i = rng.randint(1, min(len(sentences) - 1, 3))
+                reaction = rng.choice(PERSONAL_REACTIONS)
+                if "Source:" not in sentences[i] and "URL:" not in sentences[i]:
+                    sentences[i] = reaction + sentences[i][0].lower() + sentences[i][1:]
+        
+        # 20% chance to add a typing mistake and correction
+        if rng.random() < 0.2:
+            pattern, replacement = rng.choice(TYPOS)
+            for i, sentence in enumerate(sentences):
+                match = pattern.search(sentence)
+                if match and "Source:" not in sentence and "URL:" not in sentence:
+                    sentences[i] = sentence[:match.start()] + replacement + sentence[match.end():]
+                    break
+        
+        return sentences
+
+
+MARKOV_SEED_TEXT = " ".join([
+    "I really appreciate your question about this topic.",
+    "Let me share what I know about it.",
+    "This is actually something I find fascinating.",
+    "From what I understand, there are several important aspects to consider.",
+    "Many experts in the field have different opinions on this matter.",
+    "It's worth noting that this is a complex subject with various perspectives.",
+    "I hope this information helps answer your question.",
+    "Please let me know if you'd like me to elaborate further on any point.",
+    "I'm happy to continue this conversation if you have more questions.",
+    "This kind of reminds me of something I read recently about a related topic.",
+    "You might also find it interesting to explore some of the connections to other areas.",
+    "What I find particularly noteworthy about this is how it affects everyday life.",
+    "Many people don't realize how important this actually is in the bigger picture.",
+    "I think the key takeaway here is to consider multiple sources of information.",
+    "Let me know if that makes sense or if you'd like me to clarify anything."
+])
+
+DEFAULT_SENTENCE_STARTERS = [("I", "think"), ("Let", "me"), ("This", "is"), ("What", "I"), ("From", "my"),
+                             ("Interestingly", "enough")]
+
+
+class MarkovModel:
+    """Second-order word Markov chain stored in flat integer arrays.
+    
+    Words are interned to 21-bit ids. Each (w1, w2) state is one 64-bit key in the sorted
+    `states` array; its successors occupy successors[offsets[i]:offsets[i + 1]] together with
+    running totals of their counts in cumulative, and transitions[j] is the index of the state
+    successor j leads to (-1 for a dead end), so a step is one bisect and no hashing. The
+    vocabulary is one UTF-8 buffer sliced by word_offsets rather than a list of str objects.
+    Reading a Python object writes its reference count, so a forked worker that walked a word
+    list would copy every page of strings it visited; the model's data lives in a handful of
+    flat buffers instead, and only the few pages holding their object headers get copied.
+    """
+
+    WORD_BITS = 21
+    MAX_WORDS = (1 << WORD_BITS) - 1
+
+    def __init__(self, vocabulary: bytes, word_offsets: array, states: array, offsets: array,
+                 successors: array, cumulative: array, transitions: array, starters: array):
+        self.vocabulary, self.word_offsets, self.states, self.offsets = vocabulary, word_offsets, states, offsets
+        self.successors, self.cumulative, self.transitions, self.starters = successors, cumulative, transitions, starters
+
+    @classmethod
+    def build(cls, tokens: Iterator[str]) -> "MarkovModel":
+        """Count the trigrams of a token stream and pack them into a model."""
+        ids: Dict[str, int] = {}
+        words: List[str] = []
+        counts: Dict[int, int] = defaultdict(int)
+        shift = cls.WORD_BITS
+        w1 = w2 = None
+        for token in tokens:
+            w3 = ids.get(token)
+            if w3 is None and len(words) < cls.MAX_WORDS:
+                w3 = ids[token] = len(words)
+                words.append(token)
+            if w1 is not None and w2 is not None and w3 is not None:
+                counts[(w1 << 2 * shift) | (w2 << shift) | w3] += 1
+            w1, w2 = w2, w3
+
+        states, offsets, successors, cumulative = array('Q'), array('Q'), array('L'), array('Q')
+        mask = (1 << shift) - 1
+        trigrams = sorted(counts)
+        for trigram in trigrams:
+            state = trigram >> shift
+            if not states or states[-1] != state:
+                states.append(state)
+                offsets.append(len(successors))
+                total = 0
+            total += counts[trigram]
+            successors.append(trigram & mask)
+            cumulative.append(total)
+        offsets.append(len(successors))
+        # The state a trigram (w1, w2, w3) leads to is (w2, w3), its low two words
+        transitions, count = array('q'), len(states)
+        for trigram in trigrams:
+            target = trigram & ((1 << 2 * shift) - 1)
+            i = bisect_left(states, target)
+            transitions.append(i if i < count and states[i] == target else -1)
+
+        starters = array('L', (i for i, state in enumerate(states)
+                               if words[state >> shift][:1].isupper() or words[state >> shift] == "i"))
+        encoded = [word.encode('utf-8') for word in words]
+        word_offsets = array('Q', [0])
+        for word in encoded:
+            word_offsets.append(word_offsets[-1] + len(word))
+        return cls(b"".join(encoded), word_offsets, states, offsets, successors, cumulative, transitions, starters)
+
+    def generate(self, length: int = 25, rng: random.Random = random) -> str:
+        """Random walk of up to length words after a randomly chosen sentence starter."""
+        if not self.starters:
+            return " ".join(rng.choice(DEFAULT_SENTENCE_STARTERS))
+        
+        shift, mask = self.WORD_BITS, (1 << self.WORD_BITS) - 1
+        # Hot loop: everything it touches is bound to a local
+        offsets, successors, cumulative, transitions = self.offsets, self.successors, self.cumulative, self.transitions
+        vocabulary, bounds, draw = self.vocabulary, self.word_offsets, rng.random
+        index = self.starters[int(draw() * len(self.starters))]
+        state = self.states[index]
+        first, second = state >> shift, state & mask
+        result = [vocabulary[bounds[first]:bounds[first + 1]], vocabulary[bounds[second]:bounds[second + 1]]]
+        for _ in range(length):
+            start, end = offsets[index], offsets[index + 1]
+            # Running totals restart at every state, so the last one is the state's total count
+            pick = bisect_right(cumulative, draw() * cumulative[end - 1], start, end)
+            word = successors[pick]
+            result.append(vocabulary[bounds[word]:bounds[word + 1]])
+            index = transitions[pick]
+            if index < 0:
+                break
+        return b" ".join(result).decode('utf-8')
+
+    def stats(self) -> Dict[str, int]:
+        """Return the vocabulary, state and transition counts and the packed size in bytes."""
+        arrays = (self.word_offsets, self.states, self.offsets, self.successors, self.cumulative, self.transitions,
+                  self.starters)
+        return {'words': len(self.word_offsets) - 1, 'states': len(self.states), 'transitions': len(self.successors),
+                'bytes': len(self.vocabulary) + sum(a.itemsize * len(a) for a in arrays)}
+
+
+def _corpus_tokens(path: str) -> Iterator[str]:
+    """Stream the whitespace-separated words of a text corpus, plain or gzipped, line by line."""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            yield from line.split()
+
+
+_markov_model: Optional[MarkovModel] = None
+_markov_lock = threading.Lock()
+
+
+def get_markov_model() -> MarkovModel:
+    """Return the process-wide Markov model, building it on first use.
+    
+    The model is built from the seed phrases plus the corpus in INFOBOT_MARKOV_CORPUS, if set.
+    """
+    global _markov_model
+    with _markov_lock:
+        if _markov_model is None:
+            def tokens():
+                yield from MARKOV_SEED_TEXT.split()
+                corpus = os.environ.get('INFOBOT_MARKOV_CORPUS')
+                if corpus:
+                    yield from _corpus_tokens(corpus)
+            try:
+                _markov_model = MarkovModel.build(tokens())
+            except OSError as e:
+                logging.warning(f"Could not read the Markov corpus, using the seed phrases only: {str(e)}")
+                _markov_model = MarkovModel.build(iter(MARKOV_SEED_TEXT.split()))
+            logging.info(f"Markov model built: {_markov_model.stats()}")
+        return _markov_model
+
+
+class _IdentityLemmatizer:
+    """Stand-in for WordNetLemmatizer when the WordNet data is not installed."""
+
+    @staticmethod
+    def lemmatize(word: str, pos: str = 'n') -> str:
+        return word
 
 
 class InfoBot:
     def __init__(self):
-        self.lemmatizer, self.stop_words = WordNetLemmatizer(), set(stopwords.words('english'))
-        self.conversation_history = []
-        self.wiki_wiki = wikipediaapi.Wikipedia('InfoBot (info@example.com)', 'en')
+        self._lemmatizer, self._stop_words, self._word_tokenize = None, None, None
+        self.conversations = ConversationStore(
+            max_turns=_env_int('INFOBOT_HISTORY_TURNS', 20),
+            max_sessions=_env_int('INFOBOT_MAX_SESSIONS', 10000),
+            max_bytes=_env_int('INFOBOT_HISTORY_MAX_BYTES', 64 * 1024 * 1024),
+            idle_ttl=_env_float('INFOBOT_SESSION_IDLE_TTL', 1800.0),
+        )
+        self.http = HttpClient(
+            pool_size=_env_int('INFOBOT_HTTP_POOL_SIZE', 10),
+            host_pool_sizes=_parse_host_pool_sizes(os.environ.get(
+                'INFOBOT_HTTP_HOST_POOLS', 'en.wikipedia.org=20,lite.duckduckgo.com=10')),
+            connect_timeout=_env_float('INFOBOT_HTTP_CONNECT_TIMEOUT', 3.05),
+            read_timeout=_env_float('INFOBOT_HTTP_READ_TIMEOUT', 10.0),
+            retries=_env_int('INFOBOT_HTTP_RETRIES', 2),
+            backoff_factor=_env_float('INFOBOT_HTTP_BACKOFF', 0.3),
+        )
+        self.aio = AsyncHttpClient(
+            limit=_env_int('INFOBOT_ASYNC_HTTP_LIMIT', 200),
+            limit_per_host=_env_int('INFOBOT_ASYNC_HTTP_LIMIT_PER_HOST', 20),
+            connect_timeout=_env_float('INFOBOT_HTTP_CONNECT_TIMEOUT', 3.05),
+            read_timeout=_env_float('INFOBOT_HTTP_READ_TIMEOUT', 10.0),
+        )
+        self.upstreams = UpstreamHealth(
+            failure_threshold=_env_int('INFOBOT_BREAKER_FAILURES', 5),
+            reset_timeout=_env_float('INFOBOT_BREAKER_RESET_SECONDS', 30.0),
+            max_timeout=_env_float('INFOBOT_HTTP_READ_TIMEOUT', 10.0),
+            min_timeout=_env_float('INFOBOT_HTTP_MIN_READ_TIMEOUT', 1.0),
+            timeout_multiplier=_env_float('INFOBOT_HTTP_TIMEOUT_MULTIPLIER', 3.0),
+        )
+        self.scrape_max_bytes = _env_int('INFOBOT_SCRAPE_MAX_BYTES', 1024 * 1024)
+        self.page_stats = PageFetchStats()
+        self.scrape_stats = ScrapeStats()
+        self.page_cache = _open_page_cache()
+        # Offline Wikipedia abstracts (see wiki_index.py), opened on the first question
+        self.wiki_index_path = os.environ.get('INFOBOT_WIKI_INDEX', '')
+        self._wiki_index = None
+        self.page_cache_ttls = {
+            'wikipedia': _env_float('INFOBOT_PAGE_CACHE_TTL_WIKIPEDIA', 86400.0),
+            'web_scrape': _env_float('INFOBOT_PAGE_CACHE_TTL_WEB_SCRAPE', 3600.0),
+        }
+        # Passages of every summary and page fetched so far, searched before going to the network
+        self.content_index = None
+        if _env_bool('INFOBOT_CONTENT_INDEX', True):
+            self.content_index = ContentIndex(self.preprocess_text,
+                                              max_passages=_env_int('INFOBOT_CONTENT_INDEX_MAX_PASSAGES', 5000))
+            self._restore_content_index(os.environ.get('INFOBOT_CONTENT_INDEX_SNAPSHOT', ''))
+        self.content_index_min_score = _env_float('INFOBOT_CONTENT_INDEX_MIN_SCORE', 6.0)
+        self.content_index_min_coverage = _env_float('INFOBOT_CONTENT_INDEX_MIN_COVERAGE', 1.0)
+        # A hit scoring this high is served before Wikipedia is asked at all
+        self.content_index_confident_score = _env_float('INFOBOT_CONTENT_INDEX_CONFIDENT_SCORE', 10.0)
+        # Hedged mode runs Wikipedia and DuckDuckGo concurrently instead of back to back
+        self.hedged_lookup = _env_bool('INFOBOT_HEDGED_LOOKUP', False)
+        self.hedge_delay = _env_float('INFOBOT_HEDGE_DELAY_MS', 0.0) / 1000.0
+        self.executor = ThreadPoolExecutor(max_workers=_env_int('INFOBOT_LOOKUP_WORKERS', 16),
+                                           thread_name_prefix='infobot-lookup')
+        # Batch questions resolve on their own pool: a batch worker may itself wait on self.executor
+        self.batch_executor = ThreadPoolExecutor(max_workers=_env_int('INFOBOT_BATCH_WORKERS', 8),
+                                                 thread_name_prefix='infobot-batch')
+        self.batch_max_size = _env_int('INFOBOT_BATCH_MAX_SIZE', 32)
         self.search_engines = {'wikipedia': self.search_wikipedia, 'duckduckgo': self.search_duckduckgo, 'web_scrape': self.scrape_website}
-        self.greeting_patterns = [r'hello', r'hi', r'hey', r'greetings', r'howdy', r'hola']
-        self.farewell_patterns = [r'bye', r'goodbye', r'farewell', r'see you', r'cya']
-        self.question_patterns = [r'what is', r'who is', r'where is', r'when is', r'why is', r'how to', r'can you', 
-                                r'could you', r'tell me about', r'explain', r'information on', r'search for']
+        self.metrics = PipelineMetrics(enabled=_env_bool('INFOBOT_METRICS', True))
+        self.single_flight = SingleFlight()
+        self.answer_cache = AnswerCache(
+            ttls={
+                'wikipedia': _env_float('INFOBOT_CACHE_TTL_WIKIPEDIA', 3600.0),
+                'duckduckgo': _env_float('INFOBOT_CACHE_TTL_DUCKDUCKGO', 900.0),
+                'web_scrape': _env_float('INFOBOT_CACHE_TTL_WEB_SCRAPE', 300.0),
+            },
+            max_entries=_env_int('INFOBOT_CACHE_MAX_ENTRIES', 1024),
+            max_bytes=_env_int('INFOBOT_CACHE_MAX_BYTES', 16 * 1024 * 1024),
+        )
+        self.greeting_patterns = ['hello', 'hi', 'hey', 'greetings', 'howdy', 'hola']
+        self.farewell_patterns = ['bye', 'goodbye', 'farewell', 'see you', 'cya']
+        self.question_patterns = ['what is', 'who is', 'where is', 'when is', 'why is', 'how to', 'can you', 
+                                'could you', 'tell me about', 'explain', 'information on', 'search for']
+        self.intents = IntentClassifier([
+            ("greeting", self.greeting_patterns),
+            ("farewell", self.farewell_patterns),
+            ("question", self.question_patterns),
+        ])
         
         
         self.human_phrases = self._load_human_phrases()
-        self.transition_model = self._build_transition_model()
-        self.sentence_starters = self._extract_sentence_starters()
+        self.humanizer = Humanizer(self.human_phrases, use_nltk=_env_bool('INFOBOT_NLTK_SENTENCES', False))
+        self.markov = get_markov_model()
         
         logging.info("InfoBot initialized")
         
-    def _load_human_phrases(self) -> List[str]:
+    @staticmethod
+    def _load_human_phrases() -> List[str]:
         """Load sample human-like phrases for more natural-sounding responses."""
         return [
             "I've been looking into this, and ",
@@ -98,209 +2038,769 @@ class InfoBot:
             "Let me break this down for you: "
         ]
     
-    def _build_transition_model(self) -> Dict[Tuple[str, str], List[str]]:
-        """Build a simple Markov chain model for text generation from predefined phrases."""
-        model = defaultdict(list)
-        
-        human_text = " ".join([
-            "I really appreciate your question about this topic.",
-            "Let me share what I know about it.",
-            "This is actually something I find fascinating.",
-            "From what I understand, there are several important aspects to consider.",
-            "Many experts in the field have different opinions on this matter.",
-            "It's worth noting that this is a complex subject with various perspectives.",
-            "I hope this information helps answer your question.",
-            "Please let me know if you'd like me to elaborate further on any point.",
-            "I'm happy to continue this conversation if you have more questions.",
-            "This kind of reminds me of something I read recently about a related topic.",
-            "You might also find it interesting to explore some of the connections to other areas.",
-            "What I find particularly noteworthy about this is how it affects everyday life.",
-            "Many people don't realize how important this actually is in the bigger picture.",
-            "I think the key takeaway here is to consider multiple sources of information.",
-            "Let me know if that makes sense or if you'd like me to clarify anything."
-        ])
+    @property
+    def lemmatizer(self):
+        """WordNet lemmatizer, loaded on first use."""
+        if self._lemmatizer is None:
+            with _nltk_lock:
+                if self._lemmatizer is None:
+                    from nltk.stem import WordNetLemmatizer
+                    lemmatizer = WordNetLemmatizer()
+                    try:
+                        lemmatizer.lemmatize('warmup')
+                    except LookupError:
+                        logging.warning("WordNet data not installed, skipping lemmatization")
+                        lemmatizer = _IdentityLemmatizer()
+                    self._lemmatizer = lemmatizer
+        return self._lemmatizer
+    
+    def warm_up(self) -> None:
+        """Load everything that is otherwise loaded on first use, so that preforked workers share it.
+        
+        Neither the network nor the page cache is touched: sockets and SQLite connections must
+        not be carried across a fork.
+        """
+        with startup_phase('warm_up'):
+            self.stop_words, self.lemmatizer
+            self.preprocess_text("Warming up the tokenizers")
+            self.humanizer.split("Warming up. Sentences are split here.")
+            self.wiki_index
+            try:
+                self._extract_article('about:blank', b'<html><body><p>Warming up the extractors.</p></body></html>')
+            except Exception as e:
+                logging.warning(f"Could not warm up trafilatura: {str(e)}")
+            self._page_text('about:blank', b'<html><body><p>Warming up BeautifulSoup.</p></body></html>')
+    
+    def metrics_text(self) -> str:
+        """Stage metrics plus cache, connection pool, breaker, coalescing and scrape stats in Prometheus format."""
+        lines = self.metrics.render()
+        
+        cache = self.answer_cache.stats()
+        lines += prometheus_metric('infobot_answer_cache_entries', 'gauge', 'Answers held in the answer cache.', [({}, cache['entries'])])
+        lines += prometheus_metric('infobot_answer_cache_bytes', 'gauge', 'Approximate size of the answer cache.', [({}, cache['bytes'])])
+        lines += prometheus_metric('infobot_answer_cache_evictions_total', 'counter', 'Answers evicted from the answer cache.',
+                                   [({}, cache['evictions'])])
+        lines += prometheus_metric('infobot_answer_cache_requests_total', 'counter', 'Answer cache lookups by result.',
+                                   [({'source': source, 'result': result}, count)
+                                    for result in ('hits', 'misses') for source, count in sorted(cache[result].items())])
+        
+        flights = self.single_flight.stats()
+        lines += prometheus_metric('infobot_upstream_fetches_total', 'counter', 'Upstream fetches performed after a cache miss.',
+                                   [({'source': source}, count) for source, count in sorted(flights['fetches'].items())])
+        lines += prometheus_metric('infobot_upstream_coalesced_total', 'counter', 'Upstream fetches saved by coalescing.',
+                                   [({'source': source}, count) for source, count in sorted(flights['coalesced'].items())])
+        
+        pools = self.http.stats()
+        for field, help_text in (('requests', 'Requests sent'), ('new', 'Connections opened'), ('reused', 'Requests on a reused connection')):
+            lines += prometheus_metric(f'infobot_http_pool_{field}_total', 'counter', f'{help_text}, per host.',
+                                       [({'host': host}, counts[field]) for host, counts in sorted(pools.items())])
+        lines += prometheus_metric('infobot_http_pool_open_connections', 'gauge', 'Idle keep-alive connections, per host.',
+                                   [({'host': host}, counts['open']) for host, counts in sorted(pools.items())])
+        
+        breakers = self.upstreams.stats()
+        lines += prometheus_metric('infobot_upstream_breaker_open', 'gauge', 'Whether the upstream circuit breaker is open (1) or half-open (0.5).',
+                                   [({'upstream': name}, {'closed': 0, 'half_open': 0.5, 'open': 1}[stats['state']])
+                                    for name, stats in sorted(breakers.items())])
+        lines += prometheus_metric('infobot_upstream_read_timeout_seconds', 'gauge', 'Current adaptive read timeout.',
+                                   [({'upstream': name}, stats['timeout']) for name, stats in sorted(breakers.items())])
+        lines += prometheus_metric('infobot_upstream_latency_seconds', 'gauge', 'Recent upstream latency percentiles.',
+                                   [({'upstream': name, 'quantile': int(quantile[1:]) / 100}, seconds)
+                                    for name, stats in sorted(breakers.items()) for quantile, seconds in stats['latency'].items()])
+        lines += prometheus_metric('infobot_upstream_calls_total', 'counter', 'Upstream calls by result.',
+                                   [({'upstream': name, 'result': result}, stats[result])
+                                    for name, stats in sorted(breakers.items()) for result in ('successes', 'failures', 'rejected')])
         
-        words = human_text.split()
+        pages = self.page_stats.snapshot()
+        lines += prometheus_metric('infobot_page_fetches_total', 'counter', 'Scraped page downloads by outcome.',
+                                   [({'outcome': outcome}, pages[outcome]) for outcome in ('pages', 'truncated', 'aborted')])
+        lines += prometheus_metric('infobot_page_fetch_bytes_total', 'counter', 'Page bytes read, and skipped by the size cap.',
+                                   [({'kind': 'read'}, pages['bytes_read']), ({'kind': 'saved'}, pages['bytes_saved'])])
         
-        for i in range(len(words) - 2):
-            key = (words[i], words[i+1])
-            model[key].append(words[i+2])
+        scrapes = self.scrape_stats.snapshot()
+        lines += prometheus_metric('infobot_scrape_pages_total', 'counter', 'Scraped pages, per extractor that produced the text.',
+                                   [({'extractor': extractor}, count) for extractor, count in sorted(scrapes['extractors'].items())])
+        lines += prometheus_metric('infobot_scrape_stage_seconds_total', 'counter', 'Time spent in each scrape pipeline stage.',
+                                   [({'stage': stage}, seconds) for stage, seconds in sorted(scrapes['stage_seconds'].items())])
         
-        return model
+        if self.page_cache is not None:
+            stored = self.page_cache.stats()
+            lines += prometheus_metric('infobot_page_cache_documents', 'gauge', 'Documents held in the page cache.',
+                                       [({}, stored['documents'])])
+            lines += prometheus_metric('infobot_page_cache_bytes', 'gauge', 'Stored size of the page cache.', [({}, stored['bytes'])])
+        
+        sessions = self.conversations.stats()
+        lines += prometheus_metric('infobot_conversation_sessions', 'gauge', 'Live conversation sessions.', [({}, sessions['sessions'])])
+        lines += prometheus_metric('infobot_process_memory_bytes', 'gauge', 'Resident memory of this worker process.',
+                                   [({'kind': kind}, size) for kind, size in process_memory().items()])
+        return "\n".join(lines) + "\n"
+    
+    def _restore_content_index(self, path: str) -> None:
+        """Load the content index snapshot, if any, and merge this process's index back into it at exit.
+        
+        A preforking server should instead call atexit.unregister(infobot.save_content_index) in its
+        master and save_content_index() as each worker exits (start_production.py does), since the
+        master's copy stops learning at the fork.
+        """
+        self.content_index_snapshot = path
+        if not path:
+            return
+        if os.path.exists(path):
+            try:
+                passages = self.content_index.restore(path)
+                logging.info(f"Restored {passages} passages into the content index from {path}")
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"Could not restore the content index from {path}: {str(e)}")
+        atexit.register(self.save_content_index)
+    
+    def save_content_index(self) -> None:
+        """Merge the content index into its snapshot file, if one is configured."""
+        if self.content_index is None or not self.content_index_snapshot:
+            return
+        try:
+            self.content_index.snapshot(self.content_index_snapshot, merge=True)
+        except OSError as e:
+            logging.warning(f"Could not save the content index to {self.content_index_snapshot}: {str(e)}")
+    
+    def _index_content(self, source: str, result: str) -> None:
+        """Queue a freshly fetched Wikipedia summary or scraped page for the content index."""
+        if self.content_index is None or not self._is_presentable(result) or not self._is_usable_answer(result):
+            return
+        if source == 'wikipedia':
+            text, sources = self._split_sources(result)
+            url = sources.split("\n")[0][len("Source:"):].strip()
+        elif source == 'web_scrape' and result.startswith("Content from "):
+            header, _, text = result.partition(":\n\n")
+            url = header[len("Content from "):]
+        else:
+            return
+        # A URL that is already indexed is where a content index answer came from
+        if url and url not in self.content_index:
+            text = text.replace("...\n\n(Content truncated for readability)", "")
+            self.executor.submit(self.content_index.add, url, text)
+    
+    def _content_answer(self, query: str, min_score: Optional[float] = None) -> Optional[str]:
+        """Answer from already fetched content when a passage matches the query closely enough.
+        
+        Consulted with content_index_confident_score before any Wikipedia call, and again with the
+        lower content_index_min_score once the exact-title lookup has missed, so an exact title
+        only takes precedence over weaker hits. A passage qualifies when it scores above the
+        thresholds and every query term also appears in its page's title, so a strongly matching
+        paragraph of a page about something else is never served.
+        """
+        if self.content_index is None:
+            return None
+        min_score = self.content_index_min_score if min_score is None else min_score
+        terms = set(self.preprocess_text(query))
+        for score, coverage, passage in self.content_index.search(query, limit=3):
+            if score < min_score or coverage < self.content_index_min_coverage:
+                break
+            if terms <= set(self.preprocess_text(self._url_title(passage.url))):
+                logging.info(f"Answered from the content index (score {score:.1f}): {query}")
+                trace_branch('content_index')
+                return f"{passage.text}\n\nSource: {passage.url}"
+        return None
+    
+    @staticmethod
+    def _url_title(url: str) -> str:
+        """Page title spelled by the last segment of a URL, e.g. 'Monty Python' for .../wiki/Monty_Python."""
+        segment = unquote(urlparse(url).path.rstrip('/').rsplit('/', 1)[-1])
+        return re.sub(r"[_\-+]|\.html?$", " ", segment)
     
-    def _extract_sentence_starters(self) -> List[Tuple[str, str]]:
-        """Extract sentence starters from the transition model."""
-        starters = []
-        for (w1, w2) in self.transition_model.keys():
-            if w1[0].isupper() or w1 in ["I", "i"]:
-                starters.append((w1, w2))
-        
-        
-        if not starters:
-            starters = [
-                ("I", "think"),
-                ("Let", "me"),
-                ("This", "is"),
-                ("What", "I"),
-                ("From", "my"),
-                ("Interestingly", "enough")
-            ]
+    @property
+    def wiki_index(self):
+        """Offline Wikipedia abstract index from INFOBOT_WIKI_INDEX, or None if there is none."""
+        if self._wiki_index is None and self.wiki_index_path:
+            from wiki_index import WikiIndex
+            try:
+                self._wiki_index = WikiIndex(self.wiki_index_path)
+                logging.info(f"Loaded offline Wikipedia index with {len(self._wiki_index)} abstracts")
+            except (OSError, ValueError) as e:
+                logging.warning(f"Offline Wikipedia index unavailable: {str(e)}")
+                self.wiki_index_path = ''
+        return self._wiki_index
+    
+    def _wikipedia_offline(self, query: str) -> Optional[str]:
+        """Answer from the offline abstract index when it has a page titled like the query.
         
-        return starters
+        A damaged index yields None, so the question falls through to the network lookup.
+        """
+        if self.wiki_index is None:
+            return None
+        try:
+            answer = self._format_wikipedia_answer(self.wiki_index.lookup(query), 1500)
+        except Exception as e:
+            logging.warning(f"Offline Wikipedia index lookup failed for {query!r}: {str(e)}")
+            return None
+        if answer:
+            logging.debug(f"Answered from offline Wikipedia index: {query}")
+            trace_branch('wikipedia:offline_index')
+        return answer
+    
+    @property
+    def stop_words(self) -> set:
+        """English stop words, loaded on first use."""
+        if self._stop_words is None:
+            with _nltk_lock:
+                if self._stop_words is None:
+                    from nltk.corpus import stopwords
+                    try:
+                        self._stop_words = set(stopwords.words('english'))
+                    except LookupError:
+                        logging.warning("NLTK stopwords not installed, keeping all tokens")
+                        self._stop_words = set()
+        return self._stop_words
+    
+    @property
+    def word_tokenize(self) -> Callable[[str], List[str]]:
+        """NLTK's word tokenizer with its punkt data loaded, or a plain regex split without it."""
+        if self._word_tokenize is None:
+            with _nltk_lock:
+                if self._word_tokenize is None:
+                    from nltk.tokenize import word_tokenize
+                    try:
+                        word_tokenize("Loading punkt.")
+                    except LookupError:
+                        word_tokenize = re.compile(r"\w+").findall
+                    self._word_tokenize = word_tokenize
+        return self._word_tokenize
     
     def preprocess_text(self, text: str) -> List[str]:
         """Preprocess text by tokenizing, removing stop words and lemmatizing."""
-        tokens = word_tokenize(text.lower())
+        tokens = self.word_tokenize(text.lower())
         tokens = [self.lemmatizer.lemmatize(token) for token in tokens if token.isalnum()]
         return [token for token in tokens if token not in self.stop_words]
     
     def extract_search_query(self, message: str) -> str:
         """Extract the search query from user message."""
-        cleaned_message = message.lower()
-        for pattern in self.question_patterns:
-            cleaned_message = re.sub(pattern, '', cleaned_message, flags=re.IGNORECASE).strip()
-        return message if len(cleaned_message) < 3 and len(message) > len(cleaned_message) else cleaned_message
+        return self.classify_message(message)[1]
     
     def categorize_message(self, message: str) -> str:
         """Categorize the user message to determine how to process it."""
-        message_lower = message.lower()
-        for pattern in self.greeting_patterns:
-            if re.search(pattern, message_lower): return "greeting"
-        for pattern in self.farewell_patterns:
-            if re.search(pattern, message_lower): return "farewell"
-        for pattern in self.question_patterns:
-            if re.search(pattern, message_lower): return "question"
-        return "general"
+        return self.classify_message(message)[0]
+    
+    def classify_message(self, message: str) -> Tuple[str, str]:
+        """Categorize the user message and extract its search query in a single scan.
+        
+        A message that links to a page is treated as a request to read the first link.
+        """
+        with self.metrics.stage('categorize'):
+            category, query = self.intents.classify(message)
+        with self.metrics.stage('extract_query'):
+            if self.is_url(query):
+                return ("question" if category == "general" else category), query
+            urls = self.extract_urls(message)
+            if urls:
+                return "question", urls[0]
+            return category, query
+    
+    def _cached_lookup(self, source: str, key: str, fetch, arg: str) -> str:
+        """Serve an upstream lookup from the answer cache, fetching and storing it on a miss.
+        
+        Concurrent misses for the same key share a single fetch.
+        """
+        cached = self.answer_cache.get(source, key)
+        if cached is not None:
+            logging.debug(f"Answer cache hit for {source}: {key}")
+            trace_branch(f"{source}:answer_cache")
+            return cached
+        return self.single_flight.do(source, key, self._fetch_and_store, source, key, fetch, arg)
+    
+    async def _cached_lookup_async(self, source: str, key: str, fetch, arg: str) -> str:
+        """Async variant of _cached_lookup for awaitable fetch functions."""
+        cached = self.answer_cache.get(source, key)
+        if cached is not None:
+            logging.debug(f"Answer cache hit for {source}: {key}")
+            trace_branch(f"{source}:answer_cache")
+            return cached
+        return await self.single_flight.do_async(source, key, self._fetch_and_store_async, source, key, fetch, arg)
+    
+    def _fetch_and_store(self, source: str, key: str, fetch, arg: str) -> str:
+        trace_branch(f"{source}:fetch")
+        result = fetch(arg)
+        self._store_answer(source, key, result)
+        return result
+    
+    async def _fetch_and_store_async(self, source: str, key: str, fetch, arg: str) -> str:
+        trace_branch(f"{source}:fetch")
+        result = await fetch(arg)
+        self._store_answer(source, key, result)
+        return result
+    
+    def _store_answer(self, source: str, key: str, result: str) -> None:
+        """Cache and index an upstream answer unless it reports a transient failure."""
+        if not any(phrase in result for phrase in TRANSIENT_ERROR_PHRASES):
+            self.answer_cache.set(source, key, result)
+            self._index_content(source, result)
     
     def search_wikipedia(self, query: str) -> str:
         """Search Wikipedia for the query and return a summary."""
-        logging.info(f"Searching Wikipedia for: {query}")
+        return self._cached_lookup('wikipedia', normalize_query(query), self._search_wikipedia, query)
+    
+    async def search_wikipedia_async(self, query: str) -> str:
+        """Search Wikipedia for the query without blocking the event loop."""
+        return await self._cached_lookup_async('wikipedia', normalize_query(query), self._search_wikipedia_async, query)
+    
+    @staticmethod
+    def _wikipedia_page_params(title: str) -> Dict[str, Union[str, int]]:
+        """MediaWiki query parameters for the plain-text intro extract and URL of a page."""
+        return {'action': 'query', 'prop': 'extracts|info', 'exintro': 1, 'explaintext': 1,
+                'inprop': 'url', 'redirects': 1, 'titles': title, 'format': 'json'}
+    
+    @staticmethod
+    def _wikipedia_search_params(query: str) -> Dict[str, str]:
+        """MediaWiki query parameters for a full-text title search."""
+        return {'action': 'query', 'list': 'search', 'srsearch': query, 'format': 'json'}
+    
+    @staticmethod
+    def _parse_wikipedia_page(data: Dict) -> Optional[Tuple[str, str]]:
+        """Pull (extract, url) out of a page query response, or None if the page does not exist."""
+        pages = data.get('query', {}).get('pages', {})
+        for page_id, page in pages.items():
+            if int(page_id) < 0 or 'missing' in page:
+                continue
+            return page.get('extract', '').strip(), page.get('fullurl', '')
+        return None
+    
+    @staticmethod
+    def _parse_wikipedia_search(data: Dict) -> List[str]:
+        """Pull the top three result titles out of a search query response."""
+        if 'query' in data and 'search' in data['query']:
+            return [result['title'] for result in data['query']['search'][:3]]
+        return []
+    
+    @staticmethod
+    def _format_wikipedia_answer(page: Optional[Tuple[str, str]], max_length: int, related: List[str] = ()) -> Optional[str]:
+        """Format a page extract with its source and related titles, or None if there is no content."""
+        if not page:
+            return None
+        summary = page[0][0:max_length]
+        if len(summary) == 0:
+            return None
+        suggestions = ""
+        if related:
+            suggestions = "\n\nYou might also be interested in:\n" + "\n".join([f"• {title}" for title in related])
+        return f"{summary}\n\nSource: {page[1]}{suggestions}"
+    
+    @staticmethod
+    def _wikipedia_no_answer(query: str) -> str:
+        return f"I couldn't find good information about '{query}'. Could you try being more specific or asking about something else?"
+    
+    @staticmethod
+    def _wikipedia_error(query: str) -> str:
+        return f"I'm having trouble searching for information about '{query}'. Maybe try asking in a different way?"
+    
+    def _wikipedia_api(self, params: Dict[str, Union[str, int]]) -> Dict:
+        """Call the MediaWiki API through the page cache and the Wikipedia circuit breaker.
+        
+        Stale cached responses are revalidated, and served as they are if Wikipedia is failing.
+        """
+        url = f"{WIKIPEDIA_API_URL}?{urlencode(params)}"
+        ttl = self.page_cache_ttls['wikipedia']
+        cached = self.page_cache.get(url) if self.page_cache else None
+        if cached and cached.fresh:
+            return json.loads(cached.body)
         
+        headers = {'User-Agent': WIKIPEDIA_USER_AGENT, **(cached.validators() if cached else {})}
+        try:
+            with self.upstreams.call('wikipedia') as read_timeout:
+                response = self.http.get(url, headers=headers, timeout=self.http.timeout_for(read_timeout))
+                _raise_for_server_error(response.status_code, url)
+                # A body that does not decode is a failed call, not a success
+                data = None if response.status_code == 304 and cached else response.json()
+        except Exception as e:
+            if cached:
+                logging.warning(f"Serving a stale Wikipedia response: {str(e)}")
+                return json.loads(cached.body)
+            raise
+        
+        if data is None:
+            self.page_cache.revalidated(url, ttl)
+            return json.loads(cached.body)
+        if response.status_code == 200 and self.page_cache:
+            self.page_cache.put(url, response.content, ttl, etag=response.headers.get('ETag'),
+                                last_modified=response.headers.get('Last-Modified'))
+        return data
+    
+    async def _wikipedia_api_async(self, params: Dict[str, Union[str, int]]) -> Dict:
+        """Async variant of _wikipedia_api; SQLite access runs on the lookup executor."""
+        url = f"{WIKIPEDIA_API_URL}?{urlencode(params)}"
+        loop = asyncio.get_running_loop()
+        ttl = self.page_cache_ttls['wikipedia']
+        cached = await loop.run_in_executor(self.executor, self.page_cache.get, url) if self.page_cache else None
+        if cached and cached.fresh:
+            return json.loads(cached.body)
         
-        page = self.wiki_wiki.page(query)
-        if page.exists():
-            summary = page.summary[0:1500]
-            if len(summary) > 0:
-                return f"{summary}\n\nSource: {page.fullurl}"
+        headers = {'User-Agent': WIKIPEDIA_USER_AGENT, **(cached.validators() if cached else {})}
+        try:
+            with self.upstreams.call('wikipedia') as read_timeout:
+                status, response_headers, body = await self.aio.get_bytes(
+                    url, headers=headers, timeout=self.aio.timeout_for(read_timeout))
+                _raise_for_server_error(status, url)
+                data = None if status == 304 and cached else json.loads(body)
+        except Exception as e:
+            if cached:
+                logging.warning(f"Serving a stale Wikipedia response: {str(e)}")
+                return json.loads(cached.body)
+            raise
+        
+        if data is None:
+            await loop.run_in_executor(self.executor, self.page_cache.revalidated, url, ttl)
+            return json.loads(cached.body)
+        if status == 200 and self.page_cache:
+            await loop.run_in_executor(self.executor, lambda: self.page_cache.put(
+                url, body, ttl, etag=response_headers.get('ETag'), last_modified=response_headers.get('Last-Modified')))
+        return data
+    
+    def _wikipedia_page(self, title: str) -> Optional[Tuple[str, str]]:
+        """Fetch the intro extract and canonical URL of a Wikipedia page, or None if it does not exist."""
+        with self.metrics.stage('wikipedia_page') as stage:
+            page = self._parse_wikipedia_page(self._wikipedia_api(self._wikipedia_page_params(title)))
+            stage.outcome = 'found' if page else 'missing'
+        return page
+    
+    async def _wikipedia_page_async(self, title: str) -> Optional[Tuple[str, str]]:
+        """Async variant of _wikipedia_page."""
+        with self.metrics.stage('wikipedia_page') as stage:
+            page = self._parse_wikipedia_page(await self._wikipedia_api_async(self._wikipedia_page_params(title)))
+            stage.outcome = 'found' if page else 'missing'
+        return page
+    
+    async def _off_loop(self, fn, *args):
+        """Run blocking or CPU-bound work on the executor, keeping the caller's context."""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, contextvars.copy_context().run, fn, *args)
+    
+    def _search_wikipedia(self, query: str) -> str:
+        """Query Wikipedia directly, bypassing the answer cache."""
+        logging.info(f"Searching Wikipedia for: {query}")
         
+        answer = self._wikipedia_offline(query) or self._content_answer(query, self.content_index_confident_score)
+        if answer:
+            return answer
         
         try:
+            answer = self._format_wikipedia_answer(self._wikipedia_page(query), 1500) or self._content_answer(query)
+            if answer:
+                return answer
             
-            search_url = f"https://en.wikipedia.org/w/api.php?action=query&list=search&srsearch={query}&format=json"
-            response = requests.get(search_url)
-            data = response.json()
+            with self.metrics.stage('wikipedia_search') as stage:
+                search_results = self._parse_wikipedia_search(self._wikipedia_api(self._wikipedia_search_params(query)))
+                stage.outcome = 'found' if search_results else 'missing'
+            
+            if search_results:
+                answer = self._format_wikipedia_answer(self._wikipedia_page(search_results[0]), 1000, search_results[1:])
+                if answer:
+                    return answer
+        except Exception as e:
+            logging.error(f"Error searching Wikipedia: {str(e)}")
+            return self._wikipedia_error(query)
+        
+        return self._wikipedia_no_answer(query)
+    
+    async def _search_wikipedia_async(self, query: str) -> str:
+        """Async variant of _search_wikipedia."""
+        logging.info(f"Searching Wikipedia for: {query}")
+        
+        answer = await self._off_loop(self._wikipedia_offline, query) if self.wiki_index_path else None
+        if not answer and self.content_index is not None and len(self.content_index):
+            answer = await self._off_loop(self._content_answer, query, self.content_index_confident_score)
+        if answer:
+            return answer
+        
+        try:
+            answer = self._format_wikipedia_answer(await self._wikipedia_page_async(query), 1500)
+            if not answer and self.content_index is not None and len(self.content_index):
+                answer = await self._off_loop(self._content_answer, query)
+            if answer:
+                return answer
             
-            search_results = []
-            if 'query' in data and 'search' in data['query']:
-                search_results = [result['title'] for result in data['query']['search'][:3]]
+            with self.metrics.stage('wikipedia_search') as stage:
+                search_results = self._parse_wikipedia_search(await self._wikipedia_api_async(self._wikipedia_search_params(query)))
+                stage.outcome = 'found' if search_results else 'missing'
             
             if search_results:
-                suggestions = "\n\nYou might also be interested in:\n" + "\n".join([f"• {title}" for title in search_results[1:]])
-                first_page = self.wiki_wiki.page(search_results[0])
-                if first_page.exists():
-                    summary = first_page.summary[0:1000]
-                    if len(summary) > 0:
-                        return f"{summary}\n\nSource: {first_page.fullurl}{suggestions}"
+                first_page = await self._wikipedia_page_async(search_results[0])
+                answer = self._format_wikipedia_answer(first_page, 1000, search_results[1:])
+                if answer:
+                    return answer
         except Exception as e:
             logging.error(f"Error searching Wikipedia: {str(e)}")
-            return f"I'm having trouble searching for information about '{query}'. Maybe try asking in a different way?"
+            return self._wikipedia_error(query)
         
-        return f"I couldn't find good information about '{query}'. Could you try being more specific or asking about something else?"
+        return self._wikipedia_no_answer(query)
     
     def search_duckduckgo(self, query: str) -> str:
         """Search DuckDuckGo for the query."""
+        return self._cached_lookup('duckduckgo', normalize_query(query), self._search_duckduckgo, query)
+    
+    async def search_duckduckgo_async(self, query: str) -> str:
+        """Search DuckDuckGo for the query without blocking the event loop."""
+        return await self._cached_lookup_async('duckduckgo', normalize_query(query), self._search_duckduckgo_async, query)
+    
+    def _search_duckduckgo(self, query: str) -> str:
+        """Query DuckDuckGo directly, bypassing the answer cache."""
         logging.info(f"Searching DuckDuckGo for: {query}")
-        url = f"https://lite.duckduckgo.com/lite/?q={query}"
         
         try:
-            response = requests.get(url, headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            })
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            results = []
-            for a_tag in soup.find_all('a', {'class': 'result-link'}):
-                results.append({'title': a_tag.text.strip(), 'url': a_tag['href']})
-            
-            for tr in soup.find_all('tr'):
-                if tr.find('a') and tr.find('td', class_='result-snippet'):
-                    title_element, snippet_element = tr.find('a'), tr.find('td', class_='result-snippet')
-                    if title_element and snippet_element:
-                        title, url, snippet = title_element.text.strip(), title_element.get('href', ''), snippet_element.text.strip()
-                        if title and url and snippet:
-                            results.append({'title': title, 'url': url, 'snippet': snippet})
-            
-            if results:
-                formatted_results = "Here's what I found on the web:\n\n"
-                for i, result in enumerate(results[:5], 1):
-                    title = result.get('title', 'No title')
-                    url = result.get('url', 'No URL')
-                    snippet = result.get('snippet', 'No description available')
-                    
-                    formatted_results += f"{i}. {title}\n"
-                    if snippet: formatted_results += f"   {snippet}\n"
-                    formatted_results += f"   URL: {url}\n\n"
-                
-                return formatted_results
-            else:
-                return f"I couldn't find any search results for '{query}'. Try refining your search."
+            with self.metrics.stage('duckduckgo'), self.upstreams.call('duckduckgo') as read_timeout:
+                response = self.http.get(DUCKDUCKGO_LITE_URL, params={'q': query}, timeout=self.http.timeout_for(read_timeout))
+                _raise_for_server_error(response.status_code, DUCKDUCKGO_LITE_URL)
+            return self._format_duckduckgo_results(query, response.text)
+        except Exception as e:
+            logging.error(f"Error searching DuckDuckGo: {str(e)}")
+            return f"I encountered an error searching for '{query}': {str(e)}"
+    
+    async def _search_duckduckgo_async(self, query: str) -> str:
+        """Async variant of _search_duckduckgo."""
+        logging.info(f"Searching DuckDuckGo for: {query}")
         
+        try:
+            with self.metrics.stage('duckduckgo'), self.upstreams.call('duckduckgo') as read_timeout:
+                status, html = await self.aio.get_text(DUCKDUCKGO_LITE_URL, params={'q': query},
+                                                       timeout=self.aio.timeout_for(read_timeout))
+                _raise_for_server_error(status, DUCKDUCKGO_LITE_URL)
+            return self._format_duckduckgo_results(query, html)
         except Exception as e:
             logging.error(f"Error searching DuckDuckGo: {str(e)}")
             return f"I encountered an error searching for '{query}': {str(e)}"
     
+    @staticmethod
+    def _format_duckduckgo_results(query: str, html: str) -> str:
+        """Parse a DuckDuckGo lite results page and format the top results."""
+        results = parse_duckduckgo_results(html, limit=5)
+        
+        if results:
+            formatted_results = "Here's what I found on the web:\n\n"
+            for i, result in enumerate(results[:5], 1):
+                title = result.get('title', 'No title')
+                url = result.get('url', 'No URL')
+                snippet = result.get('snippet') or 'No description available'
+                
+                formatted_results += f"{i}. {title}\n"
+                if snippet: formatted_results += f"   {snippet}\n"
+                formatted_results += f"   URL: {url}\n\n"
+            
+            return formatted_results
+        else:
+            return f"I couldn't find any search results for '{query}'. Try refining your search."
+    
     def scrape_website(self, url: str) -> str:
         """Scrape and extract text content from a website."""
+        return self._cached_lookup('web_scrape', url.strip(), self._scrape_website, url)
+    
+    async def scrape_website_async(self, url: str) -> str:
+        """Scrape a website without blocking the event loop."""
+        return await self._cached_lookup_async('web_scrape', url.strip(), self._scrape_website_async, url)
+    
+    def _scrape_website(self, url: str) -> str:
+        """Scrape the website directly, bypassing the answer cache."""
         logging.info(f"Scraping website: {url}")
         
         try:
             if not url.startswith(('http://', 'https://')): url = 'https://' + url
             
-            # More robust handling of web scraping with multiple fallbacks
-            try:
-                # Try trafilatura first (good for article content)
-                downloaded = fetch_url(url)
-                if downloaded:
-                    text = extract(downloaded)
-                    if text and len(text.strip()) > 100:  # Ensure we got meaningful content
-                        max_length = 1500
-                        if len(text) > max_length:
-                            text = text[:max_length] + "...\n\n(Content truncated for readability)"
-                        return f"Content from {url}:\n\n{text}"
-            except Exception as trafilatura_error:
-                logging.warning(f"Trafilatura scraping failed, trying fallback: {str(trafilatura_error)}")
+            cached = self.page_cache.get(url) if self.page_cache else None
+            if cached and cached.fresh and cached.text:
+                return cached.text
             
-            # If trafilatura fails or returns little content, try BeautifulSoup
-            return self._fallback_scrape(url)
+            started = time.perf_counter()
+            try:
+                with self.metrics.stage('scrape_fetch'), \
+                        self.upstreams.call(UpstreamHealth.scrape_upstream(url), expected=(UnsupportedContentError,)) as read_timeout:
+                    page = self.http.fetch_page(url, self.scrape_max_bytes, self.page_stats,
+                                                headers=cached.validators() if cached else None, read_timeout=read_timeout)
+                    _raise_for_server_error(page.status, url)
+            except UnsupportedContentError:
+                raise
+            except Exception as e:
+                if cached and cached.text:
+                    logging.warning(f"Serving a stale copy of {url}: {str(e)}")
+                    return cached.text
+                raise
+            if page.status == 304 and cached and cached.text:
+                self.page_cache.revalidated(url, self.page_cache_ttls['web_scrape'])
+                return cached.text
+            text = self._extract_page(url, page, time.perf_counter() - started)
+            self._store_page(url, page, text)
+            return text
             
         except Exception as e:
             logging.error(f"Error scraping website: {str(e)}")
             return f"I encountered an error when trying to read that website: {str(e)}"
     
-    def _fallback_scrape(self, url: str) -> str:
-        """Fallback method for scraping using BeautifulSoup if trafilatura fails."""
+    async def _scrape_website_async(self, url: str) -> str:
+        """Async variant of _scrape_website; extraction runs on the lookup executor."""
+        logging.info(f"Scraping website: {url}")
+        
         try:
-            response = requests.get(url, headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            })
-            soup = BeautifulSoup(response.text, 'html.parser')
+            if not url.startswith(('http://', 'https://')): url = 'https://' + url
             
-            for script in soup(["script", "style"]): script.extract()
+            loop = asyncio.get_running_loop()
+            cached = await loop.run_in_executor(self.executor, self.page_cache.get, url) if self.page_cache else None
+            if cached and cached.fresh and cached.text:
+                return cached.text
+            
+            started = time.perf_counter()
+            try:
+                with self.metrics.stage('scrape_fetch'), \
+                        self.upstreams.call(UpstreamHealth.scrape_upstream(url), expected=(UnsupportedContentError,)) as read_timeout:
+                    page = await self.aio.fetch_page(url, self.scrape_max_bytes, self.page_stats,
+                                                     headers=cached.validators() if cached else None, read_timeout=read_timeout)
+                    _raise_for_server_error(page.status, url)
+            except UnsupportedContentError:
+                raise
+            except Exception as e:
+                if cached and cached.text:
+                    logging.warning(f"Serving a stale copy of {url}: {str(e)}")
+                    return cached.text
+                raise
+            if page.status == 304 and cached and cached.text:
+                await loop.run_in_executor(self.executor, self.page_cache.revalidated, url, self.page_cache_ttls['web_scrape'])
+                return cached.text
+            fetch_seconds = time.perf_counter() - started
+            text = await self._off_loop(self._extract_page, url, page, fetch_seconds)
+            await loop.run_in_executor(self.executor, self._store_page, url, page, text)
+            return text
             
-            text = soup.get_text()
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = '\n'.join(chunk for chunk in chunks if chunk)
+        except Exception as e:
+            logging.error(f"Error scraping website: {str(e)}")
+            return f"I encountered an error when trying to read that website: {str(e)}"
+    
+    def _extract_page(self, url: str, page: FetchedPage, fetch_seconds: float) -> str:
+        """Run the extractors over a page downloaded once, trafilatura first, BeautifulSoup second.
+        
+        Both extractors are handed the same undecoded bytes, so falling back costs neither a second
+        request nor a second copy of the body.
+        """
+        with self.metrics.stage('extract') as stage:
+            stages = {'fetch': fetch_seconds}
             
-            max_length = 1500
-            if len(text) > max_length:
-                text = text[:max_length] + "...\n\n(Content truncated for readability)"
+            # Try trafilatura first (good for article content)
+            if page.status == 200 and page.content:
+                started = time.perf_counter()
+                try:
+                    article = self._extract_article(url, page.content)
+                except Exception as trafilatura_error:
+                    logging.warning(f"Trafilatura scraping failed, trying fallback: {str(trafilatura_error)}")
+                    article = None
+                stages['trafilatura'] = time.perf_counter() - started
+                if article:
+                    stage.outcome = 'trafilatura'
+                    self.scrape_stats.record('trafilatura', stages)
+                    return article
             
-            return f"Content from {url}:\n\n{text}"
+            # If trafilatura fails or returns little content, try BeautifulSoup
+            started = time.perf_counter()
+            text = self._page_text(url, page.content, page.encoding)
+            stages['beautifulsoup'] = time.perf_counter() - started
+            stage.outcome = 'beautifulsoup'
+            self.scrape_stats.record('beautifulsoup', stages)
+            return text
+    
+    def _store_page(self, url: str, page: FetchedPage, text: str) -> None:
+        """Keep a successfully fetched page and its extracted text in the page cache."""
+        if self.page_cache is not None and page.status == 200:
+            self.page_cache.put(url, page.content, self.page_cache_ttls['web_scrape'], text=text,
+                                etag=page.etag, last_modified=page.last_modified)
+    
+    @staticmethod
+    def _truncate_content(url: str, text: str) -> str:
+        max_length = 1500
+        if len(text) > max_length:
+            text = text[:max_length] + "...\n\n(Content truncated for readability)"
+        return f"Content from {url}:\n\n{text}"
+    
+    def _extract_article(self, url: str, html: Union[str, bytes]) -> Optional[str]:
+        """Extract the main article text with trafilatura, or None if it found too little."""
+        from trafilatura import extract
+        text = extract(html)
+        if text and len(text.strip()) > 100:  # Ensure we got meaningful content
+            return self._truncate_content(url, text)
+        return None
+    
+    def _page_text(self, url: str, html: Union[str, bytes], encoding: Optional[str] = None) -> str:
+        """Extract all visible text from a page with BeautifulSoup."""
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html, 'html.parser', from_encoding=encoding if isinstance(html, bytes) else None)
+        
+        for script in soup(["script", "style"]): script.extract()
+        
+        text = soup.get_text()
+        lines = (line.strip() for line in text.splitlines())
+        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+        text = '\n'.join(chunk for chunk in chunks if chunk)
+        
+        return self._truncate_content(url, text)
+    
+    @staticmethod
+    def _is_usable_answer(raw_response: str) -> bool:
+        """Check whether a Wikipedia answer contains information rather than a miss or an error."""
+        return not any(phrase in raw_response for phrase in NO_ANSWER_PHRASES)
+    
+    def _hedged_lookup(self, query: str) -> str:
+        """Look up Wikipedia and DuckDuckGo concurrently, preferring a usable Wikipedia answer.
+        
+        DuckDuckGo is started once Wikipedia has not answered within the hedge delay (immediately
+        when the delay is zero) and is cancelled, or its result ignored, if Wikipedia comes through.
+        """
+        wiki_future = submit_in_context(self.executor, self.search_wikipedia, query)
+        done, _ = wait([wiki_future], timeout=self.hedge_delay)
+        if done:
+            wiki_response = self._future_answer(wiki_future, 'Wikipedia')
+            if wiki_response is not None and self._is_usable_answer(wiki_response):
+                return wiki_response
         
+        trace_branch('hedged:duckduckgo')
+        duck_future = submit_in_context(self.executor, self.search_duckduckgo, query)
+        if not done:
+            wiki_response = self._future_answer(wiki_future, 'Wikipedia')
+            if wiki_response is not None and self._is_usable_answer(wiki_response):
+                duck_future.cancel()
+                return wiki_response
+        
+        duck_response = self._future_answer(duck_future, 'DuckDuckGo')
+        if duck_response is None:
+            return "I couldn't search the web right now. Maybe try a different question?"
+        return duck_response
+    
+    async def _hedged_lookup_async(self, query: str) -> str:
+        """Async variant of _hedged_lookup built on event loop tasks."""
+        wiki_task = asyncio.ensure_future(self.search_wikipedia_async(query))
+        done, _ = await asyncio.wait([wiki_task], timeout=self.hedge_delay)
+        if done:
+            wiki_response = await self._task_answer(wiki_task, 'Wikipedia')
+            if wiki_response is not None and self._is_usable_answer(wiki_response):
+                return wiki_response
+        
+        trace_branch('hedged:duckduckgo')
+        duck_task = asyncio.ensure_future(self.search_duckduckgo_async(query))
+        if not done:
+            wiki_response = await self._task_answer(wiki_task, 'Wikipedia')
+            if wiki_response is not None and self._is_usable_answer(wiki_response):
+                duck_task.cancel()
+                return wiki_response
+        
+        duck_response = await self._task_answer(duck_task, 'DuckDuckGo')
+        if duck_response is None:
+            return "I couldn't search the web right now. Maybe try a different question?"
+        return duck_response
+    
+    @staticmethod
+    def _future_answer(future: Future, source: str) -> Optional[str]:
+        """Wait for a lookup future, returning None if the lookup raised."""
+        try:
+            return future.result()
         except Exception as e:
-            logging.error(f"Error in fallback scraping: {str(e)}")
-            return f"I encountered an error when trying to read that website: {str(e)}"
+            logging.error(f"Error with {source} search: {str(e)}")
+            return None
+    
+    @staticmethod
+    async def _task_answer(task: "asyncio.Future", source: str) -> Optional[str]:
+        """Await a lookup task, returning None if the lookup raised."""
+        try:
+            return await task
+        except Exception as e:
+            logging.error(f"Error with {source} search: {str(e)}")
+            return None
     
     def generate_greeting_response(self) -> str:
         """Generate a greeting response."""
@@ -342,269 +2842,319 @@ class InfoBot:
         return random.choice(general_responses)
     
     def is_url(self, text: str) -> bool:
-        """Check if the given text is a URL."""
-        url_pattern = re.compile(
-            r'^(?:http|https)?://'  
-            r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|'  
-            r'localhost|'  
-            r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  
-            r'(?::\d+)?'  
-            r'(?:/?|[/?]\S+)$', re.IGNORECASE)
-        
-        domain_pattern = re.compile(
-            r'^(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)$', re.IGNORECASE)
+        """Check if the given text is a URL: one with a scheme, or a bare domain per DOMAIN_PATTERN."""
+        # Cheap prefilter: every URL or bare domain has a dot or a scheme
+        if '.' not in text and '://' not in text:
+            return False
+        return bool(URL_PATTERN.match(text) or DOMAIN_PATTERN.match(text))
+    
+    def extract_urls(self, message: str) -> List[str]:
+        """Find every URL embedded in a message, in order of appearance.
         
-        return bool(url_pattern.match(text) or domain_pattern.match(text))
+        Only links with a scheme or a 'www.' prefix count here. A bare domain is only treated as a
+        URL by is_url, when it is the whole query and ends in one of KNOWN_TLDS, so 'what is
+        node.js' stays a question while 'what is python.org' reads the site.
+        """
+        if '.' not in message and '://' not in message:
+            return []
+        return [url.rstrip('.,;:!?)\'"') for url in EMBEDDED_URL_PATTERN.findall(message)]
     
     def generate_human_like_text(self, length=25) -> str:
         """Generate human-like text using the Markov model."""
-        if not self.sentence_starters:
-            return ""  # If no starters, return empty string
-            
-        # Choose a random starter
-        current = random.choice(self.sentence_starters)
-        result = [current[0], current[1]]
-        
-        # Generate the rest of the text
-        for i in range(length):
-            if (result[-2], result[-1]) in self.transition_model:
-                # Get possible next words based on the last two words
-                possible_next = self.transition_model[(result[-2], result[-1])]
-                if possible_next:
-                    # Choose a random next word
-                    next_word = random.choice(possible_next)
-                    result.append(next_word)
-                else:
-                    break
-            else:
-                break
-        
-        return " ".join(result)
+        return self.markov.generate(length)
         
     def humanize_response(self, response: str) -> str:
         """Make the response sound more human by adding conversational elements."""
-        # Add a human-like introduction phrase
-        intro = random.choice(self.human_phrases)
-        
-        # Split response into sentences - Use a simpler method to avoid errors
+        with self.metrics.stage('humanize'):
+            return self.humanizer.humanize(response)
+    
+    def get_response(self, message: str, session_id: str = DEFAULT_SESSION) -> str:
+        """Process the user message and return a response."""
         try:
-            sentences = sent_tokenize(response)
-        except:
-            # Fallback sentence tokenization
-            sentences = [s.strip() + '.' for s in response.split('.') if s.strip()]
-            if not sentences:
-                sentences = [response]
-        
-        if not sentences:
+            self.conversations.append(session_id, "user", message)
+            category, query = self.classify_message(message)
+            
+            if category == "question":
+                response = self._answer_question(query)
+            else:
+                response = self._conversational_response(category, message)
+            
+            self.conversations.append(session_id, "bot", response)
             return response
             
-        # For longer responses, also add a human-like closing phrase
-        closing_phrases = [
-            " I hope that helps you understand!",
-            " Let me know if you have any other questions about this!",
-            " Does that explain it well enough for you?",
-            " What do you think about that? Pretty interesting, right?",
-            " I find this topic super fascinating, don't you?",
-            " I'm really curious to hear your thoughts on this too!",
-            " Would you like to know more about any specific part of this?",
-            " I could go on about this for hours, but I'll stop here for now!",
-            " That's the simple explanation, but there's so much more to explore!",
-            " I just learned about this recently myself and found it fascinating!",
-            " Feel free to ask if anything isn't clear, I'm happy to explain more!"
-        ]
+        except Exception as e:
+            logging.error(f"Unexpected error in get_response: {str(e)}")
+            return "Sorry, I'm having some trouble processing your request. Let's try something else!"
+    
+    async def get_response_async(self, message: str, session_id: str = DEFAULT_SESSION) -> str:
+        """Process the user message without blocking the event loop on upstream I/O."""
+        try:
+            self.conversations.append(session_id, "user", message)
+            category, query = self.classify_message(message)
+            
+            if category == "question":
+                response = await self._answer_question_async(query)
+            else:
+                response = self._conversational_response(category, message)
+            
+            self.conversations.append(session_id, "bot", response)
+            return response
+            
+        except Exception as e:
+            logging.error(f"Unexpected error in get_response_async: {str(e)}")
+            return "Sorry, I'm having some trouble processing your request. Let's try something else!"
+    
+    def get_responses(self, messages: List[str], session_id: str = DEFAULT_SESSION) -> List[Dict[str, str]]:
+        """Answer a batch of messages, returning one {'response': ...} or {'error': ...} per message in order.
         
-        # Add emotive expressions within the text
-        emotional_expressions = [
-            ("\\.", " Wow!."),
-            ("\\.", " Amazing!."),
-            ("\\.", " Incredible!."),
-            ("\\.", " Fascinating!."),
-            ("\\.", " Isn't that cool?."),
-            ("\\!", " So exciting!"),
-            ("\\.", " That's really something!."),
-            ("\\.", " Pretty mind-blowing, right?."),
-            ("\\.", " I love learning about this stuff!.")
-        ]
+        Questions that normalize to the same query are looked up once and share the answer; the
+        unique ones are resolved concurrently on the batch pool.
+        """
+        if len(messages) > self.batch_max_size:
+            raise ValueError(f"A batch may contain at most {self.batch_max_size} messages")
         
-        # 30% chance to add an emotional expression to a random sentence
-        if random.random() < 0.3 and len(sentences) > 1:
-            random_idx = random.randint(0, len(sentences) - 2)  # Not the last sentence
-            expression = random.choice(emotional_expressions)
-            sentences[random_idx] = re.sub(expression[0] + "$", expression[1], sentences[random_idx])
-        
-        # Only add closing phrase for longer responses (more than 2 sentences)
-        if len(sentences) > 2:
-            # 85% chance to add a closing phrase (increased from 70%)
-            if random.random() < 0.85:
-                sentences[-1] = sentences[-1].rstrip('.') + random.choice(closing_phrases)
-        
-        # Occasionally add filler words or phrases between sentences
-        filler_phrases = [
-            " Actually, ",
-            " You know what, ",
-            " Interestingly enough, ",
-            " By the way, ",
-            " I should probably mention that ",
-            " It's definitely worth noting that ",
-            " Also, I think ",
-            " Oh, and ",
-            " This is cool - ",
-            " Here's something neat: ",
-            " Just between us, ",
-            " Fun fact: ",
-            " To be honest, ",
-            " I didn't know this before, but ",
-            " I've been thinking about this, and "
-        ]
+        results: List[Optional[Dict[str, str]]] = [None] * len(messages)
+        pending: Dict[str, List[int]] = defaultdict(list)
+        queries: Dict[str, str] = {}
+        for i, message in enumerate(messages):
+            if not isinstance(message, str) or not message.strip():
+                results[i] = {'error': 'Please provide a message.'}
+                continue
+            try:
+                category, query = self.classify_message(message)
+                if category == "question":
+                    key = query if self.is_url(query) else normalize_query(query)
+                    queries.setdefault(key, query)
+                    pending[key].append(i)
+                else:
+                    results[i] = {'response': self._conversational_response(category, message)}
+            except Exception as e:
+                logging.error(f"Error classifying batch message: {str(e)}")
+                results[i] = {'error': str(e)}
         
-        # Add more personal thoughts/reactions to content
-        personal_reactions = [
-            " I personally find this really interesting because ",
-            " This reminds me of ",
-            " I've always wondered about this, especially ",
-            " The way I see it, ",
-            " From my perspective, ",
-            " I think what's most fascinating here is ",
-            " What stands out to me is ",
-            " I'd never thought about it this way before, but "
-        ]
+        futures = {key: submit_in_context(self.batch_executor, self._answer_question, query)
+                   for key, query in queries.items()}
+        for key, future in futures.items():
+            try:
+                result = {'response': future.result()}
+            except Exception as e:
+                logging.error(f"Error answering batch question: {str(e)}")
+                result = {'error': str(e)}
+            for i in pending[key]:
+                results[i] = result
         
-        # Only add fillers for responses with multiple sentences
-        if len(sentences) > 1:
-            # Choose a random sentence (not the first or last) to add a filler before
-            for i in range(1, min(len(sentences) - 1, 3)):  # Limit to first 3 sentences
-                # 40% chance to add a filler (increased from 30%)
-                if random.random() < 0.4:
-                    sentences[i] = random.choice(filler_phrases) + sentences[i][0].lower() + sentences[i][1:]
+        if len(futures) < sum(len(indexes) for indexes in pending.values()):
+            logging.info(f"Batch of {len(messages)} messages needed {len(futures)} lookups")
+        for message, result in zip(messages, results):
+            if 'response' in result:
+                self.conversations.append(session_id, "user", message)
+                self.conversations.append(session_id, "bot", result['response'])
+        return results
+    
+    def stream_response(self, message: str, session_id: str = DEFAULT_SESSION) -> Iterator[Tuple[str, str]]:
+        """Yield (event, text) chunks of a response as soon as each one is ready.
+        
+        For searches the intro phrase is sent before the lookup starts, followed by one chunk per
+        humanized sentence and finally the sources. 'intro', 'sentence' and 'sources' chunks are
+        appended to the message as-is; a 'replace' chunk carries the whole message instead.
+        """
+        text = ""
+        try:
+            self.conversations.append(session_id, "user", message)
+            category, query = self.classify_message(message)
             
-            # 30% chance to add a personal reaction
-            if random.random() < 0.3 and len(sentences) > 2:
-                reaction_idx = random.randint(1, min(len(sentences) - 1, 3))
-                reaction = random.choice(personal_reactions)
-                if "Source:" not in sentences[reaction_idx] and "URL:" not in sentences[reaction_idx]:
-                    sentences[reaction_idx] = reaction + sentences[reaction_idx][0].lower() + sentences[reaction_idx][1:]
+            if category != "question" or self.is_url(query):
+                if category == "question":
+                    text = self._answer_question(query)
+                else:
+                    text = self._conversational_response(category, message)
+                yield 'replace', text
+            else:
+                intro = self.humanizer.intro()
+                yield 'intro', intro
+                
+                try:
+                    raw_response = self._lookup(query)
+                except Exception as wiki_error:
+                    logging.error(f"Error with Wikipedia search: {str(wiki_error)}")
+                    raw_response = None
+                
+                if raw_response is None:
+                    text = self._fallback_answer(query)
+                    yield 'replace', text
+                elif not self._is_presentable(raw_response):
+                    text = self._present_answer(raw_response)
+                    yield 'replace', text
+                else:
+                    body, sources = self._split_sources(raw_response)
+                    with self.metrics.stage('humanize'):
+                        sentences = self.humanizer.sentences(body) or [body]
+                    text = intro
+                    for i, sentence in enumerate(sentences):
+                        chunk = sentence if i == 0 else " " + sentence
+                        text += chunk
+                        yield 'sentence', chunk
+                    if sources:
+                        chunk = "\n\n" + sources
+                        text += chunk
+                        yield 'sources', chunk
+            
+            self.conversations.append(session_id, "bot", text)
+        except Exception as e:
+            logging.error(f"Unexpected error in stream_response: {str(e)}")
+            yield 'replace', "Sorry, I'm having some trouble processing your request. Let's try something else!"
         
-        # Add extra humanizing quirks
-        # 20% chance to add a typing mistake and correction
-        if random.random() < 0.2:
-            typos = [
-                ('\\b(the)\\b', 'teh... I mean, the'),
-                ('\\b(and)\\b', 'adn... sorry, and'),
-                ('\\b(that)\\b', 'taht... oops, that'),
-                ('\\b(with)\\b', 'wiht... *with'),
-                ('\\b(information)\\b', 'informaiton... information'),
-                ('\\b(because)\\b', 'becuase... because')
-            ]
-            typo = random.choice(typos)
-            for i, sentence in enumerate(sentences):
-                if re.search(typo[0], sentence) and "Source:" not in sentence and "URL:" not in sentence:
-                    sentences[i] = re.sub(typo[0], typo[1], sentence, count=1)
-                    break
+        yield 'done', ""
+    
+    @staticmethod
+    def _split_sources(raw_response: str) -> Tuple[str, str]:
+        """Split a raw answer into its body and its trailing 'Source:' block, if any."""
+        body, separator, sources = raw_response.partition("\n\nSource:")
+        return body, (separator.strip() + sources) if separator else ""
+    
+    def _conversational_response(self, category: str, message: str) -> str:
+        """Respond to a message that does not need an upstream lookup."""
+        trace_branch(f"conversational:{category}")
+        if category == "greeting":
+            return self.generate_greeting_response()
+        if category == "farewell":
+            return self.generate_farewell_response()
+        return self.generate_general_response(message)
+    
+    def _answer_question(self, query: str) -> str:
+        """Answer a question by reading the URL it names or searching Wikipedia and DuckDuckGo."""
+        # Handle URLs separately - direct web scraping
+        if self.is_url(query):
+            trace_branch('website')
+            try:
+                return self._present_website(self.scrape_website(query))
+            except Exception as e:
+                logging.error(f"Error scraping website: {str(e)}")
+                return self._website_trouble()
         
-        # Reassemble the response with the modifications
-        # 15% chance to add a thinking pause at the beginning
-        if random.random() < 0.15:
-            thinking_pauses = [
-                "Hmm, let me think about this... ",
-                "Let me see... ",
-                "Give me a second to gather my thoughts... ",
-                "That's an interesting question! ",
-                "Oh, I know about this! "
-            ]
-            intro = random.choice(thinking_pauses) + intro.lower()
+        try:
+            return self._present_answer(self._lookup(query))
+        except Exception as wiki_error:
+            logging.error(f"Error with Wikipedia search: {str(wiki_error)}")
+            return self._fallback_answer(query)
+    
+    def _lookup(self, query: str) -> str:
+        """Fetch the raw answer for a search query, Wikipedia first and DuckDuckGo second."""
+        if self.hedged_lookup:
+            trace_branch('hedged')
+            return self._hedged_lookup(query)
         
-        humanized_response = intro + sentences[0] + " " + " ".join(sentences[1:])
+        # Try to get information from Wikipedia first
+        raw_response = self.search_wikipedia(query)
         
-        return humanized_response
+        # If Wikipedia doesn't have good info, try DuckDuckGo
+        if not self._is_usable_answer(raw_response):
+            trace_branch('duckduckgo_fallback')
+            try:
+                raw_response = self.search_duckduckgo(query)
+            except Exception as duck_error:
+                logging.error(f"Error with DuckDuckGo search: {str(duck_error)}")
+                raw_response = "I couldn't search the web right now. Maybe try a different question?"
+        return raw_response
     
-    def get_response(self, message: str) -> str:
-        """Process the user message and return a response."""
+    def _fallback_answer(self, query: str) -> str:
+        """Fallback to DuckDuckGo if Wikipedia errors out."""
+        trace_branch('error_fallback')
         try:
-            self.conversation_history.append({"user": message})
-            category = self.categorize_message(message)
-            
-            if category == "greeting":
-                response = self.generate_greeting_response()
-            elif category == "farewell":
-                response = self.generate_farewell_response()
-            elif category == "question":
-                query = self.extract_search_query(message)
-                
-                # Handle URLs separately - direct web scraping
-                if self.is_url(query):
-                    try:
-                        raw_response = self.scrape_website(query)
-                        # Don't humanize website content, just add a brief introduction
-                        intros = [
-                            "Here's what I found from that website: \n\n",
-                            "I've extracted the following content: \n\n",
-                            "Here's the information from the page: \n\n",
-                            "Let me share what I found on that site: \n\n",
-                            "I pulled this from the URL you shared: \n\n",
-                            "I visited that site and here's what I got: \n\n"
-                        ]
-                        response = random.choice(intros) + raw_response
-                    except Exception as e:
-                        logging.error(f"Error scraping website: {str(e)}")
-                        response = f"I tried to read that website, but ran into some trouble. Maybe the site is blocking automated readers or is temporarily down?"
-                else:
-                    # Try to get information from Wikipedia first
-                    try:
-                        raw_response = self.search_wikipedia(query)
-                        
-                        # If Wikipedia doesn't have good info, try DuckDuckGo
-                        if any(phrase in raw_response for phrase in [
-                            "couldn't find", "having trouble", "try being more specific"
-                        ]):
-                            try:
-                                raw_response = self.search_duckduckgo(query)
-                            except Exception as duck_error:
-                                logging.error(f"Error with DuckDuckGo search: {str(duck_error)}")
-                                raw_response = "I couldn't search the web right now. Maybe try a different question?"
-                        
-                        # Humanize the response if it contains actual information
-                        if not any(phrase in raw_response for phrase in [
-                                "couldn't find", "encountered an error", "try being more specific", "having trouble"
-                            ]):
-                            response = self.humanize_response(raw_response)
-                        else:
-                            # For error messages, add a simple apologetic intro
-                            sorry_intros = [
-                                "I'm sorry, but ",
-                                "Unfortunately, ",
-                                "I tried my best, but ",
-                                "I wish I could help more, but ",
-                                "Hmm, I'm drawing a blank here. "
-                            ]
-                            response = random.choice(sorry_intros) + raw_response
-                    except Exception as wiki_error:
-                        logging.error(f"Error with Wikipedia search: {str(wiki_error)}")
-                        # Fallback to DuckDuckGo if Wikipedia errors out
-                        try:
-                            raw_response = self.search_duckduckgo(query)
-                            if "couldn't find" not in raw_response and "error" not in raw_response:
-                                response = self.humanize_response(raw_response)
-                            else:
-                                response = f"I couldn't find specific information about '{query}'. Could you try asking in a different way?"
-                        except Exception as e:
-                            logging.error(f"Error with fallback search: {str(e)}")
-                            response = "I'm having trouble searching for information right now. Could we try again in a moment?"
-            else:
-                response = self.generate_general_response(message)
-            
-            self.conversation_history.append({"bot": response})
-            
-            if len(self.conversation_history) > 20:
-                self.conversation_history = self.conversation_history[-20:]
-            
-            return response
-            
+            return self._present_fallback_answer(query, self.search_duckduckgo(query))
         except Exception as e:
-            logging.error(f"Unexpected error in get_response: {str(e)}")
-            return "Sorry, I'm having some trouble processing your request. Let's try something else!"
+            logging.error(f"Error with fallback search: {str(e)}")
+            return "I'm having trouble searching for information right now. Could we try again in a moment?"
+    
+    async def _answer_question_async(self, query: str) -> str:
+        """Async variant of _answer_question."""
+        if self.is_url(query):
+            trace_branch('website')
+            try:
+                return self._present_website(await self.scrape_website_async(query))
+            except Exception as e:
+                logging.error(f"Error scraping website: {str(e)}")
+                return self._website_trouble()
+        
+        try:
+            return self._present_answer(await self._lookup_async(query))
+        except Exception as wiki_error:
+            logging.error(f"Error with Wikipedia search: {str(wiki_error)}")
+            return await self._fallback_answer_async(query)
+    
+    async def _lookup_async(self, query: str) -> str:
+        """Async variant of _lookup."""
+        if self.hedged_lookup:
+            trace_branch('hedged')
+            return await self._hedged_lookup_async(query)
+        
+        raw_response = await self.search_wikipedia_async(query)
+        
+        if not self._is_usable_answer(raw_response):
+            trace_branch('duckduckgo_fallback')
+            try:
+                raw_response = await self.search_duckduckgo_async(query)
+            except Exception as duck_error:
+                logging.error(f"Error with DuckDuckGo search: {str(duck_error)}")
+                raw_response = "I couldn't search the web right now. Maybe try a different question?"
+        return raw_response
+    
+    async def _fallback_answer_async(self, query: str) -> str:
+        """Async variant of _fallback_answer."""
+        trace_branch('error_fallback')
+        try:
+            return self._present_fallback_answer(query, await self.search_duckduckgo_async(query))
+        except Exception as e:
+            logging.error(f"Error with fallback search: {str(e)}")
+            return "I'm having trouble searching for information right now. Could we try again in a moment?"
+    
+    def _present_website(self, raw_response: str) -> str:
+        """Don't humanize website content, just add a brief introduction."""
+        intros = [
+            "Here's what I found from that website: \n\n",
+            "I've extracted the following content: \n\n",
+            "Here's the information from the page: \n\n",
+            "Let me share what I found on that site: \n\n",
+            "I pulled this from the URL you shared: \n\n",
+            "I visited that site and here's what I got: \n\n"
+        ]
+        return random.choice(intros) + raw_response
+    
+    @staticmethod
+    def _website_trouble() -> str:
+        return "I tried to read that website, but ran into some trouble. Maybe the site is blocking automated readers or is temporarily down?"
+    
+    @staticmethod
+    def _is_presentable(raw_response: str) -> bool:
+        """Check whether a raw answer carries actual information worth humanizing."""
+        return not any(phrase in raw_response for phrase in [
+            "couldn't find", "encountered an error", "try being more specific", "having trouble"
+        ])
+    
+    def _present_answer(self, raw_response: str) -> str:
+        """Humanize the response if it contains actual information, otherwise apologize."""
+        if self._is_presentable(raw_response):
+            return self.humanize_response(raw_response)
+        
+        # For error messages, add a simple apologetic intro
+        sorry_intros = [
+            "I'm sorry, but ",
+            "Unfortunately, ",
+            "I tried my best, but ",
+            "I wish I could help more, but ",
+            "Hmm, I'm drawing a blank here. "
+        ]
+        return random.choice(sorry_intros) + raw_response
+    
+    def _present_fallback_answer(self, query: str, raw_response: str) -> str:
+        """Present a DuckDuckGo answer obtained after Wikipedia errored out."""
+        if "couldn't find" not in raw_response and "error" not in raw_response:
+            return self.humanize_response(raw_response)
+        return f"I couldn't find specific information about '{query}'. Could you try asking in a different way?"
 
 
-infobot = InfoBot()
+with startup_phase('infobot_init'):
+    infobot = InfoBot()
 
 
 HTML_TEMPLATE = '''
@@ -873,6 +3423,12 @@ HTML_TEMPLATE = '''
                 chatMessages.appendChild(messageDiv);
                 
                 chatMessages.scrollTop = chatMessages.scrollHeight;
+                return contentDiv;
+            }
+            
+            function updateMessage(contentDiv, text) {
+                contentDiv.innerHTML = formatMessageText(text);
+                chatMessages.scrollTop = chatMessages.scrollHeight;
             }
             
             function formatMessageText(text) {
@@ -908,7 +3464,7 @@ HTML_TEMPLATE = '''
                 try {
                     showTypingIndicator();
                     
-                    const response = await fetch('/chat', {
+                    const response = await fetch('/chat/stream', {
                         method: 'POST',
                         headers: {
                             'Content-Type': 'application/json',
@@ -916,12 +3472,40 @@ HTML_TEMPLATE = '''
                         body: JSON.stringify({ message: message }),
                     });
                     
-                    const data = await response.json();
-                    removeTypingIndicator();
+                    if (!response.ok || !response.body) {
+                        await sendMessageJson(message);
+                        return;
+                    }
+                    
+                    const reader = response.body.getReader();
+                    const decoder = new TextDecoder();
+                    let buffer = '';
+                    let text = '';
+                    let contentDiv = null;
+                    
+                    while (true) {
+                        const { value, done } = await reader.read();
+                        if (done) break;
+                        buffer += decoder.decode(value, { stream: true });
+                        
+                        let boundary;
+                        while ((boundary = buffer.indexOf('\\n\\n')) !== -1) {
+                            const chunk = parseEvent(buffer.slice(0, boundary));
+                            buffer = buffer.slice(boundary + 2);
+                            if (!chunk || chunk.event === 'done') continue;
+                            
+                            text = chunk.event === 'replace' ? chunk.data : text + chunk.data;
+                            if (!contentDiv) {
+                                removeTypingIndicator();
+                                contentDiv = addMessage(text);
+                            } else {
+                                updateMessage(contentDiv, text);
+                            }
+                        }
+                    }
                     
-                    if (response.ok) {
-                        addMessage(data.response);
-                    } else {
+                    if (!contentDiv) {
+                        removeTypingIndicator();
                         addMessage("I'm sorry, I couldn't process your request. Please try again.");
                     }
                 } catch (error) {
@@ -931,6 +3515,35 @@ HTML_TEMPLATE = '''
                 }
             }
             
+            function parseEvent(rawEvent) {
+                let event = 'message';
+                let data = '';
+                for (const line of rawEvent.split('\\n')) {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                }
+                return data ? { event: event, data: JSON.parse(data) } : null;
+            }
+            
+            async function sendMessageJson(message) {
+                const response = await fetch('/chat', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    },
+                    body: JSON.stringify({ message: message }),
+                });
+                
+                const data = await response.json();
+                removeTypingIndicator();
+                
+                if (response.ok) {
+                    addMessage(data.response);
+                } else {
+                    addMessage("I'm sorry, I couldn't process your request. Please try again.");
+                }
+            }
+            
             sendButton.addEventListener('click', function() {
                 const message = userInput.value.trim();
                 if (message) {
@@ -959,6 +3572,20 @@ HTML_TEMPLATE = '''
 '''
 
 
+def _session_id() -> str:
+    """Return the caller's conversation id, issuing a new session cookie on first contact."""
+    session_id = session.get('sid')
+    if not session_id:
+        session_id = session['sid'] = uuid.uuid4().hex
+    return session_id
+
+
+def _json_object() -> Optional[dict]:
+    """The request's JSON body if it is an object; None if it is missing, malformed or any other JSON value."""
+    payload = request.get_json(silent=True)
+    return payload if isinstance(payload, dict) else None
+
+
 @app.route('/')
 def index():
     """Render the main chat interface."""
@@ -967,19 +3594,191 @@ def index():
 @app.route('/chat', methods=['POST'])
 def chat():
     """Process chat requests from the user."""
-    user_message = request.json.get('message', '')
+    payload = _json_object()
+    if payload is None:
+        return jsonify({'response': 'Please provide a message.'}), 400
+    user_message = payload.get('message', '')
     
     if not user_message:
         return jsonify({'response': 'Please provide a message.'})
     
+    tracing = trace_requested(request.headers.get(TRACE_HEADER) or request.args.get('trace'))
     try:
-        
-        response = infobot.get_response(user_message)
+        with request_trace() if tracing else nullcontext() as trace:
+            response = infobot.get_response(user_message, _session_id())
+        if trace is not None:
+            return jsonify({'response': response, 'trace': trace.to_dict()})
         return jsonify({'response': response})
     except Exception as e:
         logging.error(f"Error processing request: {str(e)}")
         return jsonify({'response': f"I'm sorry, I encountered an error: {str(e)}"})
 
 
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """Process a list of chat messages in one request, answering each unique question once."""
+    messages = (_json_object() or {}).get('messages')
+    
+    if not isinstance(messages, list) or not messages:
+        return jsonify({'error': 'Please provide a list of messages.'}), 400
+    if not all(isinstance(message, str) for message in messages):
+        return jsonify({'error': 'Every message must be a string.'}), 400
+    if len(messages) > infobot.batch_max_size:
+        return jsonify({'error': f"A batch may contain at most {infobot.batch_max_size} messages."}), 413
+    
+    tracing = trace_requested(request.headers.get(TRACE_HEADER) or request.args.get('trace'))
+    try:
+        with request_trace() if tracing else nullcontext() as trace:
+            responses = infobot.get_responses(messages, _session_id())
+        if trace is not None:
+            return jsonify({'responses': responses, 'trace': trace.to_dict()})
+        return jsonify({'responses': responses})
+    except Exception as e:
+        logging.error(f"Error processing batch request: {str(e)}")
+        return jsonify({'error': f"I'm sorry, I encountered an error: {str(e)}"}), 500
+
+
+@app.route('/metrics')
+def metrics():
+    """Expose pipeline, cache, pool and upstream metrics in the Prometheus text format."""
+    return Response(infobot.metrics_text(), mimetype='text/plain; version=0.0.4')
+
+
+def _sse_event(event: str, data: str) -> str:
+    """Encode one Server-Sent Events message; the payload is JSON so newlines survive framing."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """Stream the response to a chat message as Server-Sent Events."""
+    payload = _json_object()
+    if payload is None:
+        return jsonify({'response': 'Please provide a message.'}), 400
+    user_message = payload.get('message', '')
+    session_id = _session_id()
+    
+    def generate():
+        if not user_message:
+            yield _sse_event('replace', 'Please provide a message.')
+            yield _sse_event('done', '')
+            return
+        for event, data in infobot.stream_response(user_message, session_id):
+            yield _sse_event(event, data)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+class ChatASGIApp:
+    """ASGI entry point that serves POST /chat natively on the event loop.
+    
+    Each in-flight question only holds a coroutine while it waits on the network, so one worker
+    can carry hundreds of them. Every other route is delegated to the Flask app. Serve it with
+    `uvicorn infobot_all_in_one:asgi_app` or gunicorn's `uvicorn.workers.UvicornWorker`.
+    """
+
+    def __init__(self, bot: InfoBot, wsgi_app: Flask):
+        self.bot, self.wsgi_app = bot, wsgi_app
+        self._fallback = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http' and scope['path'] == '/chat' and scope['method'] == 'POST':
+            await self._chat(scope, receive, send)
+        else:
+            if self._fallback is None:
+                from asgiref.wsgi import WsgiToAsgi
+                self._fallback = WsgiToAsgi(self.wsgi_app)
+            await self._fallback(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.bot.aio.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _session(self, scope) -> Tuple[str, Optional[bytes]]:
+        """Read the conversation id from the Flask session cookie, minting one if needed.
+        
+        Returns the id and, for new sessions, the Set-Cookie header value to send back.
+        """
+        interface, app = self.wsgi_app.session_interface, self.wsgi_app
+        serializer = interface.get_signing_serializer(app)
+        cookie_name = interface.get_cookie_name(app)
+        for name, value in scope.get('headers', []):
+            if name != b'cookie':
+                continue
+            for morsel in value.decode('latin-1').split(';'):
+                key, _, token = morsel.strip().partition('=')
+                if key != cookie_name:
+                    continue
+                try:
+                    session_id = serializer.loads(token).get('sid')
+                except Exception:
+                    session_id = None
+                if session_id:
+                    return session_id, None
+        session_id = uuid.uuid4().hex
+        token = serializer.dumps({'sid': session_id})
+        # The attributes Flask gives its own session cookie, from the SESSION_COOKIE_* settings
+        cookie = dump_cookie(cookie_name, token, path=interface.get_cookie_path(app), domain=interface.get_cookie_domain(app),
+                             secure=interface.get_cookie_secure(app), httponly=interface.get_cookie_httponly(app),
+                             samesite=interface.get_cookie_samesite(app))
+        return session_id, cookie.encode('latin-1')
+
+    async def _chat(self, scope, receive, send):
+        """Async twin of the Flask chat() view."""
+        session_id, set_cookie = self._session(scope)
+        body, more_body = b'', True
+        while more_body:
+            message = await receive()
+            body += message.get('body', b'')
+            more_body = message.get('more_body', False)
+        
+        try:
+            user_message = json.loads(body).get('message', '')
+        except (ValueError, AttributeError):
+            await self._send_json(send, {'response': 'Please provide a message.'}, status=400)
+            return
+        
+        if not user_message:
+            await self._send_json(send, {'response': 'Please provide a message.'}, set_cookie=set_cookie)
+            return
+        
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        flag = dict(scope.get('headers', ())).get(TRACE_HEADER.lower().encode('latin-1'), b'').decode('latin-1')
+        tracing = trace_requested(flag or query.get('trace', [''])[0])
+        try:
+            with request_trace() if tracing else nullcontext() as trace:
+                response = await self.bot.get_response_async(user_message, session_id)
+            payload = {'response': response}
+            if trace is not None:
+                payload['trace'] = trace.to_dict()
+            await self._send_json(send, payload, set_cookie=set_cookie)
+        except Exception as e:
+            logging.error(f"Error processing request: {str(e)}")
+            await self._send_json(send, {'response': f"I'm sorry, I encountered an error: {str(e)}"}, set_cookie=set_cookie)
+
+    @staticmethod
+    async def _send_json(send, payload: Dict, status: int = 200, set_cookie: Optional[bytes] = None):
+        body = json.dumps(payload).encode('utf-8')
+        headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode('ascii'))]
+        if set_cookie:
+            headers.append((b'set-cookie', set_cookie))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+
+asgi_app = ChatASGIApp(infobot, app)
+
+logging.info(f"InfoBot startup: {startup_report()}")
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
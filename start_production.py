@@ -0,0 +1,102 @@
+"""Production entry point: gunicorn with InfoBot loaded once in the master and shared by its workers.
+
+The master imports infobot_all_in_one, which builds InfoBot and its Markov model, and then warms
+up everything InfoBot otherwise loads on first use: NLTK stopwords, lemmatizer and tokenizers,
+trafilatura and BeautifulSoup. Workers inherit those pages copy-on-write instead of
+each rebuilding a private copy, but a page is only shared until the worker writes to it, and
+reading any Python object writes its reference count. Freezing the garbage collector before each
+fork keeps collections from touching every preloaded object; the objects a worker actually uses
+are still copied page by page, which is why the Markov model keeps its data in flat buffers.
+Every worker logs its memory once it has booted. The shared figure is what preloading saves,
+and PSS is each worker's fair share of the total.
+
+The content index snapshot (INFOBOT_CONTENT_INDEX_SNAPSHOT) is restored once by the master and
+saved by each worker as it exits, merged with what the other workers saved; the master never
+saves it, since its copy of the index stops learning at the fork.
+
+Configuration comes from the environment:
+
+    INFOBOT_BIND            address to listen on (default 0.0.0.0:5000)
+    INFOBOT_WORKERS         worker processes (default 2 x CPUs + 1)
+    INFOBOT_WORKER_CLASS    'gthread' for threaded WSGI workers (default) or 'asgi' for uvicorn workers
+    INFOBOT_THREADS         threads per gthread worker (default 8)
+    INFOBOT_WORKER_TIMEOUT  seconds before a silent worker is restarted (default 60)
+
+    python start_production.py
+"""
+import atexit, gc, logging, os
+
+from gunicorn.app.base import BaseApplication
+
+import infobot_all_in_one
+from infobot_all_in_one import _env_int, process_memory
+
+WORKER_CLASSES = {'gthread': 'gthread', 'asgi': 'uvicorn.workers.UvicornWorker'}
+
+
+def _mib(size: int) -> str:
+    return f"{size / 2 ** 20:.1f} MiB"
+
+
+def pre_fork(server, worker):
+    # Frozen objects are skipped by the GC, so collections in the worker do not dirty their pages;
+    # refcount updates on the objects the worker uses still do
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    memory = process_memory()
+    if memory:
+        worker.log.info(f"Worker {worker.pid} booted: rss={_mib(memory['rss'])} pss={_mib(memory['pss'])} "
+                        f"shared={_mib(memory['shared'])} private={_mib(memory['private'])}")
+
+
+def worker_exit(server, worker):
+    infobot_all_in_one.infobot.save_content_index()
+
+
+class InfoBotApplication(BaseApplication):
+    """gunicorn application serving the already imported InfoBot app."""
+
+    def __init__(self, application, options: dict):
+        self.application, self.options = application, options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def main():
+    worker_class = os.environ.get('INFOBOT_WORKER_CLASS', 'gthread').strip().lower()
+    if worker_class not in WORKER_CLASSES:
+        raise SystemExit(f"INFOBOT_WORKER_CLASS must be one of {', '.join(WORKER_CLASSES)}, not {worker_class!r}")
+
+    infobot_all_in_one.infobot.warm_up()
+    atexit.unregister(infobot_all_in_one.infobot.save_content_index)
+    gc.collect()
+    master = process_memory()
+    if master:
+        logging.info(f"Master preloaded: rss={_mib(master['rss'])} ({infobot_all_in_one.startup_report()})")
+
+    options = {
+        'bind': os.environ.get('INFOBOT_BIND', '0.0.0.0:5000'),
+        'workers': _env_int('INFOBOT_WORKERS', 2 * (os.cpu_count() or 1) + 1),
+        'worker_class': WORKER_CLASSES[worker_class],
+        'timeout': _env_int('INFOBOT_WORKER_TIMEOUT', 60),
+        'preload_app': True,
+        'pre_fork': pre_fork,
+        'post_worker_init': post_worker_init,
+        'worker_exit': worker_exit,
+    }
+    if worker_class == 'gthread':
+        options['threads'] = _env_int('INFOBOT_THREADS', 8)
+    application = infobot_all_in_one.asgi_app if worker_class == 'asgi' else infobot_all_in_one.app
+    InfoBotApplication(application, options).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -20,6 +20,14 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Scroll to the bottom
         chatMessages.scrollTop = chatMessages.scrollHeight;
+        
+        return contentDiv;
+    }
+    
+    // Replace the text of a message that is still being streamed
+    function updateMessage(contentDiv, text) {
+        contentDiv.innerHTML = formatMessageText(text);
+        chatMessages.scrollTop = chatMessages.scrollHeight;
     }
     
     // Format message text with line breaks and clickable links
@@ -56,12 +64,12 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
-    // Send message to the server
+    // Send message to the server, rendering the answer progressively as it streams in
     async function sendMessage(message) {
         try {
             showTypingIndicator();
             
-            const response = await fetch('/chat', {
+            const response = await fetch('/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -69,12 +77,42 @@ document.addEventListener('DOMContentLoaded', function() {
                 body: JSON.stringify({ message: message }),
             });
             
-            const data = await response.json();
-            removeTypingIndicator();
+            // Servers without the streaming endpoint get the plain JSON request
+            if (!response.ok || !response.body) {
+                await sendMessageJson(message);
+                return;
+            }
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let text = '';
+            let contentDiv = null;
+            
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                
+                // Server-Sent Events are separated by a blank line
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const chunk = parseEvent(buffer.slice(0, boundary));
+                    buffer = buffer.slice(boundary + 2);
+                    if (!chunk || chunk.event === 'done') continue;
+                    
+                    text = chunk.event === 'replace' ? chunk.data : text + chunk.data;
+                    if (!contentDiv) {
+                        removeTypingIndicator();
+                        contentDiv = addMessage(text);
+                    } else {
+                        updateMessage(contentDiv, text);
+                    }
+                }
+            }
             
-            if (response.ok) {
-                addMessage(data.response);
-            } else {
+            if (!contentDiv) {
+                removeTypingIndicator();
                 addMessage("I'm sorry, I couldn't process your request. Please try again.");
             }
         } catch (error) {
@@ -84,6 +122,37 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
+    // Parse one Server-Sent Event into its name and JSON-encoded payload
+    function parseEvent(rawEvent) {
+        let event = 'message';
+        let data = '';
+        for (const line of rawEvent.split('\n')) {
+            if (line.startsWith('event: ')) event = line.slice(7);
+            else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        return data ? { event: event, data: JSON.parse(data) } : null;
+    }
+    
+    // Send message to the non-streaming endpoint
+    async function sendMessageJson(message) {
+        const response = await fetch('/chat', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ message: message }),
+        });
+        
+        const data = await response.json();
+        removeTypingIndicator();
+        
+        if (response.ok) {
+            addMessage(data.response);
+        } else {
+            addMessage("I'm sorry, I couldn't process your request. Please try again.");
+        }
+    }
+    
     // Handle send button click
     sendButton.addEventListener('click', function() {
         const message = userInput.value.trim();
@@ -0,0 +1,78 @@
+import os, sys, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Importing the app builds an InfoBot: keep it off the network, the NLTK downloader and instance/
+os.environ.setdefault('INFOBOT_NLTK_STARTUP', 'lazy')
+os.environ.setdefault('INFOBOT_PAGE_CACHE', 'off')
+os.environ.setdefault('INFOBOT_CONTENT_INDEX_SNAPSHOT', '')
+
+
+class FakeClock:
+    """Stand-in for time.monotonic that only moves when a test advances it."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class _UpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.server.requests.append(url.path)
+        route = self.server.routes.get(url.path)
+        status, headers, body = route(parse_qs(url.query)) if route else (404, {}, b'not found')
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if 'Content-Length' not in headers:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class Upstream(ThreadingHTTPServer):
+    """Local HTTP server answering each path from a route: fn(query) -> (status, headers, body)."""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _UpstreamHandler)
+        self.routes, self.requests = {}, []
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+@pytest.fixture(scope='session')
+def infobot_module():
+    import infobot_all_in_one
+    return infobot_all_in_one
+
+
+@pytest.fixture
+def clock(infobot_module, monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(infobot_module.time, 'monotonic', fake)
+    return fake
+
+
+@pytest.fixture
+def upstream():
+    server = Upstream()
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,70 @@
+import sys
+
+import pytest
+
+
+@pytest.fixture
+def cache(infobot_module, clock):
+    return infobot_module.AnswerCache({'wikipedia': 60.0, 'duckduckgo': 10.0}, max_entries=3, default_ttl=30.0)
+
+
+def test_entries_expire_after_their_source_ttl(cache, clock):
+    cache.set('wikipedia', 'python', 'wiki answer')
+    cache.set('duckduckgo', 'python', 'ddg answer')
+
+    clock.advance(9.9)
+    assert cache.get('duckduckgo', 'python') == 'ddg answer'
+    clock.advance(0.1)
+    assert cache.get('duckduckgo', 'python') is None
+    assert cache.get('wikipedia', 'python') == 'wiki answer'
+    clock.advance(50.0)
+    assert cache.get('wikipedia', 'python') is None
+
+    stats = cache.stats()
+    assert stats['entries'] == 0 and stats['bytes'] == 0
+    assert stats['hits'] == {'duckduckgo': 1, 'wikipedia': 1}
+    assert stats['misses'] == {'duckduckgo': 1, 'wikipedia': 1}
+
+
+def test_unknown_source_uses_the_default_ttl(cache, clock):
+    cache.set('web_scrape', 'https://example.com', 'page')
+    clock.advance(29.0)
+    assert cache.get('web_scrape', 'https://example.com') == 'page'
+    clock.advance(1.0)
+    assert cache.get('web_scrape', 'https://example.com') is None
+
+
+def test_least_recently_used_entry_is_evicted_first(cache):
+    for key in ('a', 'b', 'c'):
+        cache.set('wikipedia', key, key.upper())
+    assert cache.get('wikipedia', 'a') == 'A'
+
+    cache.set('wikipedia', 'd', 'D')
+
+    assert cache.get('wikipedia', 'b') is None
+    assert [cache.get('wikipedia', key) for key in ('a', 'c', 'd')] == ['A', 'C', 'D']
+    assert cache.stats()['evictions'] == 1
+
+
+def test_replacing_a_key_does_not_evict(cache):
+    for key in ('a', 'b', 'c'):
+        cache.set('wikipedia', key, key)
+    cache.set('wikipedia', 'a', 'new a')
+
+    assert cache.get('wikipedia', 'a') == 'new a'
+    assert cache.stats()['entries'] == 3 and cache.stats()['evictions'] == 0
+
+
+def test_byte_limit_evicts_and_oversized_values_are_not_stored(infobot_module, clock):
+    value = 'x' * 1000
+    size = sys.getsizeof(value)
+    cache = infobot_module.AnswerCache({}, max_entries=100, max_bytes=2 * size)
+
+    for key in ('a', 'b', 'c'):
+        cache.set('wikipedia', key, value)
+    assert cache.get('wikipedia', 'a') is None
+    assert cache.stats()['bytes'] == 2 * size
+
+    cache.set('wikipedia', 'huge', 'x' * 3000)
+    assert cache.get('wikipedia', 'huge') is None
+    assert cache.stats()['entries'] == 2
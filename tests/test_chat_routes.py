@@ -0,0 +1,69 @@
+import pytest
+
+
+@pytest.fixture
+def client(infobot_module):
+    return infobot_module.app.test_client()
+
+
+@pytest.mark.parametrize('body', ['[]', '["what is python"]', '"what is python"', '42', 'null', '{not json'])
+def test_chat_rejects_a_body_that_is_not_a_json_object(client, body):
+    response = client.post('/chat', data=body, content_type='application/json')
+    assert response.status_code == 400
+    assert response.get_json() == {'response': 'Please provide a message.'}
+
+
+@pytest.mark.parametrize('body', ['[]', '["what is python"]', '"what is python"', '{"messages": []}',
+                                  '{"messages": "what is python"}'])
+def test_batch_rejects_a_body_without_a_list_of_messages(client, body):
+    response = client.post('/chat/batch', data=body, content_type='application/json')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Please provide a list of messages.'}
+
+
+@pytest.mark.parametrize('messages', [["what is python", 42], [None], [["what is python"]], [{'message': 'hi'}]])
+def test_batch_rejects_messages_that_are_not_strings(client, monkeypatch, infobot_module, messages):
+    monkeypatch.setattr(infobot_module.infobot, 'get_responses', lambda *args: pytest.fail("reached the executor"))
+    response = client.post('/chat/batch', json={'messages': messages})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Every message must be a string.'}
+
+
+def test_batch_lookups_record_on_the_request_trace(client, monkeypatch, infobot_module):
+    def answer(query):
+        infobot_module.trace_branch(f"answered:{query}")
+        return query.upper()
+
+    monkeypatch.setattr(infobot_module.infobot, '_answer_question', answer)
+    response = client.post('/chat/batch?trace=1', json={'messages': ["what is python", "what is rust"]})
+    body = response.get_json()
+    assert [r['response'] for r in body['responses']] == ["PYTHON", "RUST"]
+    assert sorted(body['trace']['branches']) == ["answered:python", "answered:rust"]
+
+
+@pytest.mark.parametrize('body', ['["what is python"]', '"what is python"', '{not json'])
+def test_stream_rejects_a_body_that_is_not_a_json_object(client, body):
+    response = client.post('/chat/stream', data=body, content_type='application/json')
+    assert response.status_code == 400
+    assert response.get_json() == {'response': 'Please provide a message.'}
+
+
+def test_stream_without_a_message_asks_for_one(client):
+    response = client.post('/chat/stream', json={})
+    assert response.mimetype == 'text/event-stream'
+    assert response.get_data(as_text=True) == 'event: replace\ndata: "Please provide a message."\n\nevent: done\ndata: ""\n\n'
+
+
+def test_asgi_session_cookie_follows_the_flask_cookie_settings(infobot_module, monkeypatch):
+    app = infobot_module.app
+    for key, value in (('SESSION_COOKIE_NAME', 'infobot'), ('SESSION_COOKIE_SECURE', True),
+                       ('SESSION_COOKIE_SAMESITE', 'Strict'), ('SESSION_COOKIE_HTTPONLY', False)):
+        monkeypatch.setitem(app.config, key, value)
+
+    session_id, set_cookie = infobot_module.asgi_app._session({'headers': []})
+    name, _, attributes = set_cookie.decode('latin-1').partition('=')
+    assert name == 'infobot'
+    assert {part.strip() for part in attributes.split(';')[1:]} == {'Secure', 'Path=/', 'SameSite=Strict'}
+
+    token = attributes.split(';')[0]
+    assert infobot_module.asgi_app._session({'headers': [(b'cookie', f"infobot={token}".encode())]}) == (session_id, None)
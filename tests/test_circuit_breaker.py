@@ -0,0 +1,102 @@
+import pytest
+
+
+@pytest.fixture
+def breaker(infobot_module, clock):
+    return infobot_module.CircuitBreaker('wikipedia', failure_threshold=3, reset_timeout=30.0)
+
+
+def fail(breaker, times: int = 1) -> None:
+    for _ in range(times):
+        breaker.before_call()
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures_and_rejects_calls(infobot_module, breaker):
+    fail(breaker, 2)
+    breaker.before_call()
+    breaker.record_success(0.1)
+    fail(breaker, 2)
+    assert breaker.state == breaker.CLOSED
+
+    fail(breaker)
+    assert breaker.state == breaker.OPEN
+    with pytest.raises(infobot_module.UpstreamUnavailable) as excinfo:
+        breaker.before_call()
+    assert excinfo.value.retry_after == 30.0
+    assert breaker.stats()['opened'] == 1 and breaker.stats()['rejected'] == 1
+
+
+def test_half_open_admits_a_single_probe_whose_success_closes_the_breaker(infobot_module, breaker, clock):
+    fail(breaker, 3)
+    clock.advance(29.0)
+    with pytest.raises(infobot_module.UpstreamUnavailable):
+        breaker.before_call()
+
+    clock.advance(1.0)
+    breaker.before_call()
+    assert breaker.state == breaker.HALF_OPEN
+    with pytest.raises(infobot_module.UpstreamUnavailable):
+        breaker.before_call()
+
+    breaker.record_success(0.2)
+    assert breaker.state == breaker.CLOSED
+    breaker.before_call()
+
+
+def test_failed_probe_reopens_for_another_reset_timeout(infobot_module, breaker, clock):
+    fail(breaker, 3)
+    clock.advance(30.0)
+    fail(breaker)
+    assert breaker.state == breaker.OPEN
+    assert breaker.stats()['opened'] == 2
+
+    clock.advance(29.0)
+    with pytest.raises(infobot_module.UpstreamUnavailable):
+        breaker.before_call()
+    clock.advance(1.0)
+    breaker.before_call()
+    assert breaker.state == breaker.HALF_OPEN
+
+
+def test_released_probe_lets_the_next_call_probe(breaker, clock):
+    fail(breaker, 3)
+    clock.advance(30.0)
+    breaker.before_call()
+    breaker.release()
+    breaker.before_call()
+    assert breaker.state == breaker.HALF_OPEN
+
+
+def test_read_timeout_adapts_to_the_p99_latency(infobot_module):
+    breaker = infobot_module.CircuitBreaker('duckduckgo', max_timeout=10.0, min_timeout=1.0,
+                                            timeout_multiplier=3.0, min_samples=20)
+    for _ in range(19):
+        breaker.record_success(0.5)
+    assert breaker.before_call() == 10.0
+    breaker.record_success(0.5)
+    assert breaker.before_call() == 1.5
+    for _ in range(20):
+        breaker.record_success(0.1)
+    assert breaker.before_call() == 1.5
+    for _ in range(200):
+        breaker.record_success(0.1)
+    assert breaker.before_call() == 1.0
+
+
+def test_upstream_health_counts_errors_as_failures_and_expected_ones_as_successes(infobot_module, clock):
+    health = infobot_module.UpstreamHealth(failure_threshold=2)
+
+    with pytest.raises(KeyError):
+        with health.call('wikipedia', expected=(KeyError,)):
+            raise KeyError('missing page')
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            with health.call('wikipedia'):
+                raise ValueError('bad JSON')
+
+    stats = health.stats()['wikipedia']
+    assert (stats['successes'], stats['failures'], stats['state']) == (1, 2, 'open')
+    with pytest.raises(infobot_module.UpstreamUnavailable):
+        with health.call('wikipedia'):
+            pass
@@ -0,0 +1,54 @@
+import pytest
+
+
+@pytest.fixture
+def make_index(infobot_module):
+    def make(max_passages=100):
+        return infobot_module.ContentIndex(lambda text: text.lower().split(), max_passages=max_passages)
+    return make
+
+
+def test_merged_snapshots_keep_what_every_process_learned(make_index, tmp_path):
+    path = str(tmp_path / 'index.json')
+    shared = make_index()
+    shared.add('https://example.com/shared', "Known to every worker.")
+    shared.snapshot(path)
+
+    first, second = make_index(), make_index()
+    for worker in (first, second):
+        worker.restore(path)
+    first.add('https://example.com/first', "Only the first worker saw this.")
+    second.add('https://example.com/second', "Only the second worker saw this.")
+    first.snapshot(path, merge=True)
+    second.snapshot(path, merge=True)
+
+    restored = make_index()
+    assert restored.restore(path) == 3
+    assert all(url in restored for url in ('https://example.com/shared', 'https://example.com/first',
+                                           'https://example.com/second'))
+
+
+def test_merge_drops_the_oldest_documents_of_the_file_first(make_index, tmp_path):
+    path = str(tmp_path / 'index.json')
+    earlier = make_index()
+    for name in ('old', 'newer'):
+        earlier.add(f"https://example.com/{name}", f"The {name} page.")
+    earlier.snapshot(path)
+
+    latest = make_index(max_passages=2)
+    latest.add('https://example.com/latest', "The latest page.")
+    latest.snapshot(path, merge=True)
+
+    restored = make_index()
+    restored.restore(path)
+    assert 'https://example.com/old' not in restored
+    assert 'https://example.com/newer' in restored and 'https://example.com/latest' in restored
+
+
+def test_unreadable_snapshot_is_replaced_by_a_merge(make_index, tmp_path):
+    path = tmp_path / 'index.json'
+    path.write_text("{truncated")
+    index = make_index()
+    index.add('https://example.com/page', "Some page.")
+    index.snapshot(str(path), merge=True)
+    assert make_index().restore(str(path)) == 1
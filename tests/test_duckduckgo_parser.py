@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'fixtures',
+                       'ddg_lite.html')
+
+PAGE = """<html><head><title>python at DuckDuckGo</title></head><body>
+<form action="/lite/" method="post"><a href="/settings" class="nav">Settings</a></form>
+<table>
+  <tr><td>&nbsp;</td><td><span class="link-text">Zero-click info</span></td></tr>
+  <tr>
+    <td valign="top">1.&nbsp;</td>
+    <td><a rel="nofollow" href="https://www.python.org/" class='result-link'>Welcome to <b>Python</b>.org</a></td>
+  </tr>
+  <tr>
+    <td>&nbsp;</td>
+    <td class='result-snippet'>The official home of the <b>Python</b>
+        Programming Language &amp; its <td>docs</td> community.</td>
+  </tr>
+  <tr><td>&nbsp;</td><td><span class='link-text'>www.python.org</span></td></tr>
+  <tr>
+    <td valign="top">2.&nbsp;</td>
+    <td><a rel="nofollow" href="https://docs.python.org/3/" class="result-link sponsored">Python 3 docs</a></td>
+  </tr>
+  <tr>
+    <td valign="top">3.&nbsp;</td>
+    <td><a rel="nofollow" href="" class='result-link'>No URL</a></td>
+  </tr>
+  <tr>
+    <td valign="top">4.&nbsp;</td>
+    <td><a rel="nofollow" href="https://en.wikipedia.org/wiki/Python_(programming_language)" class='result-link'>Python - Wikipedia</a></td>
+  </tr>
+  <tr><td>&nbsp;</td><td class='result-snippet'>Python is a high-level language.</td></tr>
+</table>
+</body></html>"""
+
+
+@pytest.fixture
+def parse(infobot_module):
+    return infobot_module.parse_duckduckgo_results
+
+
+def test_results_pair_each_link_with_the_snippet_that_follows_it(parse):
+    assert parse(PAGE) == [
+        {'title': 'Welcome to Python.org', 'url': 'https://www.python.org/',
+         'snippet': 'The official home of the Python Programming Language & its docs community.'},
+        {'title': 'Python 3 docs', 'url': 'https://docs.python.org/3/', 'snippet': ''},
+        {'title': 'Python - Wikipedia', 'url': 'https://en.wikipedia.org/wiki/Python_(programming_language)',
+         'snippet': 'Python is a high-level language.'},
+    ]
+
+
+def test_limit_stops_after_that_many_results(parse):
+    assert [result['title'] for result in parse(PAGE, limit=2)] == ['Welcome to Python.org', 'Python 3 docs']
+
+
+def test_page_without_results_parses_to_nothing(parse):
+    assert parse("<html><body><p>No results.</p></body></html>") == []
+    assert parse("") == []
+
+
+def test_fixture_page_matches_a_full_tree_parse(parse):
+    bs4 = pytest.importorskip('bs4')
+    with open(FIXTURE, encoding='utf-8') as f:
+        html = f.read()
+    soup = bs4.BeautifulSoup(html, 'html.parser')
+    links = soup.find_all('a', class_='result-link')
+
+    results = parse(html)
+
+    assert len(results) == len(links) > 5
+    assert [(r['title'], r['url']) for r in results] == [(a.get_text(" ", strip=True), a['href']) for a in links]
+    assert all(result['snippet'] for result in results)
+    assert parse(html, limit=5) == results[:5]
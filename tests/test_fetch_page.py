@@ -0,0 +1,69 @@
+import asyncio, gzip
+
+import pytest
+
+BODY = b"<html><body><p>" + b"Streaming page body. " * 200 + b"</p></body></html>"
+
+
+@pytest.fixture(params=['sync', 'async'])
+def fetch(request, infobot_module):
+    """fetch(url, max_bytes) -> (FetchedPage, stats snapshot) through HttpClient or AsyncHttpClient."""
+    def run(url, max_bytes):
+        stats = infobot_module.PageFetchStats()
+        if request.param == 'sync':
+            client = infobot_module.HttpClient(retries=0)
+            try:
+                return client.fetch_page(url, max_bytes, stats), stats.snapshot()
+            finally:
+                client.close()
+
+        async def main():
+            client = infobot_module.AsyncHttpClient()
+            try:
+                return await client.fetch_page(url, max_bytes, stats)
+            finally:
+                await client.close()
+        return asyncio.run(main()), stats.snapshot()
+    return run
+
+
+@pytest.fixture
+def page_url(upstream):
+    upstream.routes['/page'] = lambda query: (200, {'Content-Type': 'text/html; charset=utf-8'}, BODY)
+    return upstream.url('/page')
+
+
+def test_page_that_fits_the_budget_exactly_is_not_truncated(fetch, page_url):
+    page, stats = fetch(page_url, len(BODY))
+    assert page.content == BODY and not page.truncated
+    assert stats == {'pages': 1, 'bytes_read': len(BODY), 'bytes_saved': 0, 'truncated': 0, 'aborted': 0}
+
+
+def test_page_one_byte_over_the_budget_is_truncated(fetch, page_url):
+    page, stats = fetch(page_url, len(BODY) - 1)
+    assert page.content == BODY[:-1] and page.truncated
+    assert stats == {'pages': 1, 'bytes_read': len(BODY) - 1, 'bytes_saved': 1, 'truncated': 1, 'aborted': 0}
+
+
+def test_large_page_stops_at_the_budget(fetch, upstream):
+    body = b"<html><body>" + b"x" * 2_000_000 + b"</body></html>"
+    upstream.routes['/big'] = lambda query: (200, {'Content-Type': 'text/html'}, body)
+    page, stats = fetch(upstream.url('/big'), 50_000)
+    assert page.content == body[:50_000] and page.truncated
+    assert stats['bytes_read'] == 50_000 and stats['bytes_saved'] == len(body) - 50_000
+
+
+def test_compressed_page_is_budgeted_in_decoded_bytes(fetch, upstream):
+    body = b"<html><body>" + b"compressible " * 20_000 + b"</body></html>"
+    upstream.routes['/gzip'] = lambda query: (200, {'Content-Type': 'text/html', 'Content-Encoding': 'gzip'},
+                                              gzip.compress(body))
+    page, stats = fetch(upstream.url('/gzip'), 10_000)
+    assert page.content == body[:10_000] and page.truncated
+    # The wire size says nothing about how many decoded bytes were skipped
+    assert stats['bytes_read'] == 10_000 and stats['bytes_saved'] == 0
+
+
+def test_non_text_document_is_rejected_before_its_body_is_read(infobot_module, fetch, upstream):
+    upstream.routes['/doc.pdf'] = lambda query: (200, {'Content-Type': 'application/pdf'}, b"%PDF-1.4" + b"0" * 5000)
+    with pytest.raises(infobot_module.UnsupportedContentError):
+        fetch(upstream.url('/doc.pdf'), 100_000)
@@ -0,0 +1,21 @@
+import random
+from collections import Counter
+
+
+def test_walk_follows_trigrams_until_a_dead_end(infobot_module):
+    model = infobot_module.MarkovModel.build(iter("The cat sat on the mat".split()))
+    assert model.generate(25, random.Random(1)) == "The cat sat on the mat"
+
+
+def test_successors_are_picked_by_trigram_count(infobot_module):
+    model = infobot_module.MarkovModel.build(iter(("Ok go left . " * 3 + "Ok go right . ").split()))
+    rng = random.Random(7)
+    picks = Counter(model.generate(1, rng).split()[2] for _ in range(4000))
+    assert set(picks) == {'left', 'right'}
+    assert 2.5 < picks['left'] / picks['right'] < 3.5
+
+
+def test_vocabulary_round_trips_non_ascii_words(infobot_module):
+    model = infobot_module.MarkovModel.build(iter("Über café naïve résumé".split()))
+    assert model.generate(5, random.Random(3)) == "Über café naïve résumé"
+    assert model.stats()['words'] == 4
@@ -0,0 +1,33 @@
+import pytest
+
+
+@pytest.fixture
+def bot(infobot_module, monkeypatch, tmp_path):
+    monkeypatch.setenv('INFOBOT_PAGE_CACHE', str(tmp_path / 'pages.sqlite3'))
+    bot = infobot_module.InfoBot()
+    yield bot
+    bot.http.close()
+    bot.executor.shutdown()
+
+
+def test_page_fetch_scrape_and_page_cache_stats_are_exported(bot):
+    bot.page_stats.record(bytes_read=4096, bytes_saved=1000, truncated=True)
+    bot.page_stats.record(aborted=True)
+    bot.scrape_stats.record('trafilatura', {'fetch': 0.25, 'extract': 0.5})
+    bot.page_cache.put('https://example.com/', b"<html>cached</html>", ttl=60.0)
+
+    lines = bot.metrics_text().splitlines()
+
+    size = bot.page_cache.stats()['bytes']
+    for line in ('infobot_page_fetches_total{outcome="pages"} 2', 'infobot_page_fetches_total{outcome="truncated"} 1',
+                 'infobot_page_fetches_total{outcome="aborted"} 1', 'infobot_page_fetch_bytes_total{kind="read"} 4096',
+                 'infobot_page_fetch_bytes_total{kind="saved"} 1000',
+                 'infobot_scrape_pages_total{extractor="trafilatura"} 1',
+                 'infobot_scrape_stage_seconds_total{stage="extract"} 0.5',
+                 'infobot_page_cache_documents 1', f'infobot_page_cache_bytes {size}'):
+        assert line in lines
+
+
+def test_page_cache_gauges_are_left_out_without_a_page_cache(bot):
+    bot.page_cache = None
+    assert not any(line.startswith('infobot_page_cache') for line in bot.metrics_text().splitlines())
@@ -0,0 +1,39 @@
+import json, os, subprocess, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter: the race is in nltk's first import, which this test process has already done
+COLD_START = """
+import json, logging, threading
+import infobot_all_in_one as m
+logging.disable(logging.CRITICAL)
+bot = m.InfoBot()
+humanizer = m.Humanizer(["Well, "], use_nltk=True)
+calls = [lambda: bot.stop_words, lambda: bot.lemmatizer, lambda: bot.preprocess_text("What are the cats doing"),
+         lambda: humanizer.split("One sentence. Two sentences.")]
+errors, barrier = [], threading.Barrier(32)
+
+def run(i):
+    barrier.wait()
+    try:
+        calls[i % len(calls)]()
+    except Exception as e:
+        errors.append(repr(e))
+
+threads = [threading.Thread(target=run, args=(i,)) for i in range(32)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+print(json.dumps({'errors': errors, 'tokens': bot.preprocess_text("What are the cats doing")}))
+"""
+
+
+def test_concurrent_first_use_of_nltk_does_not_fail():
+    env = dict(os.environ, INFOBOT_NLTK_STARTUP='lazy', INFOBOT_PAGE_CACHE='off', INFOBOT_CONTENT_INDEX_SNAPSHOT='')
+    result = subprocess.run([sys.executable, '-c', COLD_START], cwd=ROOT, env=env, capture_output=True, text=True,
+                            timeout=120)
+    assert result.returncode == 0, result.stderr
+    outcome = json.loads(result.stdout.strip().splitlines()[-1])
+    assert outcome['errors'] == []
+    assert 'cat' in ' '.join(outcome['tokens'])
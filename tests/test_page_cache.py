@@ -0,0 +1,53 @@
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'pages.sqlite3')
+
+
+def stored_totals(path):
+    with sqlite3.connect(path) as conn:
+        return dict(zip(('documents', 'bytes'), conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM documents')
+                        .fetchone()))
+
+
+def test_totals_follow_puts_replacements_and_evictions(infobot_module, cache_path):
+    cache = infobot_module.PageCache(cache_path, max_bytes=10_000)
+    for i in range(5):
+        cache.put(f"https://example.com/{i}", b"x" * 100, ttl=60.0, text="y" * 1000)
+    cache.put('https://example.com/0', b"x" * 100, ttl=60.0, text="y" * 10)
+    assert cache.stats() == stored_totals(cache_path)
+
+    for i in range(5, 20):
+        cache.put(f"https://example.com/{i}", b"x" * 100, ttl=60.0, text="y" * 1000)
+    assert cache.stats() == stored_totals(cache_path)
+    assert cache.stats()['bytes'] <= 10_000
+    assert cache.get('https://example.com/19') is not None and cache.get('https://example.com/1') is None
+
+
+def test_writes_through_another_connection_are_counted(infobot_module, cache_path):
+    first = infobot_module.PageCache(cache_path, max_bytes=3_000)
+    second = infobot_module.PageCache(cache_path, max_bytes=3_000)
+    for i in range(3):
+        first.put(f"https://example.com/a{i}", b"", ttl=60.0, text="y" * 900)
+    second.put('https://example.com/b', b"", ttl=60.0, text="y" * 900)
+
+    assert first.stats() == second.stats() == stored_totals(cache_path)
+    assert first.stats()['bytes'] <= 3_000
+
+
+def test_cache_from_before_the_totals_table_is_counted_on_open(infobot_module, cache_path):
+    with sqlite3.connect(cache_path) as conn:
+        conn.execute('CREATE TABLE documents (url TEXT PRIMARY KEY, body BLOB NOT NULL, text TEXT, etag TEXT, '
+                     'last_modified TEXT, size INTEGER NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)')
+        conn.executemany('INSERT INTO documents VALUES (?, ?, NULL, NULL, NULL, ?, 0, 0)',
+                         [(f"https://example.com/{i}", b"", 100 * i) for i in range(4)])
+
+    cache = infobot_module.PageCache(cache_path)
+    assert cache.stats() == {'documents': 4, 'bytes': 600}
+    cache.put('https://example.com/4', b"", ttl=60.0, text="y" * 50)
+    assert cache.stats() == stored_totals(cache_path)
+    assert cache.stats()['documents'] == 5
@@ -0,0 +1,114 @@
+import asyncio, threading, time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+
+def wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting for callers to coalesce"
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def flight(infobot_module):
+    return infobot_module.SingleFlight()
+
+
+def test_concurrent_identical_calls_share_one_fetch(flight):
+    release, calls = threading.Event(), []
+
+    def fetch(query):
+        calls.append(query)
+        release.wait(5)
+        return f"answer for {query}"
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(flight.do, 'wikipedia', 'python', fetch, 'python') for _ in range(5)]
+        wait_for(lambda: flight.stats()['coalesced'].get('wikipedia') == 4)
+        release.set()
+        results = [future.result(5) for future in futures]
+
+    assert calls == ['python']
+    assert results == ['answer for python'] * 5
+    assert flight.stats() == {'fetches': {'wikipedia': 1}, 'coalesced': {'wikipedia': 4}}
+
+
+def test_different_keys_and_sources_are_not_coalesced(flight):
+    assert flight.do('wikipedia', 'a', str.upper, 'a') == 'A'
+    assert flight.do('wikipedia', 'b', str.upper, 'b') == 'B'
+    assert flight.do('duckduckgo', 'a', str.upper, 'a') == 'A'
+    assert flight.stats() == {'fetches': {'wikipedia': 2, 'duckduckgo': 1}, 'coalesced': {}}
+
+
+def test_followers_get_the_leaders_exception_and_the_next_call_retries(flight):
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise ValueError("upstream down")
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(flight.do, 'wikipedia', 'python', failing) for _ in range(3)]
+        wait_for(lambda: flight.stats()['coalesced'].get('wikipedia') == 2)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError, match="upstream down"):
+                future.result(5)
+
+    assert flight.do('wikipedia', 'python', lambda: 'recovered') == 'recovered'
+    assert flight.stats()['fetches'] == {'wikipedia': 2}
+
+
+def test_coroutines_on_one_loop_share_one_task(flight):
+    calls = []
+
+    async def fetch(query):
+        calls.append(query)
+        await asyncio.sleep(0.01)
+        return query.upper()
+
+    async def main():
+        return await asyncio.gather(*(flight.do_async('duckduckgo', 'q', fetch, 'q') for _ in range(4)))
+
+    assert asyncio.run(main()) == ['Q'] * 4
+    assert calls == ['q']
+    assert flight.stats() == {'fetches': {'duckduckgo': 1}, 'coalesced': {'duckduckgo': 3}}
+
+
+def test_shared_task_is_cancelled_only_with_its_last_waiter(flight):
+    cancelled = []
+
+    async def main():
+        release = asyncio.Event()
+
+        async def fetch():
+            try:
+                await release.wait()
+                return 'done'
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        first = asyncio.create_task(flight.do_async('wikipedia', 'q', fetch))
+        second = asyncio.create_task(flight.do_async('wikipedia', 'q', fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        assert not cancelled
+        release.set()
+        assert await second == 'done'
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+        release.clear()
+        third = asyncio.create_task(flight.do_async('wikipedia', 'q', fetch))
+        await asyncio.sleep(0)
+        third.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await third
+        await asyncio.sleep(0)
+        assert cancelled == [True]
+
+    asyncio.run(main())
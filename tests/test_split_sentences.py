@@ -0,0 +1,17 @@
+import pytest
+
+
+@pytest.mark.parametrize('text, sentences', [
+    ("It ended World War I. The treaty followed.", ["It ended World War I.", "The treaty followed."]),
+    ("We chose Plan B. It failed.", ["We chose Plan B.", "It failed."]),
+    ("John F. Kennedy was president. He died.", ["John F. Kennedy was president.", "He died."]),
+    ("J. R. R. Tolkien wrote it. Fans loved it.", ["J. R. R. Tolkien wrote it.", "Fans loved it."]),
+    ("Dr. Smith met Mr. Jones. They talked.", ["Dr. Smith met Mr. Jones.", "They talked."]),
+    ("It costs approx. 5 dollars. Good.", ["It costs approx. 5 dollars.", "Good."]),
+    ("Born in the U.S. and raised there. Yes!", ["Born in the U.S. and raised there.", "Yes!"]),
+    ("See https://example.org/a.b for more. Thanks?", ["See https://example.org/a.b for more.", "Thanks?"]),
+    ("Rapprox. Next one.", ["Rapprox.", "Next one."]),
+    ("  ", []),
+])
+def test_split_sentences(infobot_module, text, sentences):
+    assert infobot_module.split_sentences(text) == sentences
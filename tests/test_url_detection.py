@@ -0,0 +1,31 @@
+import pytest
+
+
+@pytest.fixture
+def bot(infobot_module):
+    return infobot_module.infobot
+
+
+@pytest.mark.parametrize('text', ['https://nodejs.org/en', 'http://localhost:5000/chat', 'example.com', 'example.com.',
+                                  'python.org/downloads', 'bbc.co.uk', 'www.example.xyz', 'www.python.org/about?x=1'])
+def test_links_and_bare_domains_with_a_known_tld_are_urls(bot, text):
+    assert bot.is_url(text)
+
+
+@pytest.mark.parametrize('text', ['node.js', 'setup.py', 'README.md', 'e.g.', 'U.S.', 'ver. 1.2', 'python'])
+def test_file_names_and_abbreviations_are_not_urls(bot, text):
+    assert not bot.is_url(text)
+
+
+@pytest.mark.parametrize('message, query', [
+    ("what is node.js", "node.js"),
+    ("what is python.org", "python.org"),
+    ("summarize https://nodejs.org/en/about please", "https://nodejs.org/en/about"),
+    ("have a look at www.python.org, thanks", "www.python.org"),
+])
+def test_question_reads_a_page_only_when_it_names_one(bot, message, query):
+    assert bot.classify_message(message) == ("question", query)
+
+
+def test_bare_domain_inside_a_sentence_is_not_extracted(bot):
+    assert bot.extract_urls("is node.js faster than deno.com") == []
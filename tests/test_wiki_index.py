@@ -0,0 +1,60 @@
+import gzip
+
+import pytest
+
+import wiki_index
+
+ABSTRACT = "is the subject of this abstract, which is long enough to be kept in the index."
+
+
+def write_dump(path, titles):
+    docs = "".join(f"<doc><title>Wikipedia: {title}</title><url>https://en.wikipedia.org/wiki/{i}</url>"
+                   f"<abstract>{title} {ABSTRACT}</abstract><links><sublink><anchor>History</anchor></sublink></links>"
+                   f"</doc>\n" for i, title in enumerate(titles))
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write(f"<feed>\n{docs}</feed>\n")
+    return str(path)
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    dump = write_dump(tmp_path / 'abstracts.xml.gz', ["Alan Turing", "Ada Lovelace", "alan_turing", "Grace Hopper"])
+    path = str(tmp_path / 'abstracts.idx')
+    assert wiki_index.build_index(dump, path) == 3
+    return path
+
+
+def test_build_keeps_the_first_article_of_each_title(index_path):
+    index = wiki_index.WikiIndex(index_path)
+    assert len(index) == 3
+    assert index.lookup("alan turing?") == (f"Alan Turing {ABSTRACT}", 'https://en.wikipedia.org/wiki/0')
+    assert index.lookup("Grace Hopper") == (f"Grace Hopper {ABSTRACT}", 'https://en.wikipedia.org/wiki/3')
+    assert index.lookup("Charles Babbage") is None
+    index.close()
+
+
+def test_iter_abstracts_drops_each_doc_from_the_tree(tmp_path, monkeypatch):
+    dump = write_dump(tmp_path / 'abstracts.xml.gz', [f"Article {i}" for i in range(50)])
+    roots, iterparse = [], wiki_index.ET.iterparse
+
+    def iterparse_finding_the_root(source, events):
+        for event, elem in iterparse(source, ('start',) + tuple(events)):
+            if not roots:
+                roots.append(elem)
+            if event in events:
+                yield event, elem
+
+    monkeypatch.setattr(wiki_index.ET, 'iterparse', iterparse_finding_the_root)
+    for _ in wiki_index.iter_abstracts(dump):
+        assert len(roots[0]) <= 1
+    assert roots[0].tag == 'feed'
+
+
+@pytest.mark.parametrize('size', [0, 10, wiki_index.HEADER.size, -1])
+def test_truncated_index_is_rejected_on_open(index_path, size):
+    with open(index_path, 'rb') as f:
+        data = f.read()
+    with open(index_path, 'wb') as f:
+        f.write(data[:size])
+    with pytest.raises(ValueError):
+        wiki_index.WikiIndex(index_path)
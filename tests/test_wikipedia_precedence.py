@@ -0,0 +1,127 @@
+import asyncio, gzip, json, os
+
+import pytest
+
+import wiki_index
+
+SUMMARIES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'fixtures',
+                         'wiki_summaries.json')
+
+PYTHON_EXTRACT = "Python is a high-level, general-purpose programming language created by Guido van Rossum."
+MONTY_PASSAGE = ("Monty Python were a British comedy troupe formed in 1969. The group made the sketch comedy show "
+                 "Monty Python's Flying Circus, broadcast by the BBC. Monty Python members wrote and performed it.")
+SNAKE_PASSAGE = ("The ball python is a python species native to West and Central Africa. The ball python is the "
+                 "most popular pet python, and a ball python curls into a ball when threatened.")
+
+
+def wikipedia_api(query):
+    """api.php with one page, 'Python', and a search that always finds it."""
+    if query.get('list') == ['search']:
+        body = {'query': {'search': [{'title': 'Python'}]}}
+    elif query['titles'][0].lower() == 'python':
+        body = {'query': {'pages': {'1': {'title': 'Python', 'extract': PYTHON_EXTRACT,
+                                          'fullurl': 'https://en.wikipedia.org/wiki/Python'}}}}
+    else:
+        body = {'query': {'pages': {'-1': {'title': query['titles'][0], 'missing': ''}}}}
+    return 200, {'Content-Type': 'application/json'}, json.dumps(body).encode('utf-8')
+
+
+@pytest.fixture
+def bot(infobot_module, upstream, monkeypatch):
+    monkeypatch.setenv('INFOBOT_WIKI_INDEX', '')
+    monkeypatch.setattr(infobot_module, 'WIKIPEDIA_API_URL', upstream.url('/w/api.php'))
+    upstream.routes['/w/api.php'] = wikipedia_api
+    bot = infobot_module.InfoBot()
+    # Enough unrelated documents for BM25 to tell rare query terms from common ones
+    with open(SUMMARIES, encoding='utf-8') as f:
+        for i, summary in enumerate(json.load(f) * 4):
+            bot.content_index.add(f"https://example.com/notes/{i}", summary)
+    bot.content_index.add('https://en.wikipedia.org/wiki/Monty_Python', MONTY_PASSAGE)
+    bot.content_index.add('https://reptiles.example.com/care-sheets/snakes', SNAKE_PASSAGE)
+    yield bot
+    bot.http.close()
+    bot.executor.shutdown()
+
+
+@pytest.fixture(params=['sync', 'async'])
+def search(request, bot):
+    """search(query) through _search_wikipedia or _search_wikipedia_async, bypassing the answer cache."""
+    if request.param == 'sync':
+        return bot._search_wikipedia
+
+    def run(query):
+        async def main():
+            try:
+                return await bot._search_wikipedia_async(query)
+            finally:
+                await bot.aio.close()
+        return asyncio.run(main())
+    return run
+
+
+def search_requests(upstream):
+    return [path for path in upstream.requests if path == '/w/api.php']
+
+
+def test_confident_index_hit_is_served_without_asking_wikipedia(bot, search, upstream):
+    assert bot.content_index.search('monty python')[0][0] >= bot.content_index_confident_score
+
+    assert search('monty python') == f"{MONTY_PASSAGE}\n\nSource: https://en.wikipedia.org/wiki/Monty_Python"
+    assert search_requests(upstream) == []
+
+
+def test_exact_wikipedia_title_wins_over_a_weaker_matching_passage(bot, search, upstream):
+    bot.content_index_min_score = 4.0
+    assert bot._content_answer('python') == f"{MONTY_PASSAGE}\n\nSource: https://en.wikipedia.org/wiki/Monty_Python"
+
+    assert search('python') == f"{PYTHON_EXTRACT}\n\nSource: https://en.wikipedia.org/wiki/Python"
+    assert len(search_requests(upstream)) == 1
+
+
+def test_index_answers_when_the_exact_title_misses_and_the_page_title_matches(bot, search, upstream):
+    bot.content_index_confident_score = 100.0
+    assert search('monty python') == f"{MONTY_PASSAGE}\n\nSource: https://en.wikipedia.org/wiki/Monty_Python"
+    # One page lookup, no full-text search
+    assert len(search_requests(upstream)) == 1
+
+
+def test_passage_about_the_terms_on_a_differently_titled_page_is_not_served(bot, search, upstream):
+    score, coverage, passage = bot.content_index.search('ball python')[0]
+    assert passage.text == SNAKE_PASSAGE
+    assert score >= bot.content_index_min_score and coverage >= bot.content_index_min_coverage
+
+    answer = search('ball python')
+
+    assert answer.startswith(PYTHON_EXTRACT)
+    assert len(search_requests(upstream)) == 3
+
+
+def test_failing_wikipedia_gives_the_trouble_answer_and_counts_a_breaker_failure(infobot_module, bot, search, upstream):
+    upstream.routes['/w/api.php'] = lambda query: (200, {'Content-Type': 'text/html'}, b"<html>Maintenance</html>")
+
+    answer = search('guido van rossum')
+
+    assert answer == infobot_module.InfoBot._wikipedia_error('guido van rossum')
+    assert any(phrase in answer for phrase in infobot_module.NO_ANSWER_PHRASES)
+    stats = bot.upstreams.stats()['wikipedia']
+    assert (stats['successes'], stats['failures']) == (0, 1)
+
+
+@pytest.mark.parametrize('damage, offline', [(None, True), ('truncated', False), ('corrupt_abstract', False)])
+def test_damaged_offline_index_falls_through_to_wikipedia(bot, search, upstream, tmp_path, damage, offline):
+    dump, path = tmp_path / 'abstracts.xml', str(tmp_path / 'abstracts.idx')
+    dump.write_text(f"<feed><doc><title>Wikipedia: Python</title><url>https://en.wikipedia.org/wiki/Python</url>"
+                    f"<abstract>{PYTHON_EXTRACT} Offline.</abstract></doc></feed>", encoding='utf-8')
+    wiki_index.build_index(str(dump), path)
+    with open(path, 'r+b') as f:
+        if damage == 'truncated':
+            f.truncate(os.path.getsize(path) - 1)
+        elif damage == 'corrupt_abstract':
+            f.seek(wiki_index.HEADER.size)
+            f.write(b"\xff" * 8)
+    bot.wiki_index_path = path
+
+    answer = search('python')
+
+    assert answer.startswith(f"{PYTHON_EXTRACT} Offline." if offline else f"{PYTHON_EXTRACT}\n\nSource:")
+    assert len(search_requests(upstream)) == (0 if offline else 1)